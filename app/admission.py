@@ -0,0 +1,265 @@
+"""
+Admission control per endpoint class.
+
+Every endpoint class (OPRF evaluation, exchange, administration, health) gets its
+own concurrency limit and a bounded queue of waiting requests. When the HSM or
+the database slows down, requests of a class queue up to that bound and are then
+rejected right away with a 503 and a Retry-After header, instead of piling up in
+the thread pool and slowing down every other route as well. A request is also
+rejected up front when the expected wait in the queue exceeds what is left of its
+deadline, as the client will have given up by the time it would be handled.
+
+The limits are per worker process.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app import deadline
+from app.config import ConfigAdmission
+from app.logging.events import SYS_LOAD_SHED, log_event
+from app.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+OPRF = "oprf"
+EXCHANGE = "exchange"
+ADMIN = "admin"
+HEALTH = "health"
+
+# Path prefixes per endpoint class. Other paths (version, docs, test routes) are
+# not limited. Neither are the /livez and /readyz probes: they only report the
+# cached results of the background checks, and shedding them would make the
+# orchestrator restart or drain a worker for being busy.
+_PREFIXES: tuple[tuple[str, str], ...] = (
+    ("/oprf/", OPRF),
+    ("/exchange/", EXCHANGE),
+    ("/receive", EXCHANGE),
+    ("/administration/", ADMIN),
+    ("/health", HEALTH),
+)
+
+# Weight of the latest request in the moving average of the service time
+_EWMA_WEIGHT = 0.2
+
+SHED_QUEUE_FULL = "queue_full"
+SHED_DEADLINE = "deadline"
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "prs_admission_in_flight",
+    "Admitted requests being handled, per endpoint class",
+    ("endpoint_class",),
+)
+ADMISSION_QUEUED = Gauge(
+    "prs_admission_queued",
+    "Requests waiting to be admitted, per endpoint class",
+    ("endpoint_class",),
+)
+ADMISSION_WAIT = Histogram(
+    "prs_admission_wait_seconds",
+    "Time admitted requests waited in the queue, per endpoint class",
+    ("endpoint_class",),
+)
+ADMISSION_SHED = Counter(
+    "prs_admission_shed_total",
+    "Requests rejected by admission control, per endpoint class and reason",
+    ("endpoint_class", "reason"),
+)
+
+
+def endpoint_class(path: str) -> str | None:
+    """The endpoint class of a request path, or None when it is not limited."""
+    for prefix, name in _PREFIXES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    future: "asyncio.Future[None]"
+    queued_at: float
+
+
+class AdmissionLimiter:
+    """
+    At most concurrency requests at a time, and at most queue_size waiting in
+    first-in, first-out order. A finished request hands its slot directly to the
+    first waiting one.
+
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        # Moving average of the seconds an admitted request takes, 0 until the
+        # first request finished
+        self.service_time = 0.0
+        self._waiters: deque[_Waiter] = deque()
+        self._shedding = False
+        self._shed_count = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self, position: int) -> float:
+        """Seconds until the request at position in the queue is admitted."""
+        return position * self.service_time / self.concurrency
+
+    async def acquire(self) -> None:
+        """Wait for a slot. Raises Shed when the request is rejected."""
+        if self.active < self.concurrency and not self._waiters:
+            self._admit()
+            return
+
+        position = len(self._waiters) + 1
+        expected = self.expected_wait(position)
+        retry_after = max(1, math.ceil(expected))
+        if position > self.queue_size:
+            raise self._shed(SHED_QUEUE_FULL, retry_after)
+        remaining = deadline.remaining()
+        if remaining is not None and expected > remaining:
+            raise self._shed(SHED_DEADLINE, retry_after)
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), time.monotonic())
+        self._waiters.append(waiter)
+        ADMISSION_QUEUED.inc(endpoint_class=self.name)
+        try:
+            # The estimate can be wrong; never wait beyond the deadline
+            await asyncio.wait_for(asyncio.shield(waiter.future), remaining)
+        except asyncio.TimeoutError:
+            self._leave_queue(waiter)
+            raise self._shed(SHED_DEADLINE, retry_after)
+        except asyncio.CancelledError:
+            self._leave_queue(waiter)
+            raise
+        ADMISSION_WAIT.observe(
+            time.monotonic() - waiter.queued_at, endpoint_class=self.name
+        )
+
+    def release(self, duration: float) -> None:
+        """Free the slot of a request that took duration seconds."""
+        if self.service_time == 0.0:
+            self.service_time = duration
+        else:
+            self.service_time += _EWMA_WEIGHT * (duration - self.service_time)
+
+        ADMISSION_IN_FLIGHT.dec(endpoint_class=self.name)
+        self.active -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            ADMISSION_QUEUED.dec(endpoint_class=self.name)
+            if not waiter.future.done():
+                self._admit()
+                waiter.future.set_result(None)
+                return
+
+        if self._shedding:
+            self._shedding = False
+            logger.info(
+                "admission of %s requests recovered after shedding %d",
+                self.name,
+                self._shed_count,
+            )
+            self._shed_count = 0
+
+    def _admit(self) -> None:
+        self.active += 1
+        ADMISSION_IN_FLIGHT.inc(endpoint_class=self.name)
+
+    def _leave_queue(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Admitted just as the wait ended; pass the slot on
+            self.release(self.service_time)
+            return
+        waiter.future.cancel()
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUED.dec(endpoint_class=self.name)
+
+    def _shed(self, reason: str, retry_after: int) -> Shed:
+        ADMISSION_SHED.inc(endpoint_class=self.name, reason=reason)
+        self._shed_count += 1
+        if not self._shedding:
+            # Once per episode, so an overload doesn't flood the audit log
+            self._shedding = True
+            log_event(
+                logger,
+                SYS_LOAD_SHED,
+                "Load shedding started",
+                endpoint_class=self.name,
+                reason=reason,
+                concurrency_limit=self.concurrency,
+                queue_size=self.queue_size,
+                service_time_ms=round(self.service_time * 1000, 1),
+            )
+        return Shed(reason, retry_after)
+
+
+class AdmissionMiddleware:
+    """
+    Applies the admission limits of the endpoint class of each HTTP request.
+    Must run inside RequestContextMiddleware, which binds the request deadline.
+    """
+
+    def __init__(self, app: ASGIApp, config: ConfigAdmission) -> None:
+        self.app = app
+        self.limiters = {
+            name: AdmissionLimiter(name, concurrency, queue_size)
+            for name, concurrency, queue_size in (
+                (OPRF, config.oprf_concurrency, config.oprf_queue),
+                (EXCHANGE, config.exchange_concurrency, config.exchange_queue),
+                (ADMIN, config.admin_concurrency, config.admin_queue),
+                (HEALTH, config.health_concurrency, config.health_queue),
+            )
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        name = endpoint_class(path)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[name]
+        try:
+            await limiter.acquire()
+        except Shed as e:
+            response = JSONResponse(
+                status_code=503,
+                content={"error": "Service temporarily unavailable"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - start)
@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+import shutil
 import signal
 import sys
 from contextlib import asynccontextmanager
@@ -12,9 +14,15 @@ import uvicorn
 from fastapi import Depends, FastAPI, Request
 from fastapi.responses import JSONResponse
 
+from app import tracing
+from app.admission import AdmissionMiddleware
 from app.auth import get_auth_ctx
 from app.config import get_config
-from app.logging.config_builder import LogConfigBuilder
+from app.container import get_database, get_health_prober, get_metrics_exporter
+from app.db.session import DeadlineExceededError
+from app.http_metrics import RequestMetricsMiddleware
+from app.logging import queueing
+from app.logging.config_builder import CONFIGURED_LOGGERS, LogConfigBuilder
 from app.logging.events import (
     SYS_APP_CRASHED,
     SYS_APP_STARTED,
@@ -26,10 +34,12 @@ from app.logging.middleware import RequestContextMiddleware
 from app.routers.default import router as default_router
 from app.routers.exchange import router as exchange_router
 from app.routers.health import router as health_router
+from app.routers.metrics import router as metrics_router
 from app.routers.administration.hsm_key_version import router as hsm_key_version_router
 from app.routers.administration.key import router as key_router
 from app.routers.oprf import router as oprf_router
 from app.routers.test_oprf import router as test_oprf_router
+from app.warmup import warm_up
 
 logger = logging.getLogger(__name__)
 
@@ -118,12 +128,15 @@ TEST_TAGS_METADATA = [
 def get_uvicorn_params() -> dict[str, Any]:
     config = get_config()
 
+    workers = config.uvicorn.workers
     kwargs = {
         "host": config.uvicorn.host,
         "port": config.uvicorn.port,
-        "reload": config.uvicorn.reload,
+        # uvicorn can't reload multiple workers
+        "reload": config.uvicorn.reload and workers == 1,
         "reload_delay": config.uvicorn.reload_delay,
         "reload_dirs": config.uvicorn.reload_dirs,
+        "workers": workers,
         "factory": True,
     }
     if (
@@ -142,6 +155,14 @@ def get_uvicorn_params() -> dict[str, Any]:
 
 
 def run() -> None:
+    config = get_config()
+    multiprocess_dir = config.metrics.multiprocess_dir
+    if multiprocess_dir:
+        # Drop the snapshots of the workers of a previous run
+        shutil.rmtree(multiprocess_dir, ignore_errors=True)
+
+    # Each worker process imports the application and builds its own container,
+    # connections and caches; nothing is shared between the workers.
     uvicorn.run("app.application:create_fastapi_app", **get_uvicorn_params())
 
 
@@ -252,9 +273,26 @@ def _install_signal_handlers() -> None:
 @asynccontextmanager
 async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
     global _shutdown_reason
+    config = get_config()
+    metrics_enabled = config.metrics.enabled
+    if metrics_enabled:
+        get_metrics_exporter().start()
+    health_prober = get_health_prober()
+    health_prober.start()
+    # Here rather than in the container, so the CLIs don't start the thread
+    get_database().start_lag_checks()
+    if config.uvicorn.warmup:
+        # uvicorn only accepts connections once the lifespan startup is done
+        await asyncio.to_thread(warm_up)
+    health_prober.mark_warmed_up()
     try:
         yield
     finally:
+        health_prober.stop()
+        get_database().stop_lag_checks()
+        if metrics_enabled:
+            get_metrics_exporter().stop()
+        tracing.shutdown_tracing()
         if _shutdown_reason != "crash":
             log_event(
                 logger,
@@ -263,6 +301,7 @@ async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
                 component=COMPONENT,
                 shutdown_reason=_shutdown_reason,
             )
+        queueing.stop()
 
 
 def _unhandled_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -278,6 +317,17 @@ def _unhandled_exception_handler(request: Request, exc: Exception) -> JSONRespon
     return JSONResponse(status_code=500, content={"error": "Internal server error"})
 
 
+def _deadline_exceeded_handler(request: Request, exc: Exception) -> JSONResponse:
+    # The database is failing over or down; tell the client to come back later
+    # instead of reporting an internal error.
+    logger.warning("request deadline exceeded for %s: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Service temporarily unavailable"},
+        headers={"Retry-After": "1"},
+    )
+
+
 def setup_logging() -> None:
     config = get_config()
     loglevel = config.app.loglevel.upper()
@@ -288,7 +338,11 @@ def setup_logging() -> None:
         loglevel=loglevel,
         logging_config=config.logging,
     ).build()
+    # Before dictConfig closes the handlers the queue ships to
+    queueing.stop()
     dictConfig(log_config)
+    if config.logging.queue_enabled:
+        queueing.install(config.logging.queue_size, CONFIGURED_LOGGERS)
 
 
 def setup_fastapi() -> FastAPI:
@@ -315,10 +369,26 @@ def setup_fastapi() -> FastAPI:
         else FastAPI(docs_url=None, redoc_url=None, lifespan=_lifespan)
     )
 
+    if config.admission.enabled:
+        # Added before (so inside of) the request context middleware, which
+        # binds the deadline it needs and logs the rejected requests
+        fastapi.add_middleware(AdmissionMiddleware, config=config.admission)
     fastapi.add_middleware(
         RequestContextMiddleware,
         correlation_id_expected=config.logging.correlation_id_expected,
+        request_deadline=config.app.request_deadline,
+        server_timing_oins=config.app.server_timing_oins,
     )
+    if config.metrics.enabled:
+        # Added after (so outside of) the request context middleware, so it
+        # also times that
+        fastapi.add_middleware(RequestMetricsMiddleware)
+    if config.tracing.enabled:
+        tracing.setup_tracing(config.tracing)
+        # Outermost, so the spans of everything below are children of the
+        # request span
+        fastapi.add_middleware(tracing.TracingMiddleware)
+    fastapi.add_exception_handler(DeadlineExceededError, _deadline_exceeded_handler)
     fastapi.add_exception_handler(Exception, _unhandled_exception_handler)
 
     # Non-OAuth routes
@@ -326,6 +396,8 @@ def setup_fastapi() -> FastAPI:
         default_router,
         health_router,
     ]
+    if config.metrics.enabled and config.metrics.port is None:
+        public_routers.append(metrics_router)
     for router in public_routers:
         fastapi.include_router(router)
 
@@ -8,7 +8,13 @@ from starlette.requests import Request
 from app import container
 from app.db.entities.organization import Organization
 from app.models.auth.context import AuthContext, AuthenticationClaims
-from app.models.auth.headers import AuthHeaders
+from app.models.auth.headers import (
+    AUDIENCE_HEADER,
+    CLIENT_COMMON_NAME_HEADER,
+    CLIENT_ORGANIZATION_ID_HEADER,
+    ORGANIZATION_ID_HEADER,
+    header_oin,
+)
 from app.services.auth.header import AuthHeaderService
 from app.services.org_service import OrgService
 
@@ -23,6 +29,30 @@ bearer_auth = HTTPBearer(
 )
 
 
+_AUTH_HEADER_NAMES = frozenset(
+    name.encode("latin-1")
+    for name in (
+        ORGANIZATION_ID_HEADER,
+        CLIENT_ORGANIZATION_ID_HEADER,
+        CLIENT_COMMON_NAME_HEADER,
+        AUDIENCE_HEADER,
+    )
+)
+
+
+def _auth_headers(request: Request) -> dict[str, str]:
+    """
+    The authorization headers of the request, in one pass over the raw ASGI
+    headers (request.headers scans them again for every lookup).
+    """
+    values: dict[str, str] = {}
+    for name, value in request.scope["headers"]:
+        if name in _AUTH_HEADER_NAMES:
+            # The first occurrence wins, as with request.headers
+            values.setdefault(name.decode("latin-1"), value.decode("latin-1"))
+    return values
+
+
 def get_auth_ctx(
     request: Request,
     # We don't do anything with it, but it's just a marker that allows swagger to add the authorize button
@@ -31,21 +61,30 @@ def get_auth_ctx(
         container.get_auth_headers_service
     ),
 ) -> AuthContext:
+    # Runs on every protected request, so the headers are read directly from
+    # the scope
+    headers = _auth_headers(request)
+    common_name = headers.get(CLIENT_COMMON_NAME_HEADER)
+    audience = headers.get(AUDIENCE_HEADER)
     try:
-        auth_headers = AuthHeaders.from_request(request)
+        organization_id = header_oin(headers.get(ORGANIZATION_ID_HEADER))
+        client_organization_id = header_oin(headers.get(CLIENT_ORGANIZATION_ID_HEADER))
+        if common_name is None or audience is None:
+            raise ValueError(
+                f"{CLIENT_COMMON_NAME_HEADER} and {AUDIENCE_HEADER} are required"
+            )
     except ValueError as e:
-        logger.exception(f"Invalid Authorization Headers in request: {e}")
+        logger.exception("Invalid Authorization Headers in request: %s", e)
         raise HTTPException(status_code=403, detail="Unauthorized request")
 
-    validated_auth_headers = auth_headers_service.validate(auth_headers)
-    claims = AuthenticationClaims(
-        organization_id=validated_auth_headers.organization_id,
-        client_organization_id=validated_auth_headers.client_organization_id,
-        client_common_name=validated_auth_headers.client_organization_common_name,
-    )
+    auth_headers_service.validate_audience(audience)
     ctx = AuthContext(
-        claims=claims,
-        audience=validated_auth_headers.audience,
+        claims=AuthenticationClaims(
+            organization_id=organization_id,
+            client_organization_id=client_organization_id,
+            client_common_name=common_name,
+        ),
+        audience=audience,
     )
     request.state.auth = ctx
     return ctx
@@ -7,17 +7,30 @@ the database. Intended to be run periodically by a regular (system) cron job:
     python3 -m app.cleanup
 
 It runs once and exits: 0 on success, 1 on failure.
+
+With --daemon it stays resident instead and runs the cleanup on the schedule of
+the [maintenance] section, see app.maintenance, as well as the provisioning of
+the HSM keys of upcoming key versions when provision_interval is set. It exits
+on SIGTERM or SIGINT.
 """
 
+import argparse
 import logging
+import signal
 import sys
+from typing import Any
 
 from app import application, container
+from app.config import get_config
+from app.maintenance import AdvisoryLock, Job, MaintenanceDaemon, MaintenanceServer
 
 logger = logging.getLogger(__name__)
 
 
-def main() -> int:
+def main(daemon: bool = False) -> int:
+    if daemon:
+        return run_daemon()
+
     application.application_init()
 
     service = container.get_hsm_key_cleanup_service()
@@ -31,5 +44,66 @@ def main() -> int:
     return 0
 
 
+def run_daemon() -> int:
+    config = get_config()
+    if config.database.external_pooler and not config.maintenance.lock_dsn:
+        logger.error(
+            "[maintenance] lock_dsn must connect to Postgres directly when "
+            "external_pooler is set"
+        )
+        return 1
+
+    jobs = [
+        Job(
+            "hsm_key_cleanup",
+            config.maintenance.cleanup_interval,
+            lambda: container.get_hsm_key_cleanup_service().cleanup_expired_keys(),
+        ),
+    ]
+    if config.maintenance.provision_interval:
+        jobs.append(
+            Job(
+                "hsm_key_provisioning",
+                config.maintenance.provision_interval,
+                lambda: container.get_hsm_key_rotation_service().provision_upcoming(),
+            )
+        )
+    daemon = MaintenanceDaemon(
+        jobs,
+        AdvisoryLock(config.maintenance.lock_dsn or config.database.dsn),
+        jitter=config.maintenance.jitter,
+    )
+
+    def _stop(signum: int, frame: Any) -> None:
+        daemon.stop()
+
+    # Installed first, so the handlers of application_init chain to them
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, _stop)
+    application.application_init()
+
+    server = None
+    if config.maintenance.port:
+        server = MaintenanceServer(
+            daemon, config.maintenance.host, config.maintenance.port
+        )
+        server.start()
+
+    logger.info("maintenance daemon started")
+    try:
+        daemon.run()
+    finally:
+        if server is not None:
+            server.stop()
+    logger.info("maintenance daemon stopped")
+    return 0
+
+
 if __name__ == "__main__":
-    sys.exit(main())
+    parser = argparse.ArgumentParser(description="Remove expired HSM keys")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="stay resident and run the cleanup on its schedule",
+    )
+    sys.exit(main(daemon=parser.parse_args().daemon))
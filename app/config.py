@@ -18,21 +18,104 @@ class LogLevel(str, Enum):
     critical = "critical"
 
 
+class ReplicaRouting(str, Enum):
+    round_robin = "round_robin"
+    least_connections = "least_connections"
+
+
+class JsonEncoder(str, Enum):
+    json = "json"
+    # Needs the orjson extra
+    orjson = "orjson"
+
+
+class SyslogTransport(str, Enum):
+    # One datagram per record
+    udp = "udp"
+    # Persistent connection, batched writes with RFC 6587 octet counting
+    tcp = "tcp"
+    tls = "tls"
+
+
+class SpoolOverflow(str, Enum):
+    # Wait for the shipper to make room, up to siem_spool_block_timeout
+    block = "block"
+    drop = "drop"
+
+
 class ConfigApp(BaseModel):
     loglevel: LogLevel = Field(default=LogLevel.info)
     # Deployment environment carried on the PRS-SYS-001 startup event
     environment: str = Field(default="unknown")
     mtls_override_cert: str | None = Field(default=None)
+    # Number of parsed client certificates kept in memory
+    mtls_cert_cache_size: int = Field(default=1024, ge=1)
     enable_test_routes: bool = Field(default=False)
     enable_exchange_services_routes: bool = Field(default=True)
+    # Seconds a request may take before blocking work on its behalf (such as
+    # database retries) is abandoned. 0 disables the deadline.
+    request_deadline: float = Field(default=10.0, ge=0)
+    # Client OINs (x-gf-act-sub) that get a Server-Timing header with the time
+    # spent per phase (db, hsm, crypto, jwe). Empty sends it to no one.
+    server_timing_oins: list[str] = Field(default_factory=list)
+    # Organization OINs (x-gf-sub) allowed to rotate the key versions of all
+    # organizations through POST /administration/key-versions/rotate. Empty
+    # allows no one; python -m app.rotate_keys is not affected.
+    key_rotation_oins: list[str] = Field(default_factory=list)
+    # Seconds between the background health checks behind /readyz
+    health_probe_interval: float = Field(default=5.0, gt=0)
+
+    @field_validator("server_timing_oins", "key_rotation_oins", mode="before")
+    def validate_oin_lists(cls, v: Any) -> list[str]:
+        if v in (None, "", " "):
+            return []
+        if isinstance(v, str):
+            return [oin.strip() for oin in v.split(",") if oin.strip()]
+        return list(v)
 
 
 class ConfigLogging(BaseModel):
     syslog_path: str | None = Field(default=None)
+    syslog_transport: SyslogTransport = Field(default=SyslogTransport.udp)
+    # CA bundle to verify the collector with the tls transport, the system CAs
+    # when empty
+    syslog_tls_ca_file: str | None = Field(default=None)
+    # tcp/tls: records are written in batches of up to syslog_batch_bytes, at
+    # most syslog_flush_interval seconds after the first record of the batch.
+    # While the collector is unreachable up to syslog_buffer_size records are
+    # kept, later records are dropped.
+    syslog_batch_bytes: int = Field(default=64 * 1024, ge=1)
+    syslog_flush_interval: float = Field(default=0.2, ge=0)
+    syslog_buffer_size: int = Field(default=10000, ge=1)
     application_id: str | None = Field(default=None)
     include_traces: bool = Field(default=True)
     debug_logs_in_console: bool = Field(default=False)
     correlation_id_expected: bool = Field(default=False)
+    # Format and ship log records from a background thread, so requests don't
+    # wait for the console or the syslog collector
+    queue_enabled: bool = Field(default=False)
+    # Records waiting to be shipped. When full, SIEM records wait for room and
+    # all other records are dropped.
+    queue_size: int = Field(default=10000, ge=1)
+    json_encoder: JsonEncoder = Field(default=JsonEncoder.json)
+    # Log at most rate_limit_burst records per rate_limit_interval seconds with
+    # the same logger and message template, then a summary of the suppressed
+    # ones. Audit events are never suppressed. On by default; 0 disables the
+    # rate limit.
+    rate_limit_burst: int = Field(default=10, ge=0)
+    rate_limit_interval: float = Field(default=60.0, gt=0)
+    # Spool SIEM records to this directory and ship them to the syslog collector
+    # from a background thread. Without a directory they are sent directly. Every
+    # worker process spools into a locked worker-<n> subdirectory of its own.
+    siem_spool_dir: str | None = Field(default=None)
+    # Unshipped records the spool may hold; when full, new records wait for room
+    # (block) or are dropped (drop)
+    siem_spool_max_bytes: int = Field(default=256 * 1024 * 1024, ge=1)
+    siem_spool_segment_bytes: int = Field(default=16 * 1024 * 1024, ge=1)
+    # Seconds between fsyncs of the spool, 0 to fsync every record
+    siem_spool_fsync_interval: float = Field(default=1.0, ge=0)
+    siem_spool_overflow: SpoolOverflow = Field(default=SpoolOverflow.block)
+    siem_spool_block_timeout: float = Field(default=5.0, ge=0)
 
 
 class ConfigDatabase(BaseModel):
@@ -45,6 +128,19 @@ class ConfigDatabase(BaseModel):
     max_overflow: int = Field(default=10, ge=0, lt=100)
     pool_pre_ping: bool = Field(default=False)
     pool_recycle: int = Field(default=3600, ge=0)
+    # Read-only replicas for hot-path lookups. Without replicas every query goes
+    # to the primary.
+    replica_dsns: list[str] = Field(default_factory=list)
+    replica_routing: ReplicaRouting = Field(default=ReplicaRouting.round_robin)
+    # Replicas lagging behind the primary by more than this many seconds (or that
+    # cannot be reached) are skipped until the next lag check.
+    replica_max_lag: float = Field(default=5.0, ge=0)
+    # Seconds between the background measurements of the replication lag
+    replica_lag_check_interval: float = Field(default=5.0, gt=0)
+    # Set when connecting through an external pooler such as PgBouncer in
+    # transaction mode. Server-side prepared statements are disabled, and a
+    # pool_size of 0 opens a new connection to the pooler for every session.
+    external_pooler: bool = Field(default=False)
 
     @field_validator("create_tables", mode="before")
     def validate_create_tables(cls, v: Any) -> bool:
@@ -54,6 +150,14 @@ class ConfigDatabase(BaseModel):
             return v.lower() in ("yes", "true", "t", "1")
         return bool(v)
 
+    @field_validator("external_pooler", mode="before")
+    def validate_external_pooler(cls, v: Any) -> bool:
+        if v in (None, "", " "):
+            return False
+        if isinstance(v, str):
+            return v.lower() in ("yes", "true", "t", "1")
+        return bool(v)
+
     @field_validator("pool_size", mode="before")
     def validate_pool_size(cls, v: Any) -> int:
         if v in (None, "", " "):
@@ -72,6 +176,116 @@ class ConfigDatabase(BaseModel):
             return 3600
         return int(v)
 
+    @field_validator("replica_dsns", mode="before")
+    def validate_replica_dsns(cls, v: Any) -> list[str]:
+        if v in (None, "", " "):
+            return []
+        if isinstance(v, str):
+            return [dsn.strip() for dsn in v.split(",") if dsn.strip()]
+        return list(v)
+
+
+class ConfigMetrics(BaseModel):
+    # Off by default, as /metrics needs no authentication
+    enabled: bool = Field(default=False)
+    # Serve /metrics on this port from a separate thread instead of on the API
+    # port. Leave empty to serve it on the API port, reachable for API clients.
+    port: int | None = Field(default=None, gt=0, lt=65535)
+    host: str = Field(default="0.0.0.0")
+    # Directory shared by the worker processes of a multi-worker deployment.
+    # Every worker writes its metrics there and /metrics reports the sum over
+    # all workers. Must be emptied before the service starts.
+    multiprocess_dir: str | None = Field(default=None)
+    # Seconds between the snapshots a worker writes to multiprocess_dir
+    snapshot_interval: float = Field(default=5.0, gt=0)
+
+
+class ConfigMaintenance(BaseModel):
+    # Schedules of python -m app.cleanup --daemon, in seconds between runs
+    cleanup_interval: float = Field(default=3600.0, gt=0)
+    # Provision the HSM keys of the key versions that have yet to start, e.g.
+    # those of a rotation scheduled ahead. Leave empty to not provision them.
+    provision_interval: float | None = Field(default=None, gt=0)
+    # Every interval is randomly lengthened or shortened by up to this fraction,
+    # so the instances of a cluster don't all wake up at the same moment
+    jitter: float = Field(default=0.1, ge=0, le=1)
+    # Serve /health and /metrics of the daemon on this port. Leave empty to not
+    # serve them.
+    port: int | None = Field(default=None, gt=0, lt=65535)
+    host: str = Field(default="127.0.0.1")
+    # Only one daemon in the cluster works at a time: the one that holds a
+    # Postgres advisory lock. The lock lives on a connection of its own, to the
+    # database dsn unless lock_dsn is set. With external_pooler set, lock_dsn
+    # must connect to Postgres directly, as a transaction mode pooler does not
+    # keep session locks.
+    lock_dsn: str | None = Field(default=None)
+
+
+class ConfigTracing(BaseModel):
+    # Needs the opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http
+    # packages of the tracing extra
+    enabled: bool = Field(default=False)
+    service_name: str = Field(default="pseudoniemendienst")
+    # OTLP/HTTP traces endpoint, e.g. http://otel-collector:4318/v1/traces.
+    # Leave empty to use the OTEL_EXPORTER_OTLP_* environment variables.
+    otlp_endpoint: str | None = Field(default=None)
+    # Fraction of the traces started here that is sampled. Requests that carry
+    # a traceparent follow the sampling decision of the caller.
+    sample_ratio: float = Field(default=1.0, ge=0, le=1)
+
+
+class ConfigAdmission(BaseModel):
+    # Limit the requests per endpoint class, per worker. Requests beyond the
+    # concurrency limit wait in a queue of at most <class>_queue requests; when
+    # that is full, or the expected wait exceeds the request deadline, they are
+    # rejected with a 503. Keep the sum of the concurrency limits below the 40
+    # threads of the thread pool, so one class can't starve the others.
+    enabled: bool = Field(default=True)
+    oprf_concurrency: int = Field(default=20, ge=1)
+    oprf_queue: int = Field(default=40, ge=0)
+    exchange_concurrency: int = Field(default=10, ge=1)
+    exchange_queue: int = Field(default=20, ge=0)
+    admin_concurrency: int = Field(default=4, ge=1)
+    admin_queue: int = Field(default=8, ge=0)
+    health_concurrency: int = Field(default=4, ge=1)
+    health_queue: int = Field(default=8, ge=0)
+
+
+class ConfigRateLimit(BaseModel):
+    # Token buckets per calling organization (x-gf-act-sub) and target OIN
+    enabled: bool = Field(default=True)
+    # Sustained requests per second and the number allowed at once
+    rate: float = Field(default=20.0, gt=0)
+    burst: int = Field(default=50, ge=1)
+    # Per calling organization: "<oin>=<rate>/<burst>", comma separated
+    overrides: dict[str, tuple[float, int]] = Field(default_factory=dict)
+    # redis://[:password@]host[:port][/db] of a server speaking the Redis
+    # protocol, to share the buckets between workers and nodes. Without it the
+    # buckets are per worker.
+    backend_url: str | None = Field(default=None)
+    backend_timeout: float = Field(default=0.1, gt=0)
+    # Seconds the buckets stay per worker after a failed call to the backend,
+    # before it is tried again
+    backend_retry_interval: float = Field(default=5.0, gt=0)
+    key_prefix: str = Field(default="prs:ratelimit:")
+
+    @field_validator("overrides", mode="before")
+    def validate_overrides(cls, v: Any) -> dict[str, tuple[float, int]]:
+        if v in (None, "", " "):
+            return {}
+        if not isinstance(v, str):
+            return dict(v)
+        overrides = {}
+        for item in v.split(","):
+            if not item.strip():
+                continue
+            oin, _, limit = item.partition("=")
+            rate, _, burst = limit.partition("/")
+            if not rate.strip() or not burst.strip():
+                raise ValueError(f"invalid rate limit override {item.strip()}")
+            overrides[oin.strip()] = (float(rate), int(burst))
+        return overrides
+
 
 class ConfigUvicorn(BaseModel):
     swagger_enabled: bool = Field(default=False)
@@ -82,6 +296,11 @@ class ConfigUvicorn(BaseModel):
     reload: bool = Field(default=True)
     reload_delay: float = Field(default=1)
     reload_dirs: list[str] = Field(default=["app"])
+    # Number of worker processes. More than 1 disables reload.
+    workers: int = Field(default=1, ge=1)
+    # Open the database and HSM connections and parse the stored keys before a
+    # worker starts accepting requests
+    warmup: bool = Field(default=True)
     use_ssl: bool = Field(default=False)
     ssl_base_dir: str | None = Field(default=None)
     ssl_cert_file: str | None = Field(default=None)
@@ -97,6 +316,10 @@ class ConfigOprf(BaseModel):
     hsm_cert_file: str | None = Field(default=None)
     hsm_key_file: str | None = Field(default=None)
     hsm_ca_cert_file: str | None = Field(default=None)
+    # Expired keys the cleanup destroys in the HSM at the same time
+    hsm_cleanup_concurrency: int = Field(default=8, ge=1, le=40)
+    # New keys a bulk rotation generates in the HSM at the same time
+    hsm_provision_concurrency: int = Field(default=8, ge=1, le=40)
 
 
 class ConfigPseudonym(BaseModel):
@@ -121,6 +344,11 @@ class ConfigAuthorizationHeaders(BaseModel):
 class Config(BaseModel):
     app: ConfigApp
     logging: ConfigLogging = Field(default_factory=ConfigLogging)
+    metrics: ConfigMetrics = Field(default_factory=ConfigMetrics)
+    tracing: ConfigTracing = Field(default_factory=ConfigTracing)
+    admission: ConfigAdmission = Field(default_factory=ConfigAdmission)
+    rate_limit: ConfigRateLimit = Field(default_factory=ConfigRateLimit)
+    maintenance: ConfigMaintenance = Field(default_factory=ConfigMaintenance)
     database: ConfigDatabase
     uvicorn: ConfigUvicorn
     oprf: ConfigOprf
@@ -5,8 +5,11 @@ import inject
 
 from app.config import get_config
 from app.db.db import Database
+from app.metrics_exporter import MetricsExporter
 from app.services.auth.header import AuthHeaderService
+from app.services.health_prober import HealthCheck, HealthProber
 from app.services.hsm_key_cleanup_service import HsmKeyCleanupService
+from app.services.hsm_key_rotation_service import HsmKeyRotationService
 from app.services.hsm_key_version_service import HsmKeyVersionService
 from app.services.key_resolver import KeyResolver
 from app.services.mtls_service import MtlsService
@@ -18,6 +21,7 @@ from app.services.oprf.evaluators import (
 from app.services.oprf.oprf_service import OprfService
 from app.services.org_service import OrgService
 from app.services.pseudonym_service import PseudonymService
+from app.services.rate_limiter import RateLimiter
 from app.services.rid_service import RidService
 
 logger = logging.getLogger(__name__)
@@ -61,16 +65,28 @@ def container_config(binder: inject.Binder) -> None:
         max_overflow=config.database.max_overflow,
         pool_pre_ping=config.database.pool_pre_ping,
         pool_recycle=config.database.pool_recycle,
+        replica_dsns=config.database.replica_dsns,
+        replica_routing=config.database.replica_routing,
+        replica_max_lag=config.database.replica_max_lag,
+        replica_lag_check_interval=config.database.replica_lag_check_interval,
+        retry_backoff=config.database.retry_backoff,
+        external_pooler=config.database.external_pooler,
     )
     binder.bind(Database, db)
 
+    binder.bind(MetricsExporter, MetricsExporter(config.metrics))
+
     key_resolver = KeyResolver(db)
     binder.bind(KeyResolver, key_resolver)
 
     org_service = OrgService(db)
     binder.bind(OrgService, org_service)
 
-    mtls_service = MtlsService(config.app.mtls_override_cert, org_service)
+    mtls_service = MtlsService(
+        config.app.mtls_override_cert,
+        org_service,
+        cache_size=config.app.mtls_cert_cache_size,
+    )
     binder.bind(MtlsService, mtls_service)
 
     hsm_key_version_service = HsmKeyVersionService(db)
@@ -106,9 +122,27 @@ def container_config(binder: inject.Binder) -> None:
             )
         oprf_evaluator = LocalOprfEvaluator(base64.urlsafe_b64decode(key))
 
+    hsm_key_rotation_service = HsmKeyRotationService(
+        hsm_key_version_service,
+        oprf_evaluator if isinstance(oprf_evaluator, HsmOprfEvaluator) else None,
+        concurrency=config.oprf.hsm_provision_concurrency,
+        allowed_oins=config.app.key_rotation_oins,
+    )
+    binder.bind(HsmKeyRotationService, hsm_key_rotation_service)
+
     oprf_service = OprfService(oprf_evaluator)
     binder.bind(OprfService, oprf_service)
 
+    binder.bind(RateLimiter, RateLimiter(config.rate_limit))
+
+    health_checks: dict[str, HealthCheck] = {"database": db.health_error}
+    if config.oprf.hsm_url:
+        health_checks["hsm"] = oprf_service.health_error
+    health_prober = HealthProber(
+        health_checks, interval=config.app.health_probe_interval
+    )
+    binder.bind(HealthProber, health_prober)
+
     # This should be done through an HSM
     master_key = _load_master_key(config.pseudonym.master_key)
 
@@ -147,6 +181,18 @@ def get_database() -> Database:
     return inject.instance(Database)
 
 
+def get_metrics_exporter() -> MetricsExporter:
+    return inject.instance(MetricsExporter)
+
+
+def get_health_prober() -> HealthProber:
+    return inject.instance(HealthProber)
+
+
+def get_rate_limiter() -> RateLimiter:
+    return inject.instance(RateLimiter)
+
+
 def get_hsm_key_version_service() -> HsmKeyVersionService:
     return inject.instance(HsmKeyVersionService)
 
@@ -155,6 +201,10 @@ def get_hsm_key_cleanup_service() -> HsmKeyCleanupService:
     return inject.instance(HsmKeyCleanupService)
 
 
+def get_hsm_key_rotation_service() -> HsmKeyRotationService:
+    return inject.instance(HsmKeyRotationService)
+
+
 def get_auth_headers_service() -> AuthHeaderService:
     return inject.instance(AuthHeaderService)
 
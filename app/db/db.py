@@ -1,13 +1,133 @@
+import itertools
 import logging
+import threading
+import time
+from typing import Any
 
-from sqlalchemy import MetaData, StaticPool, create_engine, text
+from sqlalchemy import (
+    Engine,
+    MetaData,
+    NullPool,
+    QueuePool,
+    StaticPool,
+    create_engine,
+    make_url,
+    text,
+)
 from sqlalchemy.orm import Session
 
+from app.config import ReplicaRouting, get_config
 from app.db.entities.base import Base
+from app.db.pool import InstrumentedQueuePool, PoolTelemetry
 from app.db.session import DbSession
 
 logger = logging.getLogger(__name__)
 
+# Seconds a Postgres standby is behind its primary. A standby that has replayed
+# everything it received is considered up to date, even when the primary has
+# been idle and pg_last_xact_replay_timestamp() is old.
+_REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+def _create_engine(
+    dsn: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_pre_ping: bool,
+    pool_recycle: int,
+    external_pooler: bool = False,
+) -> Engine:
+    if "sqlite://" in dsn:
+        return create_engine(
+            dsn,
+            connect_args={"check_same_thread": False},
+            # This + static pool is needed for sqlite in-memory tables
+            poolclass=StaticPool,
+            echo=False,
+        )
+
+    if not external_pooler:
+        return create_engine(
+            dsn,
+            echo=False,
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+        )
+
+    # A pooler in transaction mode may run every transaction on a different
+    # server connection, so no state may outlive a transaction. psycopg would
+    # otherwise prepare frequently used statements on the server connection.
+    connect_args: dict[str, Any] = {}
+    if make_url(dsn).get_driver_name() == "psycopg":
+        connect_args["prepare_threshold"] = None
+
+    if pool_size == 0:
+        return create_engine(
+            dsn,
+            echo=False,
+            poolclass=NullPool,
+            pool_pre_ping=pool_pre_ping,
+            connect_args=connect_args,
+        )
+    return create_engine(
+        dsn,
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        connect_args=connect_args,
+    )
+
+
+class _Replica:
+    """
+    A read-only replica engine together with its last measured replication lag.
+    The lag is None when the replica could not be reached, or has not been
+    measured yet.
+    """
+
+    def __init__(self, engine: Engine, telemetry: PoolTelemetry) -> None:
+        self.engine = engine
+        self.telemetry = telemetry
+        self.lag: float | None = None
+        self.checked_at: float | None = None
+
+    def checked_out(self) -> int:
+        return self.telemetry.checked_out()
+
+    def refresh_lag(self) -> None:
+        self.lag = self._measure_lag()
+        self.checked_at = time.monotonic()
+
+    def _measure_lag(self) -> float | None:
+        if self.engine.dialect.name != "postgresql":
+            return 0.0
+        try:
+            with self.engine.connect() as connection:
+                return float(connection.execute(_REPLICA_LAG_QUERY).scalar_one())
+        except Exception as e:
+            logger.warning(
+                "database replica %s is not available: %s",
+                self.engine.url.render_as_string(hide_password=True),
+                e,
+            )
+            return None
+
 
 class Database:
     def __init__(
@@ -17,29 +137,55 @@ class Database:
         max_overflow: int = 10,
         pool_pre_ping: bool = False,
         pool_recycle: int = 3600,
+        replica_dsns: list[str] | None = None,
+        replica_routing: ReplicaRouting = ReplicaRouting.round_robin,
+        replica_max_lag: float = 5.0,
+        replica_lag_check_interval: float = 5.0,
+        retry_backoff: list[float] | None = None,
+        external_pooler: bool = False,
     ):
+        # Read once here instead of on every database operation
+        self.retry_backoff = tuple(
+            get_config().database.retry_backoff
+            if retry_backoff is None
+            else retry_backoff
+        )
+
         try:
-            if "sqlite://" in dsn:
-                self.engine = create_engine(
-                    dsn,
-                    connect_args={"check_same_thread": False},
-                    # This + static pool is needed for sqlite in-memory tables
-                    poolclass=StaticPool,
-                    echo=False,
+            self.engine = _create_engine(
+                dsn,
+                pool_size,
+                max_overflow,
+                pool_pre_ping,
+                pool_recycle,
+                external_pooler,
+            )
+            self._replicas = []
+            for index, replica_dsn in enumerate(replica_dsns or []):
+                engine = _create_engine(
+                    replica_dsn,
+                    pool_size,
+                    max_overflow,
+                    pool_pre_ping,
+                    pool_recycle,
+                    external_pooler,
                 )
-            else:
-                self.engine = create_engine(
-                    dsn,
-                    echo=False,
-                    pool_size=pool_size,
-                    max_overflow=max_overflow,
-                    pool_pre_ping=pool_pre_ping,
-                    pool_recycle=pool_recycle,
+                self._replicas.append(
+                    _Replica(engine, PoolTelemetry(engine, f"replica-{index}"))
                 )
         except BaseException as e:
             logger.exception("error while connecting to database")
             raise e
 
+        self.telemetry = PoolTelemetry(self.engine, "primary")
+
+        self._replica_routing = replica_routing
+        self._replica_max_lag = replica_max_lag
+        self._replica_lag_check_interval = replica_lag_check_interval
+        self._replica_counter = itertools.count()
+        self._lag_checks_stop = threading.Event()
+        self._lag_checks_thread: threading.Thread | None = None
+
     def generate_tables(self) -> None:
         logger.info("generating tables...")
         Base.metadata.create_all(self.engine)
@@ -80,5 +226,86 @@ class Database:
         """
         return self.health_error() is None
 
+    def warm_up(self) -> None:
+        """
+        Open pool_size connections in the pool of the primary and of every
+        replica, so the first requests don't pay for connecting.
+        """
+        for telemetry in self.pool_telemetry():
+            engine = telemetry.engine
+            size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 0
+            connections = []
+            try:
+                for _ in range(size):
+                    connections.append(engine.connect())
+            finally:
+                for connection in connections:
+                    connection.close()
+
+    def pool_telemetry(self) -> list[PoolTelemetry]:
+        """
+        Telemetry of the primary pool followed by the pools of the replicas
+        """
+        return [self.telemetry, *(replica.telemetry for replica in self._replicas)]
+
+    def start_lag_checks(self) -> None:
+        """
+        Measure the replication lag of the replicas from a background thread,
+        every replica_lag_check_interval seconds. Until the first measurement,
+        and without these checks, reads go to the primary.
+        """
+        if not self._replicas or self._lag_checks_thread is not None:
+            return
+        self._lag_checks_stop.clear()
+        self._lag_checks_thread = threading.Thread(
+            target=self._run_lag_checks, name="replica-lag", daemon=True
+        )
+        self._lag_checks_thread.start()
+
+    def stop_lag_checks(self) -> None:
+        self._lag_checks_stop.set()
+        if self._lag_checks_thread is not None:
+            self._lag_checks_thread.join()
+            self._lag_checks_thread = None
+
+    def check_replica_lag(self) -> None:
+        """Measure the replication lag of every replica once."""
+        for replica in self._replicas:
+            replica.refresh_lag()
+
+    def _run_lag_checks(self) -> None:
+        while True:
+            self.check_replica_lag()
+            if self._lag_checks_stop.wait(self._replica_lag_check_interval):
+                return
+
     def get_db_session(self) -> DbSession:
-        return DbSession(self.engine)
+        return DbSession(self.engine, self.retry_backoff)
+
+    def get_read_session(self) -> DbSession:
+        """
+        Returns a session for read-only queries. It is bound to one of the
+        configured replicas, or to the primary when there are no replicas or none
+        of them is reachable and within the allowed replication lag.
+
+        Never write through this session, and don't use it for reads that must
+        observe a write made just before.
+        """
+        return DbSession(self._read_engine(), self.retry_backoff)
+
+    def _read_engine(self) -> Engine:
+        candidates = []
+        # Only the last measurement of the background checks, never a query
+        for replica in self._replicas:
+            if replica.lag is not None and replica.lag <= self._replica_max_lag:
+                candidates.append(replica)
+
+        if not candidates:
+            if self._replicas:
+                logger.debug("no database replica available, reading from primary")
+            return self.engine
+
+        if self._replica_routing == ReplicaRouting.least_connections:
+            return min(candidates, key=lambda replica: replica.checked_out()).engine
+
+        return candidates[next(self._replica_counter) % len(candidates)].engine
@@ -0,0 +1,235 @@
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import ConnectionPoolEntry, PoolProxiedConnection, QueuePool
+
+from app.db.pool_advisor import PoolSizeRecommendation, recommend_pool_size
+from app.metrics import CACHE_REQUESTS, Counter, Gauge, Histogram
+
+"""
+Connection pool telemetry.
+
+Every engine created by Database is instrumented with SQLAlchemy pool events,
+which record how many connections are checked out, how far the pool runs into
+its overflow and how old the connections are that are handed out. Postgres
+engines use InstrumentedQueuePool, which additionally times how long callers
+wait for a connection. The concurrency seen at every checkout is kept so a pool
+size can be recommended from the actual load.
+
+Several engines may report under the same pool name (every Database has a
+"primary" pool); the gauges then report the total of the live ones.
+"""
+
+# Number of checkouts kept for the pool size recommendation
+_CONCURRENCY_SAMPLES = 10_000
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "prs_db_pool_checkout_wait_seconds",
+    "Time spent obtaining a connection from the pool, including opening one",
+    ("pool",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "prs_db_pool_checkout_timeouts_total",
+    "Checkouts that failed because the pool was exhausted",
+    ("pool",),
+)
+POOL_CONNECTION_AGE = Histogram(
+    "prs_db_pool_connection_age_seconds",
+    "Age of the connections handed out by the pool",
+    ("pool",),
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0),
+)
+POOL_CONNECTIONS_OPENED = Counter(
+    "prs_db_pool_connections_opened_total",
+    "Database connections opened by the pool",
+    ("pool",),
+)
+POOL_CHECKED_OUT = Gauge(
+    "prs_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ("pool",),
+)
+POOL_OVERFLOW = Gauge(
+    "prs_db_pool_overflow",
+    "Connections currently open beyond pool_size",
+    ("pool",),
+)
+POOL_SIZE = Gauge(
+    "prs_db_pool_size",
+    "Configured pool_size",
+    ("pool",),
+)
+POOL_RECOMMENDED_SIZE = Gauge(
+    "prs_db_pool_recommended_size",
+    "pool_size recommended from the observed concurrency",
+    ("pool",),
+)
+POOL_RECOMMENDED_OVERFLOW = Gauge(
+    "prs_db_pool_recommended_max_overflow",
+    "max_overflow recommended from the observed concurrency",
+    ("pool",),
+)
+
+# The live telemetry per pool name, see _register
+_telemetry: dict[str, "weakref.WeakSet[PoolTelemetry]"] = {}
+_telemetry_lock = threading.Lock()
+
+_STATEMENT_CACHE_RESULTS = {
+    CacheStats.CACHE_HIT: "hit",
+    CacheStats.CACHE_MISS: "miss",
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long every checkout took. SQLAlchemy has no pool
+    event that fires before a checkout, so this can't be done with events alone.
+    """
+
+    telemetry_name = "primary"
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=self.telemetry_name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(
+                time.perf_counter() - start, pool=self.telemetry_name
+            )
+
+    def recreate(self) -> QueuePool:
+        # Engine.dispose() replaces the pool by a recreated one
+        pool = super().recreate()
+        pool.telemetry_name = self.telemetry_name  # type: ignore[attr-defined]
+        return pool
+
+
+class PoolTelemetry:
+    """
+    Pool event listeners for a single engine, and the state they collect.
+    """
+
+    def __init__(
+        self, engine: Engine, name: str, samples: int = _CONCURRENCY_SAMPLES
+    ) -> None:
+        self.engine = engine
+        self.name = name
+        self._checked_out = 0
+        self._lock = threading.Lock()
+        self._concurrency: deque[int] = deque(maxlen=samples)
+
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.telemetry_name = name
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "after_cursor_execute", self._on_execute)
+
+        _register(self)
+
+    def checked_out(self) -> int:
+        return self._checked_out
+
+    def overflow(self) -> int:
+        pool = self.engine.pool
+        # QueuePool counts its overflow from -pool_size up
+        return max(0, pool.overflow()) if isinstance(pool, QueuePool) else 0
+
+    def size(self) -> int:
+        pool = self.engine.pool
+        return pool.size() if isinstance(pool, QueuePool) else 0
+
+    def recommend(self) -> PoolSizeRecommendation | None:
+        """
+        Recommend pool_size/max_overflow for the concurrency seen over the last
+        checkouts, or None when no connection has been checked out yet.
+        """
+        return recommend_pool_size(list(self._concurrency))
+
+    def _recommended(self, field: str) -> float:
+        recommendation = self.recommend()
+        return float(getattr(recommendation, field)) if recommendation else 0.0
+
+    def _on_connect(
+        self, dbapi_connection: Any, connection_record: ConnectionPoolEntry
+    ) -> None:
+        connection_record.info["connected_at"] = time.monotonic()
+        POOL_CONNECTIONS_OPENED.inc(pool=self.name)
+
+    def _on_checkout(
+        self,
+        dbapi_connection: Any,
+        connection_record: ConnectionPoolEntry,
+        connection_proxy: PoolProxiedConnection,
+    ) -> None:
+        with self._lock:
+            self._checked_out += 1
+            self._concurrency.append(self._checked_out)
+
+        connected_at = connection_record.info.get("connected_at")
+        if connected_at is not None:
+            POOL_CONNECTION_AGE.observe(time.monotonic() - connected_at, pool=self.name)
+
+    def _on_checkin(
+        self, dbapi_connection: Any, connection_record: ConnectionPoolEntry
+    ) -> None:
+        with self._lock:
+            self._checked_out = max(0, self._checked_out - 1)
+
+    def _on_execute(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        # Statements that can't be cached (no cache key, caching disabled) are
+        # not counted
+        cache_hit = getattr(context, "cache_hit", None)
+        if cache_hit in _STATEMENT_CACHE_RESULTS:
+            CACHE_REQUESTS.inc(
+                cache="sqlalchemy_statements",
+                result=_STATEMENT_CACHE_RESULTS[cache_hit],
+            )
+
+
+def _register(telemetry: PoolTelemetry) -> None:
+    """
+    Report the pool of telemetry in the pool gauges, together with the other
+    live engines of the same name instead of replacing them. The gauge
+    functions only hold weak references, so an engine that is gone no longer
+    counts.
+    """
+    name = telemetry.name
+    with _telemetry_lock:
+        instances = _telemetry.setdefault(name, weakref.WeakSet())
+        instances.add(telemetry)
+
+    def total(function: Callable[[PoolTelemetry], float]) -> Callable[[], float]:
+        return lambda: float(sum(function(t) for t in list(instances)))
+
+    def largest(field: str) -> Callable[[], float]:
+        return lambda: max(
+            (t._recommended(field) for t in list(instances)), default=0.0
+        )
+
+    # Set again on every registration, as the registry may have been cleared
+    POOL_CHECKED_OUT.set_function(total(PoolTelemetry.checked_out), pool=name)
+    POOL_OVERFLOW.set_function(total(PoolTelemetry.overflow), pool=name)
+    POOL_SIZE.set_function(total(PoolTelemetry.size), pool=name)
+    POOL_RECOMMENDED_SIZE.set_function(largest("pool_size"), pool=name)
+    POOL_RECOMMENDED_OVERFLOW.set_function(largest("max_overflow"), pool=name)
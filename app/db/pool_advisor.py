@@ -0,0 +1,52 @@
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PoolSizeRecommendation:
+    pool_size: int
+    max_overflow: int
+    # Concurrency observed at checkout time
+    observed_p95: int
+    observed_peak: int
+    samples: int
+
+
+def _percentile(values: Sequence[int], fraction: float) -> int:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def recommend_pool_size(
+    concurrency_samples: Sequence[int],
+    percentile: float = 0.95,
+    headroom: float = 1.25,
+    minimum: int = 1,
+) -> PoolSizeRecommendation | None:
+    """
+    Recommend pool_size/max_overflow from the number of connections that were
+    checked out at the same time, sampled on every checkout.
+
+    The steady pool is sized for the given percentile of the observed concurrency
+    plus headroom, so connections are not opened and closed for everyday load.
+    The overflow covers the remaining peak (with the same headroom), so bursts
+    wait in the pool instead of failing. Returns None without samples.
+    """
+    if not concurrency_samples:
+        return None
+
+    p95 = _percentile(concurrency_samples, percentile)
+    peak = max(concurrency_samples)
+
+    pool_size = max(minimum, math.ceil(p95 * headroom))
+    max_overflow = max(0, math.ceil(peak * headroom) - pool_size)
+
+    return PoolSizeRecommendation(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        observed_p95=p95,
+        observed_peak=peak,
+        samples=len(concurrency_samples),
+    )
@@ -1,11 +1,26 @@
 import logging
 import uuid
+from collections.abc import Sequence
 from datetime import datetime
-from typing import List
+from typing import Any, List, NamedTuple
 
-from sqlalchemy import and_, func, insert, literal, or_, select, update
+from sqlalchemy import (
+    DateTime,
+    Executable,
+    String,
+    and_,
+    bindparam,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    type_coerce,
+    true,
+    update,
+)
 from sqlalchemy.sql.elements import ColumnElement
-from sqlalchemy.orm import joinedload
 from app.db.decorator import repository
 from app.db.entities.hsm_key_versions import HsmKeyVersion
 from app.db.entities.organization import Organization
@@ -15,24 +30,124 @@ from app.models.oin import Oin
 logger = logging.getLogger(__name__)
 
 
-@repository(HsmKeyVersion)
-class HsmKeyVersionRepository(RepositoryBase):
-    @staticmethod
-    def _active_filter(at: datetime) -> ColumnElement[bool]:
-        return and_(
-            HsmKeyVersion.removed.is_(False),
-            HsmKeyVersion.from_dt <= at,
-            or_(HsmKeyVersion.until_dt.is_(None), HsmKeyVersion.until_dt > at),
-        )
+def _active_filter(at: datetime | ColumnElement[datetime]) -> ColumnElement[bool]:
+    return and_(
+        HsmKeyVersion.removed.is_(False),
+        HsmKeyVersion.from_dt <= at,
+        or_(HsmKeyVersion.until_dt.is_(None), HsmKeyVersion.until_dt > at),
+    )
+
+
+def _expired_filter(at: datetime) -> ColumnElement[bool]:
+    return and_(
+        HsmKeyVersion.removed.is_(False),
+        HsmKeyVersion.until_dt.is_not(None),
+        HsmKeyVersion.until_dt <= at,
+    )
+
+
+class ExpiredHsmKeyVersion(NamedTuple):
+    """An expired key version, without loading the entity and its organization."""
+
+    id: uuid.UUID
+    # As stored, so a single invalid OIN does not fail the whole page
+    oin: str
+    version: int
+    until_dt: datetime
+
+
+class RotatedHsmKeyVersion(NamedTuple):
+    """A key version created by a bulk rotation, or one that has yet to start."""
+
+    id: uuid.UUID
+    oin: str
+    version: int
+    from_dt: datetime
+
+
+def _organizations_filter(oins: Sequence[Oin] | None) -> ColumnElement[bool]:
+    """Restricts the key versions to organizations with the given OINs; None is all."""
+    if oins is None:
+        return true()
+    return HsmKeyVersion.organization_id.in_(
+        select(Organization.id).where(Organization.oin.in_(oins))
+    )
+
+
+# The statements of the request path are built once, with bound parameters for
+# every value, so executing them hits SQLAlchemy's compiled statement cache
+# without building and hashing a new query each time.
+_AT = bindparam("at", type_=DateTime(timezone=True))
+_ORGANIZATION_ID = bindparam(
+    "organization_id", type_=HsmKeyVersion.organization_id.type
+)
 
-    @staticmethod
-    def _expired_filter(at: datetime) -> ColumnElement[bool]:
-        return and_(
-            HsmKeyVersion.removed.is_(False),
-            HsmKeyVersion.until_dt.is_not(None),
-            HsmKeyVersion.until_dt <= at,
+_GET_ACTIVE_VERSIONS = (
+    select(HsmKeyVersion)
+    .where(HsmKeyVersion.organization_id == _ORGANIZATION_ID, _active_filter(_AT))
+    .order_by(HsmKeyVersion.version)
+)
+
+_GET_ACTIVE_VERSIONS_BY_OIN = (
+    select(HsmKeyVersion)
+    .join(HsmKeyVersion.organization)
+    .where(Organization.oin == bindparam("oin"), _active_filter(_AT))
+    .order_by(HsmKeyVersion.version)
+)
+
+
+def _active_or_create_version_numbers() -> Executable:
+    active_versions = (
+        select(HsmKeyVersion.version)
+        .where(HsmKeyVersion.organization_id == _ORGANIZATION_ID, _active_filter(_AT))
+        .order_by(HsmKeyVersion.version)
+        .cte("active_versions")
+    )
+
+    next_version = (
+        select(func.max(HsmKeyVersion.version) + 1)
+        .where(HsmKeyVersion.organization_id == _ORGANIZATION_ID)
+        .scalar_subquery()
+    )
+
+    created_versions = (
+        insert(HsmKeyVersion)
+        .from_select(
+            [
+                HsmKeyVersion.id,
+                HsmKeyVersion.organization_id,
+                HsmKeyVersion.version,
+                HsmKeyVersion.from_dt,
+                HsmKeyVersion.until_dt,
+                HsmKeyVersion.removed,
+            ],
+            select(
+                bindparam("new_id", type_=HsmKeyVersion.id.type),
+                _ORGANIZATION_ID,
+                func.coalesce(next_version, 1),
+                _AT,
+                literal(None),
+                literal(False),
+            ).where(~select(active_versions.c.version).limit(1).exists()),
         )
+        .returning(HsmKeyVersion.version)
+        .cte("created_version")
+    )
+
+    rows = (
+        select(active_versions.c.version)
+        .union_all(select(created_versions.c.version))
+        .order_by(active_versions.c.version)
+    )
+
+    return select(HsmKeyVersion.version).from_statement(rows)
+
 
+_GET_ACTIVE_OR_CREATE_VERSION_NUMBERS = _active_or_create_version_numbers()
+
+
+@repository(HsmKeyVersion)
+class HsmKeyVersionRepository(RepositoryBase):
     def get_active_versions(
         self,
         at: datetime,
@@ -43,15 +158,10 @@ class HsmKeyVersionRepository(RepositoryBase):
         removed, already started (from_dt <= at) and not yet ended (until_dt is
         unset or still in the future), restricted to organization_id.
         """
-        query = (
-            select(HsmKeyVersion)
-            .where(
-                HsmKeyVersion.organization_id == organization_id,
-                HsmKeyVersionRepository._active_filter(at),
-            )
-            .order_by(HsmKeyVersion.version)
+        result = self.db_session.execute(
+            _GET_ACTIVE_VERSIONS, {"at": at, "organization_id": organization_id}
         )
-        return list(self.db_session.execute(query).scalars().all())
+        return list(result.scalars().all())
 
     def get_active_versions_by_organization_oin(
         self,
@@ -61,42 +171,105 @@ class HsmKeyVersionRepository(RepositoryBase):
         """
         Returns all active key versions for the organization with the provided OIN.
         """
+        result = self.db_session.execute(
+            _GET_ACTIVE_VERSIONS_BY_OIN, {"at": at, "oin": organization_oin}
+        )
+        return list(result.scalars().all())
+
+    def get_page_by_organization_id(
+        self,
+        organization_id: uuid.UUID,
+        after: tuple[int, uuid.UUID] | None,
+        limit: int,
+    ) -> List[dict[str, Any]]:
+        """
+        Returns up to limit key versions of the organization, as the dicts of
+        HsmKeyVersion.to_dict without loading the entities, ordered by (version,
+        id) and starting after the given (version, id).
+        """
         query = (
-            select(HsmKeyVersion)
-            .join(HsmKeyVersion.organization)
-            .where(
-                Organization.oin == organization_oin,
-                HsmKeyVersionRepository._active_filter(at),
+            select(
+                HsmKeyVersion.id,
+                HsmKeyVersion.version,
+                HsmKeyVersion.from_dt,
+                HsmKeyVersion.until_dt,
+                HsmKeyVersion.removed,
             )
-            .order_by(HsmKeyVersion.version)
+            .where(HsmKeyVersion.organization_id == organization_id)
+            .order_by(HsmKeyVersion.version, HsmKeyVersion.id)
+            .limit(limit)
         )
-        return list(self.db_session.execute(query).scalars().all())
+        if after is not None:
+            query = query.where(
+                tuple_(HsmKeyVersion.version, HsmKeyVersion.id) > tuple_(*after)
+            )
+        return [dict(row) for row in self.db_session.execute(query).mappings()]
 
-    def get_by_organization_id(self, organization_id: uuid.UUID) -> List[HsmKeyVersion]:
+    def get_expired_versions_page(
+        self,
+        at: datetime,
+        after: ExpiredHsmKeyVersion | None,
+        limit: int,
+    ) -> List[ExpiredHsmKeyVersion]:
         """
-        Returns all key versions for the given organization UUID, regardless of
-        date or removed state, ordered by version number.
+        Returns up to `limit` expired key versions ordered by end date and id,
+        starting after the given version (keyset pagination). Versions that are
+        marked removed in the meantime do not shift the following pages.
         """
         query = (
-            select(HsmKeyVersion)
-            .where(HsmKeyVersion.organization_id == organization_id)
-            .order_by(HsmKeyVersion.version)
+            select(
+                HsmKeyVersion.id,
+                type_coerce(Organization.oin, String),
+                HsmKeyVersion.version,
+                HsmKeyVersion.until_dt,
+            )
+            .join(HsmKeyVersion.organization)
+            .where(_expired_filter(at))
+            .order_by(HsmKeyVersion.until_dt, HsmKeyVersion.id)
+            .limit(limit)
         )
-        return list(self.db_session.execute(query).scalars().all())
+        if after is not None:
+            query = query.where(
+                tuple_(HsmKeyVersion.until_dt, HsmKeyVersion.id)
+                > tuple_(after.until_dt, after.id)
+            )
+        return [
+            ExpiredHsmKeyVersion._make(row)
+            for row in self.db_session.execute(query).all()
+        ]
 
-    def get_expired_versions(self, at: datetime) -> List[HsmKeyVersion]:
+    def get_upcoming_versions_page(
+        self,
+        at: datetime,
+        after: RotatedHsmKeyVersion | None,
+        limit: int,
+    ) -> List[RotatedHsmKeyVersion]:
         """
-        Returns all key versions that have passed their end date (until_dt is set
-        and in the past) but have not been removed yet.
+        Returns up to `limit` key versions that start after `at` and have not
+        been removed, ordered by start date and id, starting after the given
+        version (keyset pagination).
         """
         query = (
-            select(HsmKeyVersion)
-            .where(
-                HsmKeyVersionRepository._expired_filter(at),
+            select(
+                HsmKeyVersion.id,
+                type_coerce(Organization.oin, String),
+                HsmKeyVersion.version,
+                HsmKeyVersion.from_dt,
             )
-            .options(joinedload(HsmKeyVersion.organization))
+            .join(HsmKeyVersion.organization)
+            .where(HsmKeyVersion.removed.is_(False), HsmKeyVersion.from_dt > at)
+            .order_by(HsmKeyVersion.from_dt, HsmKeyVersion.id)
+            .limit(limit)
         )
-        return list(self.db_session.execute(query).scalars().all())
+        if after is not None:
+            query = query.where(
+                tuple_(HsmKeyVersion.from_dt, HsmKeyVersion.id)
+                > tuple_(after.from_dt, after.id)
+            )
+        return [
+            RotatedHsmKeyVersion._make(row)
+            for row in self.db_session.execute(query).all()
+        ]
 
     def get_active_or_create_version_numbers_by_organization_id(
         self,
@@ -108,57 +281,11 @@ class HsmKeyVersionRepository(RepositoryBase):
         active version exists, atomically creates a new one and returns its
         version number.
         """
-        active_versions = (
-            select(HsmKeyVersion.version)
-            .where(
-                HsmKeyVersion.organization_id == organization_id,
-                HsmKeyVersionRepository._active_filter(at),
-            )
-            .order_by(HsmKeyVersion.version)
-            .cte("active_versions")
-        )
-
-        next_version = (
-            select(func.max(HsmKeyVersion.version) + 1)
-            .where(HsmKeyVersion.organization_id == organization_id)
-            .scalar_subquery()
-        )
-
-        created_versions = (
-            insert(HsmKeyVersion)
-            .from_select(
-                [
-                    HsmKeyVersion.id,
-                    HsmKeyVersion.organization_id,
-                    HsmKeyVersion.version,
-                    HsmKeyVersion.from_dt,
-                    HsmKeyVersion.until_dt,
-                    HsmKeyVersion.removed,
-                ],
-                select(
-                    literal(uuid.uuid4()),
-                    literal(organization_id),
-                    func.coalesce(next_version, 1),
-                    literal(at),
-                    literal(None),
-                    literal(False),
-                ).where(~select(active_versions.c.version).limit(1).exists()),
-            )
-            .returning(HsmKeyVersion.version)
-            .cte("created_version")
-        )
-
-        rows = (
-            select(active_versions.c.version)
-            .union_all(select(created_versions.c.version))
-            .order_by(active_versions.c.version)
-        )
-
-        return list(
-            self.db_session.execute(select(HsmKeyVersion.version).from_statement(rows))
-            .scalars()
-            .all()
+        result = self.db_session.execute(
+            _GET_ACTIVE_OR_CREATE_VERSION_NUMBERS,
+            {"new_id": uuid.uuid4(), "organization_id": organization_id, "at": at},
         )
+        return list(result.scalars().all())
 
     def create(
         self,
@@ -274,3 +401,114 @@ class HsmKeyVersionRepository(RepositoryBase):
         logger.info("marked hsm key version %s as removed", version_id)
 
         return entry
+
+    def mark_removed_many(self, version_ids: Sequence[uuid.UUID]) -> int:
+        """
+        Flags the given key versions as removed in a single statement. Returns
+        the number of versions that were not removed yet.
+        """
+        if not version_ids:
+            return 0
+        statement = (
+            update(HsmKeyVersion)
+            .where(
+                and_(
+                    HsmKeyVersion.id.in_(version_ids),
+                    HsmKeyVersion.removed.is_(False),
+                )
+            )
+            .values(removed=True)
+            .execution_options(synchronize_session=False)
+        )
+        result = self.db_session.execute(statement)
+        updated: int = result.rowcount  # type: ignore[attr-defined]
+        logger.info("marked %d hsm key version(s) as removed", updated)
+        return updated
+
+    def get_missing_oins(self, oins: Sequence[Oin]) -> List[Oin]:
+        """Returns the OINs, of those given, that have no organization."""
+        query = select(Organization.oin).where(Organization.oin.in_(oins))
+        existing = set(self.db_session.execute(query).scalars())
+        return [oin for oin in oins if oin not in existing]
+
+    def end_versions(self, until_dt: datetime, oins: Sequence[Oin] | None) -> int:
+        """
+        Ends the key versions of the organizations with the given OINs (None is
+        all organizations) at until_dt, in a single statement. Versions that end
+        earlier already, or only start at until_dt, are left alone. Returns the
+        number of versions that were ended.
+        """
+        statement = (
+            update(HsmKeyVersion)
+            .where(
+                _organizations_filter(oins),
+                HsmKeyVersion.removed.is_(False),
+                HsmKeyVersion.from_dt < until_dt,
+                or_(
+                    HsmKeyVersion.until_dt.is_(None),
+                    HsmKeyVersion.until_dt > until_dt,
+                ),
+            )
+            .values(until_dt=until_dt)
+            .execution_options(synchronize_session=False)
+        )
+        result = self.db_session.execute(statement)
+        ended: int = result.rowcount  # type: ignore[attr-defined]
+        logger.info("ended %d hsm key version(s) at %s", ended, until_dt)
+        return ended
+
+    def create_next_versions(
+        self, from_dt: datetime, oins: Sequence[Oin] | None
+    ) -> List[RotatedHsmKeyVersion]:
+        """
+        Creates the next key version, starting at from_dt, for every
+        organization with one of the given OINs (None is all organizations) in
+        a single INSERT ... SELECT. Returns the created versions ordered by OIN.
+        """
+        next_version = func.coalesce(
+            select(func.max(HsmKeyVersion.version))
+            .where(HsmKeyVersion.organization_id == Organization.id)
+            .scalar_subquery(),
+            0,
+        )
+        created = (
+            insert(HsmKeyVersion)
+            .from_select(
+                [
+                    HsmKeyVersion.id,
+                    HsmKeyVersion.organization_id,
+                    HsmKeyVersion.version,
+                    HsmKeyVersion.from_dt,
+                    HsmKeyVersion.removed,
+                ],
+                select(
+                    func.gen_random_uuid(),
+                    Organization.id,
+                    next_version + 1,
+                    literal(from_dt, DateTime(timezone=True)),
+                    literal(False),
+                ).where(true() if oins is None else Organization.oin.in_(oins)),
+                # uuid.uuid4 as a default would give every row the same id
+                include_defaults=False,
+            )
+            .returning(
+                HsmKeyVersion.id,
+                HsmKeyVersion.organization_id,
+                HsmKeyVersion.version,
+                HsmKeyVersion.from_dt,
+            )
+            .cte("created")
+        )
+        query = (
+            select(
+                created.c.id,
+                type_coerce(Organization.oin, String),
+                created.c.version,
+                created.c.from_dt,
+            )
+            .join(Organization, Organization.id == created.c.organization_id)
+            .order_by(Organization.oin)
+        )
+        rows = self.db_session.execute(query).all()
+        logger.info("created %d hsm key version(s) from %s", len(rows), from_dt)
+        return [RotatedHsmKeyVersion._make(row) for row in rows]
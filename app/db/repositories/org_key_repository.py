@@ -1,8 +1,8 @@
 import logging
 import uuid
-from typing import List
+from typing import Any, List
 
-from sqlalchemy import and_, delete, literal, or_, select, update
+from sqlalchemy import and_, bindparam, delete, literal, or_, select, update
 from sqlalchemy.dialects.postgresql.json import JSONB
 
 from app.db.decorator import repository
@@ -11,6 +11,17 @@ from app.db.repositories.repository_base import RepositoryBase
 
 logger = logging.getLogger(__name__)
 
+_GET = (
+    select(OrganizationKey)
+    .where(OrganizationKey.organization_id == bindparam("org_id"))
+    .where(
+        or_(
+            OrganizationKey.scope.contains(bindparam("scope", type_=JSONB)),
+            OrganizationKey.scope.contains(literal(["*"], JSONB)),
+        )
+    )
+)
+
 
 @repository(OrganizationKey)
 class OrganizationKeyRepository(RepositoryBase):
@@ -19,17 +30,11 @@ class OrganizationKeyRepository(RepositoryBase):
         Fetches the key entry by organization and scope.
         If a key entry has scope *, it will match everything
         """
-        query = (
-            select(OrganizationKey)
-            .where(OrganizationKey.organization_id == org_id)
-            .where(
-                or_(
-                    OrganizationKey.scope.contains(literal([scope], JSONB)),
-                    OrganizationKey.scope.contains(literal(["*"], JSONB)),
-                )
-            )
+        return (
+            self.db_session.execute(_GET, {"org_id": org_id, "scope": [scope]})
+            .scalars()
+            .first()
         )
-        return self.db_session.execute(query).scalars().first()
 
     def get_by_id(self, key_id: uuid.UUID) -> OrganizationKey | None:
         """
@@ -38,12 +43,34 @@ class OrganizationKeyRepository(RepositoryBase):
         query = select(OrganizationKey).where(OrganizationKey.id == key_id)
         return self.db_session.execute(query).scalars().first()
 
-    def get_by_org(self, org_id: uuid.UUID) -> List[OrganizationKey]:
+    def get_all(self) -> List[OrganizationKey]:
         """
-        Fetches all key entries for a given organization.
+        Fetches all key entries.
         """
-        query = select(OrganizationKey).where(OrganizationKey.organization_id == org_id)
-        return list(self.db_session.execute(query).scalars().all())
+        return list(self.db_session.execute(select(OrganizationKey)).scalars().all())
+
+    def get_page_by_org(
+        self, org_id: uuid.UUID, after: uuid.UUID | None, limit: int
+    ) -> List[dict[str, Any]]:
+        """
+        Fetches up to limit key entries of an organization, as the dicts of
+        OrganizationKey.to_dict without loading the entities, ordered by id and
+        starting after the given id.
+        """
+        query = (
+            select(
+                OrganizationKey.id,
+                OrganizationKey.scope,
+                OrganizationKey.key_data,
+                OrganizationKey.key_id,
+            )
+            .where(OrganizationKey.organization_id == org_id)
+            .order_by(OrganizationKey.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(OrganizationKey.id > after)
+        return [dict(row) for row in self.db_session.execute(query).mappings()]
 
     def has_overlapping_scope(
         self,
@@ -1,6 +1,6 @@
 import logging
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 
 from app.db.decorator import repository
 from app.db.entities.organization import Organization
@@ -9,6 +9,10 @@ from app.models.oin import Oin
 
 logger = logging.getLogger(__name__)
 
+# Built once, so executing it only binds the parameters: SQLAlchemy finds the
+# compiled form in its statement cache without building and hashing a new query.
+_GET_BY_OIN = select(Organization).where(Organization.oin == bindparam("oin"))
+
 
 @repository(Organization)
 class OrgRepository(RepositoryBase):
@@ -16,8 +20,7 @@ class OrgRepository(RepositoryBase):
         """
         Fetches the organization by its unique ID.
         """
-        query = select(Organization).where(Organization.oin == oin)
-        return self.db_session.execute(query).scalars().first()
+        return self.db_session.execute(_GET_BY_OIN, {"oin": oin}).scalars().first()
 
     def create(self, oin: Oin, name: str, max_usage_level: str) -> Organization:
         """
@@ -1,5 +1,6 @@
 import logging
 import random
+from collections.abc import Sequence
 from time import sleep
 from typing import Any, Callable, Type, TypeVar
 
@@ -7,10 +8,11 @@ from sqlalchemy import Engine, Result
 from sqlalchemy.exc import DatabaseError, OperationalError, PendingRollbackError
 from sqlalchemy.orm import Session
 
-from app.config import get_config
+from app import deadline, timing, tracing
 from app.db.entities.base import Base
 from app.db.repositories import repository_base
 from app.logging.events import SYS_DB_CONNECTION_FAILED, log_event
+from app.metrics import Counter
 
 """
 This module contains the DbSession class, which is a context manager that provides a session to interact with
@@ -31,10 +33,44 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# Maximum random jitter (in seconds) added to every retry backoff
+_RETRY_JITTER = 0.1
+
+DB_RETRIES = Counter(
+    "prs_db_retries_total",
+    "Database operations retried after a transient error",
+    ("error_type",),
+)
+DB_RETRY_SLEEP = Counter(
+    "prs_db_retry_sleep_seconds_total",
+    "Time spent sleeping between database retries",
+)
+DB_RETRIES_EXHAUSTED = Counter(
+    "prs_db_retries_exhausted_total",
+    "Database operations given up on, by reason (attempts or deadline)",
+    ("reason",),
+)
+
+
+class DeadlineExceededError(DatabaseError):
+    """
+    Raised when a database operation keeps failing and the next retry would run
+    past the deadline of the current request.
+    """
+
+    def __init__(self, attempts: int, error: Exception) -> None:
+        super().__init__(
+            f"Operation failed after {attempts} attempt(s): request deadline exceeded",
+            None,
+            error,
+        )
+        self.attempts = attempts
+
 
 class DbSession:
-    def __init__(self, engine: Engine) -> None:
+    def __init__(self, engine: Engine, retry_backoff: Sequence[float] = ()) -> None:
         self._engine = engine
+        self._retry_backoff = retry_backoff
 
     def __enter__(self) -> "DbSession":
         """
@@ -111,14 +147,15 @@ class DbSession:
         """
         return self._retry(self.session.query, *entities)
 
-    def execute(self, stmt: Any) -> Result[Any]:
+    def execute(self, stmt: Any, params: dict[str, Any] | None = None) -> Result[Any]:
         """
         Execute a statement in the current session
 
         :param stmt:
+        :param params: values for the bound parameters of the statement
         :return:
         """
-        return self._retry(self.session.execute, stmt)
+        return self._retry(self.session.execute, stmt, params)
 
     def begin(self) -> Any:
         """
@@ -130,15 +167,18 @@ class DbSession:
 
     def _retry(self, f: Callable[..., T], *args: Any, **kwargs: Any) -> T:
         """
-        Retry a function call in case of database errors
+        Retry a function call in case of database errors. Gives up when the
+        backoff list is exhausted, or earlier when the next attempt would start
+        after the deadline of the current request.
         """
-        backoff = get_config().database.retry_backoff
+        backoff = self._retry_backoff
         attempt = 0
 
         while True:
             error: Exception
             try:
-                return f(*args, **kwargs)
+                with timing.phase(timing.DB), tracing.span(f"db.{f.__name__}"):
+                    return f(*args, **kwargs)
             except PendingRollbackError as e:
                 logger.warning("retrying operation due to PendingRollbackError: %s", e)
                 self.session.rollback()
@@ -156,6 +196,7 @@ class DbSession:
             attempt += 1
             if len(backoff) == 0:
                 logger.error("operation failed after all retries")
+                DB_RETRIES_EXHAUSTED.inc(reason="attempts")
                 log_event(
                     logger,
                     SYS_DB_CONNECTION_FAILED,
@@ -168,6 +209,21 @@ class DbSession:
                     "Operation failed after all retries", None, BaseException()
                 )
 
+            delay = backoff[0] + random.uniform(0, _RETRY_JITTER)
+            remaining = deadline.remaining()
+            if remaining is not None and remaining < delay:
+                logger.error("operation failed: request deadline exceeded")
+                DB_RETRIES_EXHAUSTED.inc(reason="deadline")
+                log_event(
+                    logger,
+                    SYS_DB_CONNECTION_FAILED,
+                    "Database connection lost: giving up, request deadline exceeded",
+                    datastore="prs-database",
+                    error_type=type(error).__name__,
+                    retry_attempt=attempt,
+                )
+                raise DeadlineExceededError(attempt, error)
+
             log_event(
                 logger,
                 SYS_DB_CONNECTION_FAILED,
@@ -177,5 +233,7 @@ class DbSession:
                 retry_attempt=attempt,
                 backoff_seconds=backoff[0],
             )
-            sleep(backoff[0] + random.uniform(0, 0.1))
+            DB_RETRIES.inc(error_type=type(error).__name__)
+            DB_RETRY_SLEEP.inc(delay)
+            sleep(delay)
             backoff = backoff[1:]
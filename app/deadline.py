@@ -0,0 +1,49 @@
+"""
+Per-request deadlines.
+
+RequestContextMiddleware binds a deadline (a ``time.monotonic()`` timestamp) for
+every request. Code that may block or retry, such as the database retry loop,
+checks the remaining budget so it stops working for a client that already gave
+up.
+"""
+
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+deadline_var: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def remaining() -> float | None:
+    """
+    Seconds left until the deadline of the current request, or None when no
+    deadline is bound (e.g. outside a request). Can be negative once the deadline
+    has passed.
+    """
+    deadline = deadline_var.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def bind_deadline(timeout: float | None) -> Generator[None]:
+    """
+    Bind a deadline timeout seconds from now for the duration of the block. A
+    timeout of None binds no deadline. An already bound, earlier deadline is kept.
+    """
+    if timeout is None:
+        yield
+        return
+
+    deadline = time.monotonic() + timeout
+    current = deadline_var.get()
+    if current is not None:
+        deadline = min(deadline, current)
+
+    token = deadline_var.set(deadline)
+    try:
+        yield
+    finally:
+        deadline_var.reset(token)
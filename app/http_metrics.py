@@ -0,0 +1,59 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import Gauge, Histogram
+
+# Requests that matched no route are counted together, so probing random paths
+# can't create an unbounded number of label values.
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "prs_http_request_duration_seconds",
+    "Request latency by route template, method and status",
+    ("route", "method", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "prs_http_requests_in_flight",
+    "Requests currently being handled",
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the latency of every HTTP request, labelled by the template of the
+    matched route (e.g. /administration/keys/{key_id}) rather than the actual
+    path, and keeps the number of requests in flight.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # An exception escaping the app becomes a 500 further up the stack
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                route=route,
+                method=scope["method"],
+                status=str(status_code),
+            )
@@ -1,15 +1,20 @@
 from typing import Any
 
-from app.config import ConfigLogging
+from app.config import ConfigLogging, JsonEncoder, SyslogTransport
 from app.logging.filters import (
     AppFilter,
     LoggingStreams,
     PublicInspectFilter,
+    RateLimitFilter,
     SiemFilter,
 )
 from app.logging.formatter import JsonFormatter, PlainTextFormatter
 
 
+# Loggers that get handlers from the configuration; None is the root logger
+CONFIGURED_LOGGERS: tuple[str | None, ...] = ("app", "uvicorn", "uvicorn.error", None)
+
+
 class LogConfigBuilder:
     def __init__(
         self,
@@ -28,6 +33,18 @@ class LogConfigBuilder:
             "address": (host, int(port_str)),
             "formatter": formatter,
         }
+        transport = self.logging_config.syslog_transport
+        if transport != SyslogTransport.udp:
+            cfg.update(
+                {
+                    "class": "app.logging.transport.StreamSyslogHandler",
+                    "tls": transport == SyslogTransport.tls,
+                    "ca_file": self.logging_config.syslog_tls_ca_file,
+                    "batch_bytes": self.logging_config.syslog_batch_bytes,
+                    "flush_interval": self.logging_config.syslog_flush_interval,
+                    "buffer_size": self.logging_config.syslog_buffer_size,
+                }
+            )
         if filters:
             cfg["filters"] = filters
         return cfg
@@ -130,13 +147,25 @@ class LogConfigBuilder:
 
         # Stamp every JSON record with the configured application id so the
         # log server can tell apart applications sharing the syslog channel.
-        if self.logging_config.application_id:
-            for formatter in conf["formatters"].values():
-                if formatter["()"] is JsonFormatter:
-                    formatter["application_id"] = self.logging_config.application_id
+        for formatter in conf["formatters"].values():
+            if formatter["()"] is not JsonFormatter:
+                continue
+            if self.logging_config.application_id:
+                formatter["application_id"] = self.logging_config.application_id
+            if self.logging_config.json_encoder != JsonEncoder.json:
+                formatter["json_encoder"] = self.logging_config.json_encoder
 
         self._add_log_handlers(conf)
 
+        if self.logging_config.rate_limit_burst:
+            conf["filters"]["rate_limit_filter"] = {
+                "()": RateLimitFilter,
+                "burst": self.logging_config.rate_limit_burst,
+                "interval": self.logging_config.rate_limit_interval,
+            }
+            for handler in conf["handlers"].values():
+                handler["filters"] = [*handler.get("filters", []), "rate_limit_filter"]
+
         return conf
 
     def _add_log_handlers(self, conf: dict[str, Any]) -> None:
@@ -160,6 +189,23 @@ class LogConfigBuilder:
         conf["handlers"]["syslog_siem"] = self._syslog_handler(
             path, formatter="json_siem", filters=["siem_filter"]
         )
+        if self.logging_config.siem_spool_dir:
+            # SIEM records go through the disk spool and are shipped in the
+            # background, so they survive collector outages and restarts
+            conf["handlers"]["syslog_siem"] = {
+                "class": "app.logging.spool.SpoolHandler",
+                "address": conf["handlers"]["syslog_siem"]["address"],
+                "formatter": "json_siem",
+                "filters": ["siem_filter"],
+                "transport": self.logging_config.syslog_transport,
+                "ca_file": self.logging_config.syslog_tls_ca_file,
+                "directory": self.logging_config.siem_spool_dir,
+                "max_bytes": self.logging_config.siem_spool_max_bytes,
+                "segment_bytes": self.logging_config.siem_spool_segment_bytes,
+                "fsync_interval": self.logging_config.siem_spool_fsync_interval,
+                "overflow": self.logging_config.siem_spool_overflow,
+                "block_timeout": self.logging_config.siem_spool_block_timeout,
+            }
         app_logger_handlers.append("syslog_siem")
 
         conf["handlers"]["syslog_public_inspect"] = self._syslog_handler(
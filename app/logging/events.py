@@ -4,6 +4,7 @@ from dataclasses import dataclass, field
 from typing import Any
 
 from app.logging.filters import LoggingStreams
+from app.logging.formatter import ALWAYS_KEEP_FIELDS
 
 _APP = LoggingStreams.APP
 _SIEM = LoggingStreams.SIEM
@@ -18,6 +19,18 @@ class PRSEvent:
     # When empty, no per-field routing is applied and every field is sent to all
     # streams in ``streams``.
     fields: Mapping[LoggingStreams, tuple[str, ...]] = field(default_factory=dict)
+    # The fields allowed per stream, including the correlation metadata that is
+    # always kept. Computed once so the formatters don't have to per record.
+    allowed_fields: Mapping[LoggingStreams, frozenset[str]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        allowed = {
+            stream: frozenset(names) | ALWAYS_KEEP_FIELDS
+            for stream, names in self.fields.items()
+        }
+        object.__setattr__(self, "allowed_fields", allowed)
 
 
 # OPRF exchange events (PRS-OPRF), see
@@ -138,6 +151,21 @@ SYS_HSM_UNREACHABLE = PRSEvent(  # PRS-SYS-006
         _SIEM: ("error_reason",),
     },
 )
+SYS_LOAD_SHED = PRSEvent(  # PRS-SYS-008
+    "270408",
+    logging.WARNING,
+    (_APP, _SIEM),
+    {
+        _APP: (
+            "endpoint_class",
+            "reason",
+            "concurrency_limit",
+            "queue_size",
+            "service_time_ms",
+        ),
+        _SIEM: ("endpoint_class", "reason"),
+    },
+)
 
 ACCESS_REQUEST = PRSEvent("001000", logging.INFO, (LoggingStreams.APP,))
 
@@ -152,9 +180,9 @@ def log_event(
 ) -> None:
     extra: dict[str, Any] = {
         "event_id": event.event_id,
-        "stream": list(event.streams),
+        "stream": event.streams,
     }
     if event.fields:
-        extra["field_streams"] = event.fields
+        extra["field_streams"] = event.allowed_fields
     extra.update(fields)
     logger.log(event.level, message, extra=extra, exc_info=exc_info)
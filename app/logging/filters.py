@@ -1,9 +1,28 @@
+import atexit
 import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from enum import Enum
 
+from app.metrics import Counter
+
 _LOGGER_ACCESS = "app.access"
 _UVICORN_LOGGERS = {"uvicorn", "uvicorn.error"}
 
+# Attribute in which RateLimitFilter keeps its decision for a record
+RATE_LIMIT_ATTR = "_prs_rate_limit"
+# Attribute in which QueueingHandler keeps the message template of a record,
+# as it replaces msg with the formatted message
+TEMPLATE_ATTR = "_prs_template"
+
+LOG_RECORDS_SUPPRESSED = Counter(
+    "prs_log_records_suppressed_total",
+    "Log records suppressed by the rate limit",
+    ("logger",),
+)
+
 
 class LoggingStreams(Enum):
     PUBLIC_INSPECT = 1
@@ -26,3 +45,136 @@ class PublicInspectFilter(logging.Filter):
 class SiemFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
         return LoggingStreams.SIEM in getattr(record, "stream", [])
+
+
+@dataclass(slots=True)
+class _Window:
+    start: float
+    levelno: int
+    count: int = field(default=0)
+    suppressed: int = field(default=0)
+
+
+_Summary = tuple[tuple[str, str], _Window]
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes at most burst records per interval seconds with the same logger and
+    message template, so a flood of bad requests does not turn logging into the
+    bottleneck. Audit events (records with an event_id) always pass.
+
+    Once the interval of a template is over, a "suppressed N similar log
+    records" summary is logged for it: by the next record, or else by a
+    background thread that sweeps the windows every interval. That thread is
+    started by the first suppressed record, and close() (also run at exit)
+    stops it and logs the summaries still pending. The filter is shared by all
+    handlers, so the decision is kept on the record.
+    """
+
+    def __init__(
+        self, burst: int = 10, interval: float = 60.0, max_keys: int = 1024
+    ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self._windows: OrderedDict[tuple[str, str], _Window] = OrderedDict()
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._sweeper: threading.Thread | None = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        allowed = getattr(record, RATE_LIMIT_ATTR, None)
+        if allowed is not None:
+            return bool(allowed)
+        if hasattr(record, "event_id"):
+            allowed = True
+            summaries: list[_Summary] = []
+        else:
+            allowed, summaries = self._admit(record)
+        setattr(record, RATE_LIMIT_ATTR, allowed)
+
+        for key, window in summaries:
+            self._summarize(key, window)
+        if not allowed:
+            LOG_RECORDS_SUPPRESSED.inc(logger=record.name)
+            if self._sweeper is None:
+                self._start_sweeper()
+        return allowed
+
+    def close(self) -> None:
+        """Stop the sweeper and log the summaries of all suppressed records."""
+        self._closed.set()
+        sweeper = self._sweeper
+        if sweeper is not None and sweeper is not threading.current_thread():
+            sweeper.join()
+        with self._lock:
+            summaries = [(k, w) for k, w in self._windows.items() if w.suppressed]
+            self._windows.clear()
+        for key, window in summaries:
+            self._summarize(key, window)
+
+    def _start_sweeper(self) -> None:
+        with self._lock:
+            if self._sweeper is not None or self._closed.is_set():
+                return
+            self._sweeper = threading.Thread(
+                target=self._run_sweeper, name="log-rate-limit", daemon=True
+            )
+        atexit.register(self.close)
+        self._sweeper.start()
+
+    def _run_sweeper(self) -> None:
+        while not self._closed.wait(self.interval):
+            with self._lock:
+                summaries = self._sweep(time.monotonic())
+            for key, window in summaries:
+                self._summarize(key, window)
+
+    def _admit(self, record: logging.LogRecord) -> tuple[bool, list[_Summary]]:
+        now = time.monotonic()
+        key = (record.name, str(getattr(record, TEMPLATE_ATTR, record.msg)))
+        summaries: list[_Summary] = []
+        with self._lock:
+            if now >= self._next_sweep:
+                summaries = self._sweep(now)
+                self._next_sweep = now + self.interval
+
+            window = self._windows.get(key)
+            if window is None or now - window.start >= self.interval:
+                if window is not None and window.suppressed:
+                    summaries.append((key, window))
+                window = _Window(start=now, levelno=record.levelno)
+                self._windows[key] = window
+                self._windows.move_to_end(key)
+                if len(self._windows) > self.max_keys:
+                    evicted = self._windows.popitem(last=False)
+                    if evicted[1].suppressed:
+                        summaries.append(evicted)
+
+            window.count += 1
+            if window.count <= self.burst:
+                return True, summaries
+            window.suppressed += 1
+            return False, summaries
+
+    def _sweep(self, now: float) -> list[_Summary]:
+        summaries: list[_Summary] = []
+        for key, window in list(self._windows.items()):
+            if now - window.start >= self.interval:
+                del self._windows[key]
+                if window.suppressed:
+                    summaries.append((key, window))
+        return summaries
+
+    def _summarize(self, key: tuple[str, str], window: _Window) -> None:
+        name, template = key
+        logging.getLogger(name).log(
+            window.levelno,
+            "suppressed %d similar log records: %s",
+            window.suppressed,
+            template,
+            extra={RATE_LIMIT_ATTR: True},
+        )
@@ -1,9 +1,11 @@
 import json
 import logging
 import re
+from collections.abc import Callable, Mapping
 from datetime import datetime, timezone
 from typing import Any
 
+from app.config import JsonEncoder
 from app.logging.context import (
     UNSET,
     client_trace_id_var,
@@ -13,21 +15,58 @@ from app.logging.context import (
     method_var,
     request_id_var,
 )
-from app.logging.filters import LoggingStreams
+from app.logging.filters import RATE_LIMIT_ATTR, TEMPLATE_ATTR, LoggingStreams
 
 _CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
 
+# Attributes in which the fields and the header of a record are kept once they
+# have been gathered, so every handler of the record can reuse them
+_RECORD_FIELDS_ATTR = "_prs_fields"
+_RECORD_HEADER_ATTR = "_prs_header"
+
 _BUILTIN_LOGRECORD_ATTRS: frozenset[str] = frozenset(
     logging.LogRecord(
         name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
     ).__dict__.keys()
-) | {"message", "asctime", "event_id", "stream", "field_streams"}
+) | {
+    "message",
+    "asctime",
+    "event_id",
+    "stream",
+    "field_streams",
+    _RECORD_FIELDS_ATTR,
+    _RECORD_HEADER_ATTR,
+    RATE_LIMIT_ATTR,
+    TEMPLATE_ATTR,
+}
 
 # Correlation metadata that is always retained, regardless of per-stream field routing.
-_ALWAYS_KEEP_FIELDS: frozenset[str] = frozenset(
+ALWAYS_KEEP_FIELDS: frozenset[str] = frozenset(
     {"request_id", "ip", "client_trace_id", "correlation_id"}
 )
 
+_CONTEXT_VARS = (
+    ("request_id", request_id_var),
+    ("ip", ip_var),
+    ("client_trace_id", client_trace_id_var),
+    ("correlation_id", correlation_id_var),
+    ("endpoint", endpoint_var),
+    ("method", method_var),
+)
+
+
+def _json_encoder(encoder: JsonEncoder) -> Callable[[Any], str]:
+    if encoder == JsonEncoder.orjson:
+        import orjson
+
+        def encode(obj: Any) -> str:
+            return orjson.dumps(obj, default=str).decode()
+
+        return encode
+    # Same output as json.dumps(obj, default=str), without creating an encoder
+    # for every record
+    return json.JSONEncoder(default=str).encode
+
 
 def _route_fields(
     record: logging.LogRecord,
@@ -40,12 +79,15 @@ def _route_fields(
     carries no per-stream routing, every field is kept. Correlation metadata is
     always retained so records remain traceable across streams.
     """
-    field_streams: dict[LoggingStreams, tuple[str, ...]] | None = getattr(
+    field_streams: Mapping[LoggingStreams, Any] | None = getattr(
         record, "field_streams", None
     )
     if stream is None or not field_streams:
         return data
-    allowed = set(field_streams.get(stream, ())) | _ALWAYS_KEEP_FIELDS
+    allowed = field_streams.get(stream, ())
+    if not isinstance(allowed, frozenset):
+        # log_event passes the precomputed sets of PRSEvent.allowed_fields
+        allowed = frozenset(allowed) | ALWAYS_KEEP_FIELDS
     return {key: value for key, value in data.items() if key in allowed}
 
 
@@ -55,14 +97,7 @@ def _sanitize_message(value: str) -> str:
 
 def _collect_context() -> dict[str, Any]:
     out: dict[str, Any] = {}
-    for key, var in (
-        ("request_id", request_id_var),
-        ("ip", ip_var),
-        ("client_trace_id", client_trace_id_var),
-        ("correlation_id", correlation_id_var),
-        ("endpoint", endpoint_var),
-        ("method", method_var),
-    ):
+    for key, var in _CONTEXT_VARS:
         value = var.get()
         if value != UNSET:
             out[key] = value
@@ -75,6 +110,32 @@ def _collect_extras(record: logging.LogRecord) -> dict[str, Any]:
     }
 
 
+def record_fields(record: logging.LogRecord) -> dict[str, Any]:
+    """
+    The request context and extra fields of record. Gathered once per record
+    and shared by all handlers, so call it on the logging thread to capture the
+    request context before the record is handled elsewhere.
+    """
+    fields: dict[str, Any] | None = record.__dict__.get(_RECORD_FIELDS_ATTR)
+    if fields is None:
+        fields = {**_collect_context(), **_collect_extras(record)}
+        record.__dict__[_RECORD_FIELDS_ATTR] = fields
+    return fields
+
+
+def _record_header(record: logging.LogRecord) -> tuple[str, str, str]:
+    """Timestamp, sanitized message and source of record, computed once."""
+    header: tuple[str, str, str] | None = record.__dict__.get(_RECORD_HEADER_ATTR)
+    if header is None:
+        header = (
+            datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            _sanitize_message(record.getMessage()),
+            f"{record.module}:{record.lineno}",
+        )
+        record.__dict__[_RECORD_HEADER_ATTR] = header
+    return header
+
+
 class JsonFormatter(logging.Formatter):
     """Structured JSON formatter for the debug-json view.
 
@@ -106,32 +167,34 @@ class JsonFormatter(logging.Formatter):
         stream: LoggingStreams | None = None,
         stream_id: str | None = None,
         application_id: str | None = None,
+        json_encoder: JsonEncoder = JsonEncoder.json,
     ) -> None:
         super().__init__()
         self.include_traces = include_traces
         self.stream = stream
         self.stream_id = stream_id
         self.application_id = application_id
+        self._encode = _json_encoder(JsonEncoder(json_encoder))
 
     def format(self, record: logging.LogRecord) -> str:
         message: dict[str, Any] = {}
 
         if record.exc_info and self.include_traces:
-            message["exception"] = self.formatException(record.exc_info)
+            if record.exc_text is None:
+                record.exc_text = self.formatException(record.exc_info)
+            message["exception"] = record.exc_text
         if record.stack_info and self.include_traces:
             message["stack_info"] = self.formatStack(record.stack_info)
 
-        data = {**_collect_context(), **_collect_extras(record)}
-        message.update(_route_fields(record, self.stream, data))
+        message.update(_route_fields(record, self.stream, record_fields(record)))
 
+        timestamp, description, source = _record_header(record)
         log_record: dict[str, Any] = {
             "event_id": getattr(record, "event_id", None),
-            "timestamp": datetime.fromtimestamp(
-                record.created, tz=timezone.utc
-            ).isoformat(),
+            "timestamp": timestamp,
             "level": record.levelname,
-            "event_description": _sanitize_message(record.getMessage()),
-            "source": f"{record.module}:{record.lineno}",
+            "event_description": description,
+            "source": source,
         }
         if self.application_id is not None:
             log_record["application_id"] = self.application_id
@@ -139,7 +202,7 @@ class JsonFormatter(logging.Formatter):
             log_record["stream_id"] = self.stream_id
         log_record["message"] = message
 
-        return json.dumps(log_record, default=str)
+        return self._encode(log_record)
 
 
 class PlainTextFormatter(logging.Formatter):
@@ -163,10 +226,11 @@ class PlainTextFormatter(logging.Formatter):
             f"[{event_id}] {_sanitize_message(record.getMessage())}"
         )
 
-        data = {**_collect_context(), **_collect_extras(record)}
         pairs = [
             f"{key}={value}"
-            for key, value in _route_fields(record, self.stream, data).items()
+            for key, value in _route_fields(
+                record, self.stream, record_fields(record)
+            ).items()
         ]
 
         out = base if not pairs else f"{base} {' '.join(pairs)}"
@@ -2,16 +2,16 @@ import logging
 import re
 import time
 import uuid
-from collections.abc import Generator
+from collections.abc import Collection, Generator
 from contextlib import contextmanager
 from contextvars import ContextVar
 from dataclasses import dataclass
+from typing import Any
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.deadline import bind_deadline
 from app.logging.context import (
     CLIENT_TRACE_ID_HEADER,
     CORRELATION_ID_HEADER,
@@ -25,6 +25,8 @@ from app.logging.context import (
     request_id_var,
 )
 from app.logging.events import ACCESS_REQUEST, SYS_MISSING_CORRELATION_ID, log_event
+from app.models.auth.context import AuthContext
+from app.timing import bind_timings
 
 _SAFE_HEADER_VALUE = re.compile(r"[^a-zA-Z0-9\-_]")
 _access_logger = logging.getLogger("app.access")
@@ -35,6 +37,23 @@ def _sanitize(value: str) -> str:
     return _SAFE_HEADER_VALUE.sub("", value)[:64] or UNSET
 
 
+_CLIENT_TRACE_ID_KEY = CLIENT_TRACE_ID_HEADER.lower().encode("latin-1")
+_CORRELATION_ID_KEY = CORRELATION_ID_HEADER.lower().encode("latin-1")
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+def _authenticated_client_oin(state: dict[str, Any]) -> str | None:
+    """
+    The client OIN of the request once get_auth_ctx has authenticated it, None
+    before that or for unauthenticated routes.
+    """
+    auth = state.get("auth")
+    if not isinstance(auth, AuthContext):
+        return None
+    return auth.claims.client_organization_id.value
+
+
 @dataclass(frozen=True)
 class RequestContext:
     request_id: str
@@ -45,24 +64,33 @@ class RequestContext:
     method: str
 
     @classmethod
-    def from_request(cls, request: Request) -> "RequestContext":
+    def from_scope(cls, scope: Scope) -> "RequestContext":
+        client_trace_id = UNSET
+        correlation_id = UNSET
+        # ASGI header names are lowercased; the first occurrence wins, as with
+        # Starlette's Headers.get()
+        for key, value in scope["headers"]:
+            if key == _CLIENT_TRACE_ID_KEY and client_trace_id is UNSET:
+                client_trace_id = _sanitize(value.decode("latin-1"))
+            elif key == _CORRELATION_ID_KEY and correlation_id is UNSET:
+                correlation_id = _sanitize(value.decode("latin-1"))
+
+        client = scope.get("client")
         return cls(
             request_id=str(uuid.uuid4()),
-            ip=request.client.host if request.client else UNSET,
-            client_trace_id=_sanitize(
-                request.headers.get(CLIENT_TRACE_ID_HEADER, UNSET)
-            ),
-            correlation_id=_sanitize(request.headers.get(CORRELATION_ID_HEADER, UNSET)),
-            endpoint=request.url.path,
-            method=request.method,
+            ip=client[0] if client else UNSET,
+            client_trace_id=client_trace_id,
+            correlation_id=correlation_id,
+            endpoint=scope["path"],
+            method=scope["method"],
         )
 
-    def apply_to(self, response: Response) -> None:
-        response.headers[REQUEST_ID_HEADER] = self.request_id
+    def apply_to(self, headers: MutableHeaders) -> None:
+        headers[REQUEST_ID_HEADER] = self.request_id
         if self.client_trace_id != UNSET:
-            response.headers[CLIENT_TRACE_ID_HEADER] = self.client_trace_id
+            headers[CLIENT_TRACE_ID_HEADER] = self.client_trace_id
         if self.correlation_id != UNSET:
-            response.headers[CORRELATION_ID_HEADER] = self.correlation_id
+            headers[CORRELATION_ID_HEADER] = self.correlation_id
 
 
 _CONTEXT_VARS: tuple[tuple[str, ContextVar[str]], ...] = (
@@ -85,19 +113,62 @@ def _bind(context: RequestContext) -> Generator[None]:
             var.reset(token)
 
 
-class RequestContextMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, correlation_id_expected: bool = False) -> None:
-        super().__init__(app)
+class RequestContextMiddleware:
+    """
+    Binds the request context (request id, client ip, trace and correlation ids,
+    endpoint and method), the request deadline and the phase timings for every
+    HTTP request, echoes the ids on the response and writes the access log entry.
+    Clients in server_timing_oins also get the phase timings in a Server-Timing
+    header, only on routes that authenticated them (get_auth_ctx): the client
+    OIN header itself is not trusted.
+
+    This is a plain ASGI middleware: it runs in the task of the request itself,
+    without the extra task and memory stream of Starlette's BaseHTTPMiddleware.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        correlation_id_expected: bool = False,
+        request_deadline: float | None = None,
+        server_timing_oins: Collection[str] = (),
+    ) -> None:
+        self.app = app
         self.correlation_id_expected = correlation_id_expected
+        self.request_deadline = request_deadline or None
+        self.server_timing_oins = frozenset(server_timing_oins)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestContext.from_scope(scope)
+        status_code: int | None = None
+        # Shared with the request, where get_auth_ctx stores the authentication
+        state = scope.setdefault("state", {})
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                context.apply_to(headers)
+                if (
+                    self.server_timing_oins
+                    and _authenticated_client_oin(state) in self.server_timing_oins
+                ):
+                    headers[SERVER_TIMING_HEADER] = timings.server_timing(
+                        time.perf_counter() - start
+                    )
+            await send(message)
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        context = RequestContext.from_request(request)
-
-        response: Response | None = None
         start = time.perf_counter()
-        with _bind(context):
+        with (
+            _bind(context),
+            bind_deadline(self.request_deadline),
+            bind_timings() as timings,
+        ):
             if self.correlation_id_expected and context.correlation_id == UNSET:
                 log_event(
                     _logger,
@@ -107,9 +178,7 @@ class RequestContextMiddleware(BaseHTTPMiddleware):
                     method=context.method,
                 )
             try:
-                response = await call_next(request)
-                context.apply_to(response)
-                return response
+                await self.app(scope, receive, send_with_context)
             finally:
                 duration_ms = round((time.perf_counter() - start) * 1000)
                 # endpoint and method are attached automatically from the request context.
@@ -117,6 +186,7 @@ class RequestContextMiddleware(BaseHTTPMiddleware):
                     _access_logger,
                     ACCESS_REQUEST,
                     "access",
-                    status_code=response.status_code if response is not None else None,
+                    status_code=status_code,
                     duration_ms=duration_ms,
+                    **timings.log_fields(),
                 )
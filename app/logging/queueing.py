@@ -0,0 +1,210 @@
+"""
+Non-blocking log shipping.
+
+When enabled, the handlers configured by LogConfigBuilder (console and syslog)
+no longer run on the thread that logs. Instead every logger gets a single
+handler that puts the record on a bounded queue, and one listener thread formats
+and ships the records to the original handlers. A slow or unreachable log
+collector then no longer adds latency to requests.
+
+When the queue is full, records for the SIEM stream wait for room (up to a
+timeout), as audit events must not be lost. When there is still no room, or when
+the record is logged on the thread of an event loop (where waiting would stall
+every request the loop serves), it goes to an unbounded overflow that the
+listener empties as well. All other records are dropped and counted in
+prs_log_records_dropped_total.
+"""
+
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+from collections import deque
+from collections.abc import Iterable, Sequence
+
+from app.logging.filters import TEMPLATE_ATTR, LoggingStreams
+from app.logging.formatter import record_fields
+from app.metrics import Counter, Gauge
+
+# Seconds a SIEM record waits for room in a full queue before it is dropped
+_SIEM_PUT_TIMEOUT = 5.0
+
+LOG_RECORDS_DROPPED = Counter(
+    "prs_log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+    ("stream",),
+)
+LOG_RECORDS_OVERFLOWED = Counter(
+    "prs_log_records_overflowed_total",
+    "SIEM log records put in the overflow because the log queue was full",
+)
+LOG_QUEUE_SIZE = Gauge(
+    "prs_log_queue_size",
+    "Log records waiting to be shipped",
+)
+
+_Item = tuple[logging.LogRecord, Sequence[logging.Handler]]
+
+# Put on the queue to wake the listener for records in the overflow
+_WAKE_UP: _Item = (logging.makeLogRecord({}), ())
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class QueueingHandler(logging.Handler):
+    """Puts records on the queue together with the handlers to ship them to."""
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[_Item | None]",
+        handlers: Sequence[logging.Handler],
+        overflow: "deque[_Item] | None" = None,
+    ) -> None:
+        super().__init__()
+        self.queue = log_queue
+        self.handlers = tuple(handlers)
+        self.overflow: deque[_Item] = deque() if overflow is None else overflow
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener thread has no request context and must not see the
+        # arguments change after the fact
+        record_fields(record)
+        setattr(record, TEMPLATE_ATTR, record.msg)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            item = (self.prepare(record), self.handlers)
+            if LoggingStreams.SIEM in getattr(record, "stream", ()):
+                # Never block the thread of a running event loop
+                try:
+                    self.queue.put(
+                        item, block=not _on_event_loop(), timeout=_SIEM_PUT_TIMEOUT
+                    )
+                except queue.Full:
+                    self._spill(item)
+            else:
+                try:
+                    self.queue.put_nowait(item)
+                except queue.Full:
+                    LOG_RECORDS_DROPPED.inc(stream="other")
+        except Exception:
+            self.handleError(record)
+
+    def _spill(self, item: _Item) -> None:
+        LOG_RECORDS_OVERFLOWED.inc()
+        self.overflow.append(item)
+        try:
+            self.queue.put_nowait(_WAKE_UP)
+        except queue.Full:
+            # The listener is busy and empties the overflow after its next record
+            pass
+
+
+class LogQueue:
+    """The bounded queue and the listener thread that empties it."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: "queue.Queue[_Item | None]" = queue.Queue(maxsize)
+        # SIEM records that found the queue full, see QueueingHandler
+        self.overflow: deque[_Item] = deque()
+        self._thread = threading.Thread(
+            target=self._run, name="log-shipper", daemon=True
+        )
+        self._loggers: list[tuple[logging.Logger, QueueingHandler]] = []
+        LOG_QUEUE_SIZE.set_function(self._size)
+
+    def attach(self, logger: logging.Logger) -> None:
+        """Move the handlers of logger behind the queue."""
+        handlers = list(logger.handlers)
+        if not handlers:
+            return
+        for handler in handlers:
+            logger.removeHandler(handler)
+        queueing_handler = QueueingHandler(self.queue, handlers, self.overflow)
+        logger.addHandler(queueing_handler)
+        self._loggers.append((logger, queueing_handler))
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Ship the records still on the queue, stop the listener and give the
+        loggers their own handlers back.
+        """
+        for logger, queueing_handler in self._loggers:
+            logger.removeHandler(queueing_handler)
+            for handler in queueing_handler.handlers:
+                logger.addHandler(handler)
+        self._loggers.clear()
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+
+    def _size(self) -> float:
+        return float(self.queue.qsize() + len(self.overflow))
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is not None:
+                self._ship(item)
+            while self.overflow:
+                self._ship(self.overflow.popleft())
+            if item is None:
+                return
+
+    @staticmethod
+    def _ship(item: _Item) -> None:
+        record, handlers = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception:
+                    handler.handleError(record)
+
+
+_log_queue: LogQueue | None = None
+_lock = threading.Lock()
+
+
+def install(maxsize: int, logger_names: Iterable[str | None]) -> LogQueue:
+    """
+    Move the handlers of the given loggers (None is the root logger) behind a
+    new log queue. Call after logging.config.dictConfig.
+    """
+    global _log_queue
+
+    stop()
+    log_queue = LogQueue(maxsize)
+    for name in logger_names:
+        log_queue.attach(logging.getLogger(name))
+
+    with _lock:
+        _log_queue = log_queue
+    log_queue.start()
+    return log_queue
+
+
+def stop() -> None:
+    """Flush and stop the log queue, if installed."""
+    global _log_queue
+
+    with _lock:
+        log_queue, _log_queue = _log_queue, None
+    if log_queue is not None:
+        log_queue.stop()
+
+
+atexit.register(stop)
@@ -0,0 +1,375 @@
+"""
+Disk spool for the SIEM stream.
+
+SIEM events must not be lost, but sending them to the log collector on the
+thread that logs puts the latency of the collector on requests. SpoolHandler
+instead appends the formatted records to local segment files, and a shipper
+thread sends them on to the collector. The position of the shipper is kept in a
+checkpoint file, so after a restart it resumes where it left off.
+
+- Records are handed to the OS right away and fsynced in batches: every
+  fsync_interval seconds, or on every record when the interval is 0.
+- The checkpoint is written after every shipped batch. When shipping fails or
+  the process crashes, the current batch is sent again (at-least-once delivery).
+- Every process spools into a slot of its own, a worker-<n> subdirectory that
+  it holds an exclusive lock on, so the workers of one server can share the
+  spool directory. A restarted process claims the lowest free slot and ships
+  what was left in it. Records in slots no process claims any more (after
+  lowering the number of workers) stay there until one does.
+- The spool holds at most max_bytes of unshipped records. When it is full a new
+  record waits for room (overflow=block, up to block_timeout) or is dropped
+  straight away (overflow=drop). Dropped records are counted in
+  prs_siem_spool_dropped_total.
+"""
+
+import fcntl
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.config import SpoolOverflow, SyslogTransport
+from app.logging.transport import StreamSyslogHandler
+from app.metrics import Counter, Gauge
+
+_SEGMENT_PREFIX = "siem-"
+_SEGMENT_SUFFIX = ".spool"
+_CHECKPOINT = "checkpoint"
+_SLOT_PREFIX = "worker-"
+_SLOT_LOCK = "lock"
+# Slots tried before giving up, far more than the workers of one server
+_MAX_SLOTS = 1024
+# Records shipped between two checkpoints
+_SHIP_BATCH = 100
+# Seconds to wait before shipping again after the collector failed
+_RETRY_BACKOFF = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+# Seconds close() waits for the shipper, which may be stuck on the collector
+_CLOSE_TIMEOUT = 5.0
+
+SPOOL_BYTES = Gauge(
+    "prs_siem_spool_bytes",
+    "Bytes of SIEM records waiting in the spool",
+)
+SPOOL_DROPPED = Counter(
+    "prs_siem_spool_dropped_total",
+    "SIEM records dropped because the spool was full",
+)
+SPOOL_SHIP_ERRORS = Counter(
+    "prs_siem_spool_ship_errors_total",
+    "Failed attempts to ship SIEM records from the spool",
+)
+
+
+class SyslogTarget(logging.handlers.SysLogHandler):
+    """
+    SysLogHandler over UDP that raises send errors (OSError), so the shipper
+    can retry, instead of passing them to handleError.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        msg = self.format(record)
+        if self.ident:
+            msg = self.ident + msg
+        if self.append_nul:
+            msg += "\000"
+        priority = self.encodePriority(
+            self.facility, self.mapPriority(record.levelname)
+        )
+        # Not in the stubs of SysLogHandler
+        if not self.socket:  # type: ignore[attr-defined]
+            self.createSocket()
+        self.socket.sendto(  # type: ignore[attr-defined]
+            f"<{priority}>{msg}".encode(), self.address
+        )
+
+
+class SpoolHandler(logging.Handler):
+    """
+    Writes records to the spool in directory and ships them to target, or to the
+    syslog collector on address.
+
+    A target raises from handle() or flush() when it could not ship a record;
+    the records of the batch are then shipped again later.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        address: tuple[str, int] | None = None,
+        target: logging.Handler | None = None,
+        transport: SyslogTransport = SyslogTransport.udp,
+        ca_file: str | None = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        segment_bytes: int = 16 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+        overflow: SpoolOverflow = SpoolOverflow.block,
+        block_timeout: float = 5.0,
+    ) -> None:
+        super().__init__()
+        if target is None:
+            if address is None:
+                raise ValueError("SpoolHandler needs an address or a target")
+            if SyslogTransport(transport) == SyslogTransport.udp:
+                target = SyslogTarget(address)
+            else:
+                target = StreamSyslogHandler(
+                    address,
+                    tls=transport == SyslogTransport.tls,
+                    ca_file=ca_file,
+                    background=False,
+                )
+        self.target = target
+        self.directory, self._lock_fd = self._claim_slot(Path(directory))
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.overflow = SpoolOverflow(overflow)
+        self.block_timeout = block_timeout
+
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._unread = True
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+        segments = self._segments()
+        # Always start a new segment, as the last one may end in a record that
+        # was torn by a crash
+        self._write_seq = segments[-1] + 1 if segments else 0
+        self._read_seq, self._read_offset = self._load_checkpoint(segments)
+        self._pending = sum(
+            self._segment_path(seq).stat().st_size
+            for seq in segments
+            if seq >= self._read_seq
+        )
+        self._pending = max(0, self._pending - self._read_offset)
+        self._file = open(self._segment_path(self._write_seq), "ab")
+        self._written = 0
+
+        SPOOL_BYTES.set_function(self._pending_bytes)
+        self._thread = threading.Thread(
+            target=self._run, name="siem-spool-shipper", daemon=True
+        )
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            # One record per line; the JSON formatters never emit newlines
+            message = self.format(record).replace("\n", "\\n")
+            line = f"{record.levelno}\t{message}\n".encode("utf-8")
+            with self._cond:
+                if not self._wait_for_room(len(line)):
+                    SPOOL_DROPPED.inc()
+                    return
+                self._file.write(line)
+                self._file.flush()
+                self._written += len(line)
+                self._pending += len(line)
+                if self.fsync_interval == 0:
+                    os.fsync(self._file.fileno())
+                else:
+                    self._dirty = True
+                if self._written >= self.segment_bytes:
+                    self._rotate()
+                self._unread = True
+                self._cond.notify_all()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self._cond:
+            if not self._file.closed:
+                self._sync()
+
+    def close(self) -> None:
+        """Stop the shipper; unshipped records stay in the spool for the next run."""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(_CLOSE_TIMEOUT)
+        with self._cond:
+            self._sync()
+            self._file.close()
+        # Closing releases the lock on the slot
+        os.close(self._lock_fd)
+        self.target.close()
+        super().close()
+
+    @staticmethod
+    def _claim_slot(directory: Path) -> tuple[Path, int]:
+        """
+        Lock the first free slot in directory. Returns the slot directory and
+        the descriptor that holds the lock for as long as the handler lives.
+        """
+        for n in range(_MAX_SLOTS):
+            slot = directory / f"{_SLOT_PREFIX}{n}"
+            slot.mkdir(parents=True, exist_ok=True)
+            fd = os.open(slot / _SLOT_LOCK, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return slot, fd
+        raise RuntimeError(f"no free spool slot in {directory}")
+
+    def _wait_for_room(self, size: int) -> bool:
+        if self._pending + size <= self.max_bytes:
+            return True
+        if self.overflow == SpoolOverflow.drop:
+            return False
+        deadline = time.monotonic() + self.block_timeout
+        while self._pending + size > self.max_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping:
+                return False
+            self._cond.wait(remaining)
+        return True
+
+    def _rotate(self) -> None:
+        self._sync()
+        self._file.close()
+        self._write_seq += 1
+        self._file = open(self._segment_path(self._write_seq), "ab")
+        self._written = 0
+
+    def _sync(self) -> None:
+        if self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def _pending_bytes(self) -> float:
+        return float(self._pending)
+
+    def _run(self) -> None:
+        idle_timeout = self.fsync_interval or 1.0
+        failures = 0
+        while True:
+            with self._cond:
+                if self._dirty and (
+                    time.monotonic() - self._last_sync >= self.fsync_interval
+                ):
+                    self._sync()
+                if self._stopping:
+                    return
+                if failures:
+                    delay = _RETRY_BACKOFF[min(failures, len(_RETRY_BACKOFF)) - 1]
+                    deadline = time.monotonic() + delay
+                    while not self._stopping and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+                elif not self._unread:
+                    self._cond.wait(idle_timeout)
+                if self._stopping:
+                    return
+                self._unread = False
+
+            try:
+                while self._ship_batch():
+                    pass
+            except Exception:
+                SPOOL_SHIP_ERRORS.inc()
+                failures += 1
+            else:
+                failures = 0
+
+    def _ship_batch(self) -> bool:
+        """Ship the next batch of records, returns whether there was anything to do."""
+        with self._cond:
+            if self._stopping:
+                return False
+            complete = self._read_seq < self._write_seq
+
+        path = self._segment_path(self._read_seq)
+        lines = []
+        with open(path, "rb") as f:
+            f.seek(self._read_offset)
+            for _ in range(_SHIP_BATCH):
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                lines.append(line)
+
+        if lines:
+            for line in lines:
+                record = self._parse(line)
+                if record is not None:
+                    self.target.handle(record)
+            self.target.flush()
+            self._advance(self._read_seq, self._read_offset + sum(map(len, lines)))
+            return True
+
+        if not complete:
+            return False
+        # The segment was shipped up to its end, or up to a torn record
+        self._advance(self._read_seq, path.stat().st_size)
+        path.unlink()
+        self._advance(self._read_seq + 1, 0)
+        return True
+
+    def _advance(self, seq: int, offset: int) -> None:
+        if (seq, offset) == (self._read_seq, self._read_offset):
+            return
+        with self._cond:
+            if seq == self._read_seq:
+                self._pending = max(0, self._pending - (offset - self._read_offset))
+            self._read_seq, self._read_offset = seq, offset
+            self._cond.notify_all()
+        self._write_checkpoint()
+
+    @staticmethod
+    def _parse(line: bytes) -> logging.LogRecord | None:
+        try:
+            level, _, message = line.decode("utf-8").rstrip("\n").partition("\t")
+            levelno = int(level)
+        except ValueError:
+            # A corrupt record cannot be shipped and must not block the others
+            return None
+        return logging.makeLogRecord(
+            {
+                "name": __name__,
+                "levelno": levelno,
+                "levelname": logging.getLevelName(levelno),
+                "msg": message,
+            }
+        )
+
+    def _segments(self) -> list[int]:
+        segments = []
+        for path in self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            seq = path.name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)]
+            if seq.isdigit():
+                segments.append(int(seq))
+        return sorted(segments)
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{_SEGMENT_PREFIX}{seq:012d}{_SEGMENT_SUFFIX}"
+
+    def _load_checkpoint(self, segments: list[int]) -> tuple[int, int]:
+        checkpoint: tuple[int, int] | None = None
+        try:
+            fields = (self.directory / _CHECKPOINT).read_text().split()
+            checkpoint = (int(fields[0]), int(fields[1]))
+        except (OSError, ValueError, IndexError):
+            pass
+
+        if checkpoint is not None and checkpoint[0] in segments:
+            return checkpoint
+        # Start at the oldest segment the checkpoint has not passed yet
+        for seq in segments:
+            if checkpoint is None or seq > checkpoint[0]:
+                return seq, 0
+        return self._write_seq, 0
+
+    def _write_checkpoint(self) -> None:
+        path = self.directory / _CHECKPOINT
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            f.write(f"{self._read_seq} {self._read_offset}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
@@ -0,0 +1,246 @@
+"""
+Stream transport to the syslog collector.
+
+The standard SysLogHandler sends one UDP datagram per record, which loses
+records under load, or one unbatched write per record over TCP. StreamSyslogHandler
+keeps a persistent TCP or TLS connection and frames the records with RFC 6587
+octet counting ("<length> <message>"), so a record may contain any byte.
+
+Records are buffered and written by a background thread in writes of up to
+batch_bytes, at most flush_interval seconds after the first record of the batch.
+When the connection fails the thread reconnects with backoff, keeping up to
+buffer_size records in the meantime. Records beyond that are dropped and counted
+in prs_syslog_records_dropped_total.
+"""
+
+import logging
+import logging.handlers
+import select
+import socket
+import ssl
+import threading
+import time
+from collections.abc import Sequence
+
+from app.metrics import Counter
+
+# Seconds to wait before reconnecting after consecutive failures
+_RECONNECT_BACKOFF = (0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+# Seconds close() waits for the buffered records to be written
+_CLOSE_TIMEOUT = 5.0
+
+SYSLOG_RECORDS_DROPPED = Counter(
+    "prs_syslog_records_dropped_total",
+    "Log records dropped because the syslog buffer was full",
+)
+SYSLOG_SEND_ERRORS = Counter(
+    "prs_syslog_send_errors_total",
+    "Failed writes to the syslog collector",
+)
+
+
+class StreamSyslogHandler(logging.Handler):
+    """
+    Ships records to the syslog collector on address over TCP, or TLS when tls
+    is set.
+
+    Without background the records are only sent on flush(), which raises when
+    that fails. The SIEM spool ships this way, as it batches, retries and keeps
+    the records itself.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        tls: bool = False,
+        ca_file: str | None = None,
+        facility: int = logging.handlers.SysLogHandler.LOG_USER,
+        batch_bytes: int = 64 * 1024,
+        flush_interval: float = 0.2,
+        buffer_size: int = 10000,
+        timeout: float = 5.0,
+        background: bool = True,
+    ) -> None:
+        super().__init__()
+        self.address = address
+        self.facility = facility
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+        self._ssl_context = ssl.create_default_context(cafile=ca_file) if tls else None
+
+        self._cond = threading.Condition()
+        self._buffer: list[bytes] = []
+        self._buffered_bytes = 0
+        self._first_buffered = 0.0
+        self._closing = False
+        self._send_lock = threading.Lock()
+        self._sock: socket.socket | None = None
+
+        self._thread: threading.Thread | None = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="syslog-sender", daemon=True
+            )
+            self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            frame = self._frame(record)
+            with self._cond:
+                if len(self._buffer) >= self.buffer_size:
+                    SYSLOG_RECORDS_DROPPED.inc()
+                    return
+                if not self._buffer:
+                    self._first_buffered = time.monotonic()
+                self._buffer.append(frame)
+                self._buffered_bytes += len(frame)
+                self._cond.notify_all()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """Write the buffered records now; raises OSError when that fails."""
+        while True:
+            with self._cond:
+                frames = self._take()
+            if not frames:
+                return
+            try:
+                self._send(frames)
+            except OSError:
+                if self._thread is not None:
+                    self._requeue(frames)
+                raise
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(_CLOSE_TIMEOUT)
+        with self._send_lock:
+            self._disconnect()
+        super().close()
+
+    def _frame(self, record: logging.LogRecord) -> bytes:
+        severity = logging.handlers.SysLogHandler.priority_names[
+            logging.handlers.SysLogHandler.priority_map.get(record.levelname, "warning")
+        ]
+        message = f"<{(self.facility << 3) | severity}>{self.format(record)}"
+        data = message.encode("utf-8")
+        return b"%d %s" % (len(data), data)
+
+    def _take(self) -> list[bytes]:
+        """Take the buffered records of the next write, up to batch_bytes."""
+        size = count = 0
+        for frame in self._buffer:
+            if count and size + len(frame) > self.batch_bytes:
+                break
+            size += len(frame)
+            count += 1
+        frames = self._buffer[:count]
+        del self._buffer[:count]
+        self._buffered_bytes -= size
+        return frames
+
+    def _requeue(self, frames: Sequence[bytes]) -> None:
+        with self._cond:
+            frames = [*frames, *self._buffer]
+            dropped = len(frames) - self.buffer_size
+            if dropped > 0:
+                SYSLOG_RECORDS_DROPPED.inc(dropped)
+                frames = frames[:-dropped]
+            self._buffer = list(frames)
+            self._buffered_bytes = sum(len(frame) for frame in frames)
+            self._first_buffered = time.monotonic()
+
+    def _run(self) -> None:
+        failures = 0
+        # Whether records were left behind by a write of batch_bytes
+        draining = False
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                if failures:
+                    # However much is buffered, the collector is not retried
+                    # before the backoff has passed
+                    delay = _RECONNECT_BACKOFF[
+                        min(failures, len(_RECONNECT_BACKOFF)) - 1
+                    ]
+                    deadline = time.monotonic() + delay
+                    while not self._closing and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+                elif not draining:
+                    deadline = self._first_buffered + self.flush_interval
+                    while (
+                        not self._closing
+                        and self._buffered_bytes < self.batch_bytes
+                        and time.monotonic() < deadline
+                    ):
+                        self._cond.wait(deadline - time.monotonic())
+                frames = self._take()
+                draining = bool(self._buffer)
+            if not frames:
+                continue
+
+            try:
+                self._send(frames)
+            except OSError:
+                SYSLOG_SEND_ERRORS.inc()
+                if self._closing:
+                    SYSLOG_RECORDS_DROPPED.inc(len(frames))
+                    return
+                self._requeue(frames)
+                failures += 1
+            else:
+                failures = 0
+
+    def _send(self, frames: Sequence[bytes]) -> None:
+        with self._send_lock:
+            try:
+                if self._sock is not None and self._closed_by_peer(self._sock):
+                    self._disconnect()
+                if self._sock is None:
+                    self._sock = self._connect()
+                self._sock.sendall(b"".join(frames))
+            except OSError:
+                self._disconnect()
+                raise
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        if self._ssl_context is None:
+            return sock
+        try:
+            return self._ssl_context.wrap_socket(sock, server_hostname=self.address[0])
+        except OSError:
+            sock.close()
+            raise
+
+    def _closed_by_peer(self, sock: socket.socket) -> bool:
+        # The collector does not write to us, so a readable socket was closed
+        # by it (or got TLS session data). Writing to a closed connection would
+        # lose the batch without an error.
+        if not select.select([sock], [], [], 0)[0]:
+            return False
+        sock.setblocking(False)
+        try:
+            return sock.recv(4096) == b""
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        except OSError:
+            return True
+        finally:
+            sock.settimeout(self.timeout)
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,285 @@
+"""
+Resident maintenance daemon.
+
+Runs the maintenance jobs (the removal of expired HSM keys) on their schedules
+in one long-running process, which keeps its database and HSM connections
+between runs:
+
+    python -m app.cleanup --daemon
+
+Every instance of the daemon competes for a Postgres advisory lock, and only the
+one holding it runs the jobs; the others stand by and take over when it goes
+away. The daemon serves /health and /metrics on a port of its own.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Protocol
+
+from sqlalchemy import Connection, Engine, NullPool, create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.metrics import REGISTRY, Counter, Gauge, Histogram, render
+from app.metrics_exporter import CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by all maintenance daemons ("prs-mnt")
+LOCK_KEY = 0x7072_732D_6D6E_74
+# Seconds between two checks for due jobs (and attempts to take the lock)
+_POLL_INTERVAL = 5.0
+
+MAINTENANCE_LEADER = Gauge(
+    "prs_maintenance_leader",
+    "1 when this daemon holds the maintenance lock",
+)
+MAINTENANCE_JOB_RUNS = Counter(
+    "prs_maintenance_job_runs_total",
+    "Maintenance job runs by job and outcome (ok or error)",
+    ("job", "outcome"),
+)
+MAINTENANCE_JOB_DURATION = Histogram(
+    "prs_maintenance_job_duration_seconds",
+    "Duration of the maintenance job runs",
+    ("job",),
+)
+MAINTENANCE_JOB_LAST_SUCCESS = Gauge(
+    "prs_maintenance_job_last_success_timestamp_seconds",
+    "Unix time of the last successful run of a maintenance job",
+    ("job",),
+)
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    # Seconds between two runs
+    interval: float
+    run: Callable[[], object]
+
+
+@dataclass
+class JobStatus:
+    # time.time() of the end of the last run and of the last successful run
+    last_run: float | None = None
+    last_success: float | None = None
+    last_error: str | None = None
+
+
+class MaintenanceLock(Protocol):
+    def try_acquire(self) -> bool: ...
+
+    def release(self) -> None: ...
+
+
+class AdvisoryLock:
+    """
+    Postgres session level advisory lock, held on a connection of its own for
+    as long as the daemon lives. When that connection breaks the lock is gone,
+    and the next try_acquire() competes for it again.
+    """
+
+    def __init__(self, dsn: str, key: int = LOCK_KEY) -> None:
+        self._engine: Engine = create_engine(
+            dsn, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+        )
+        self._key = key
+        self._connection: Connection | None = None
+
+    def try_acquire(self) -> bool:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+                return True
+            except SQLAlchemyError:
+                logger.warning("lost the maintenance lock connection")
+                self._close()
+
+        try:
+            connection = self._engine.connect()
+        except SQLAlchemyError as e:
+            logger.warning("could not connect for the maintenance lock: %s", e)
+            return False
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}
+            ).scalar()
+        except SQLAlchemyError as e:
+            logger.warning("could not take the maintenance lock: %s", e)
+            acquired = False
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        logger.info("took the maintenance lock")
+        return True
+
+    def release(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self._key}
+            )
+        except SQLAlchemyError:
+            # Closing the connection releases it as well
+            pass
+        self._close()
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except SQLAlchemyError:
+                pass
+            self._connection = None
+
+
+class MaintenanceDaemon:
+    """Runs the due jobs every poll_interval seconds while holding the lock."""
+
+    def __init__(
+        self,
+        jobs: Sequence[Job],
+        lock: MaintenanceLock,
+        jitter: float = 0.1,
+        poll_interval: float = _POLL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.jobs = list(jobs)
+        self.jitter = jitter
+        self.poll_interval = poll_interval
+        self._lock = lock
+        self._clock = clock
+        self._stop = threading.Event()
+        self._running: str | None = None
+        self._last_poll = clock()
+        self.status = {job.name: JobStatus() for job in self.jobs}
+        # Spread the first runs, so restarted instances don't run in lockstep
+        self._next_run = {
+            job.name: self._last_poll + random.uniform(0, jitter * job.interval)
+            for job in self.jobs
+        }
+
+    def run(self) -> None:
+        """Run the jobs until stop() is called."""
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                self._stop.wait(self.poll_interval)
+        finally:
+            self._lock.release()
+            MAINTENANCE_LEADER.set(0)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_pending(self) -> None:
+        self._last_poll = self._clock()
+        due = [job for job in self.jobs if self._next_run[job.name] <= self._last_poll]
+        if not due:
+            return
+        if not self._lock.try_acquire():
+            MAINTENANCE_LEADER.set(0)
+            logger.debug("another instance holds the maintenance lock")
+            return
+        MAINTENANCE_LEADER.set(1)
+
+        for job in due:
+            if self._stop.is_set():
+                return
+            self._run_job(job)
+            self._next_run[job.name] = self._clock() + self._jittered(job.interval)
+
+    def healthy(self) -> bool:
+        """The daemon is running a job, or polled for due jobs recently."""
+        if self._running is not None:
+            return True
+        return self._clock() - self._last_poll <= 3 * self.poll_interval
+
+    def _run_job(self, job: Job) -> None:
+        status = self.status[job.name]
+        outcome = "error"
+        self._running = job.name
+        start = time.perf_counter()
+        try:
+            job.run()
+            outcome = "ok"
+            status.last_error = None
+        except Exception as e:
+            logger.exception("maintenance job %s failed", job.name)
+            status.last_error = str(e) or type(e).__name__
+        finally:
+            self._running = None
+            MAINTENANCE_JOB_DURATION.observe(time.perf_counter() - start, job=job.name)
+            MAINTENANCE_JOB_RUNS.inc(job=job.name, outcome=outcome)
+            status.last_run = time.time()
+            if outcome == "ok":
+                status.last_success = status.last_run
+                MAINTENANCE_JOB_LAST_SUCCESS.set(status.last_success, job=job.name)
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class MaintenanceServer:
+    """Serves /health and /metrics of the daemon."""
+
+    def __init__(self, daemon: MaintenanceDaemon, host: str, port: int) -> None:
+        self._server = ThreadingHTTPServer((host, port), self._handler(daemon))
+        self._server.daemon_threads = True
+
+    @property
+    def server_address(self) -> tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def start(self) -> None:
+        threading.Thread(
+            target=self._server.serve_forever, name="maintenance-server", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _handler(daemon: MaintenanceDaemon) -> type[BaseHTTPRequestHandler]:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    self._send(200, CONTENT_TYPE, render(REGISTRY.collect()))
+                elif path == "/health":
+                    healthy = daemon.healthy()
+                    body = {
+                        "status": "ok" if healthy else "error",
+                        "leader": MAINTENANCE_LEADER.value() == 1,
+                        "jobs": {
+                            name: vars(status) for name, status in daemon.status.items()
+                        },
+                    }
+                    self._send(
+                        200 if healthy else 503, "application/json", json.dumps(body)
+                    )
+                else:
+                    self.send_error(404)
+
+            def _send(self, status: int, content_type: str, body: str) -> None:
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,437 @@
+"""
+In-process metrics for the pseudoniemendienst.
+
+Metrics are registered on a registry (``REGISTRY`` by default) and rendered in
+the Prometheus text exposition format. Counters and histograms are recorded
+into per-thread shards, so the hot path never takes a lock; shards are only
+summed when the metrics are collected.
+
+Usage:
+
+    REQUESTS = Counter("prs_requests_total", "Handled requests", ("route",))
+    REQUESTS.inc(route="/oprf/eval")
+
+With several worker processes every worker periodically writes its metrics to a
+shared directory (``write_snapshot``), and ``collect_snapshots`` sums them.
+"""
+
+import abc
+import json
+import math
+import os
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@dataclass(frozen=True)
+class Sample:
+    name: str
+    labels: dict[str, str]
+    value: float
+
+
+@dataclass(frozen=True)
+class MetricFamily:
+    name: str
+    documentation: str
+    type: str
+    samples: list[Sample]
+
+
+class _Shards:
+    """
+    Per-thread dictionaries of label values to numbers. Each thread only ever
+    writes to its own dictionary; the lock is only taken the first time a thread
+    records a value and when collecting.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[dict[LabelValues, list[float]]] = []
+
+    def local(self) -> dict[LabelValues, list[float]]:
+        try:
+            values: dict[LabelValues, list[float]] = self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+        return values
+
+    def merged(self) -> dict[LabelValues, list[float]]:
+        with self._lock:
+            shards = [shard.copy() for shard in self._shards]
+
+        out: dict[LabelValues, list[float]] = {}
+        for shard in shards:
+            for key, values in shard.items():
+                # Copy before summing: the owning thread may still update it.
+                values = list(values)
+                total = out.get(key)
+                if total is None:
+                    out[key] = values
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "MetricsRegistry | None" = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        try:
+            if len(labels) != len(self.labelnames):
+                raise KeyError
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            raise ValueError(
+                f"metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            ) from None
+
+    def _labels(self, key: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abc.abstractmethod
+    def collect(self) -> MetricFamily: ...
+
+    @abc.abstractmethod
+    def clear(self) -> None: ...
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "MetricsRegistry | None" = None,
+    ) -> None:
+        self._shards = _Shards()
+        super().__init__(name, documentation, labelnames, registry)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        values = self._shards.local()
+        key = self._key(labels)
+        current = values.get(key)
+        if current is None:
+            values[key] = [amount]
+        else:
+            current[0] += amount
+
+    def value(self, **labels: str) -> float:
+        merged = self._shards.merged().get(self._key(labels))
+        return merged[0] if merged else 0.0
+
+    def collect(self) -> MetricFamily:
+        samples = [
+            Sample(self.name, self._labels(key), values[0])
+            for key, values in sorted(self._shards.merged().items())
+        ]
+        return MetricFamily(self.name, self.documentation, self.type, samples)
+
+    def clear(self) -> None:
+        self._shards.clear()
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down. ``inc``/``dec`` are sharded per thread like
+    counters; ``set`` and ``set_function`` replace the value for a label set.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "MetricsRegistry | None" = None,
+    ) -> None:
+        self._shards = _Shards()
+        self._values: dict[LabelValues, float] = {}
+        self._functions: dict[LabelValues, Callable[[], float]] = {}
+        super().__init__(name, documentation, labelnames, registry)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        values = self._shards.local()
+        key = self._key(labels)
+        current = values.get(key)
+        if current is None:
+            values[key] = [amount]
+        else:
+            current[0] += amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """Evaluate function at collection time to obtain the value."""
+        self._functions[self._key(labels)] = function
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        return self._merged().get(key, 0.0)
+
+    def _merged(self) -> dict[LabelValues, float]:
+        out = {key: values[0] for key, values in self._shards.merged().items()}
+        for key, value in list(self._values.items()):
+            out[key] = out.get(key, 0.0) + value
+        for key, function in list(self._functions.items()):
+            out[key] = out.get(key, 0.0) + function()
+        return out
+
+    def collect(self) -> MetricFamily:
+        samples = [
+            Sample(self.name, self._labels(key), value)
+            for key, value in sorted(self._merged().items())
+        ]
+        return MetricFamily(self.name, self.documentation, self.type, samples)
+
+    def clear(self) -> None:
+        self._shards.clear()
+        self._values.clear()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: "MetricsRegistry | None" = None,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards()
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels: str) -> None:
+        values = self._shards.local()
+        key = self._key(labels)
+        # Layout: one (non-cumulative) count per bucket, +Inf, sum, count
+        current = values.get(key)
+        if current is None:
+            current = [0.0] * (len(self.buckets) + 3)
+            values[key] = current
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        current[index] += 1
+        current[-2] += value
+        current[-1] += 1
+
+    def snapshot(self, **labels: str) -> tuple[float, float]:
+        """Returns the (sum, count) of the observations for a label set."""
+        merged = self._shards.merged().get(self._key(labels))
+        if merged is None:
+            return 0.0, 0.0
+        return merged[-2], merged[-1]
+
+    def collect(self) -> MetricFamily:
+        samples: list[Sample] = []
+        for key, values in sorted(self._shards.merged().items()):
+            labels = self._labels(key)
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), values):
+                cumulative += count
+                samples.append(
+                    Sample(
+                        f"{self.name}_bucket",
+                        {**labels, "le": _format_value(bound)},
+                        cumulative,
+                    )
+                )
+            samples.append(Sample(f"{self.name}_sum", labels, values[-2]))
+            samples.append(Sample(f"{self.name}_count", labels, values[-1]))
+        return MetricFamily(self.name, self.documentation, self.type, samples)
+
+    def clear(self) -> None:
+        self._shards.clear()
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Metric | None:
+        return self._metrics.get(name)
+
+    def collect(self) -> list[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect() for metric in metrics]
+
+    def clear(self) -> None:
+        """Reset every recorded value (for tests)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+CACHE_REQUESTS = Counter(
+    "prs_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result"),
+)
+
+
+def write_snapshot(directory: str, registry: MetricsRegistry = REGISTRY) -> None:
+    """
+    Write the metrics of this process to <directory>/<pid>.json. The file is
+    replaced atomically, so readers never see a partial snapshot.
+    """
+    families = [
+        {
+            "name": family.name,
+            "documentation": family.documentation,
+            "type": family.type,
+            "samples": [
+                [sample.name, sample.labels, sample.value] for sample in family.samples
+            ],
+        }
+        for family in registry.collect()
+    ]
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(families, fh)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_snapshots(directory: str) -> list[MetricFamily]:
+    """
+    Sum the snapshots of all processes in directory. Gauges of processes that
+    are no longer running are left out. Their counters and histograms are kept,
+    so totals don't drop when a worker is restarted.
+    """
+    SampleKey = tuple[str, tuple[tuple[str, str], ...]]
+    merged: dict[str, tuple[str, str, dict[SampleKey, Sample]]] = {}
+
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        pid, ext = os.path.splitext(entry.name)
+        if ext != ".json" or not pid.isdigit():
+            continue
+        try:
+            with open(entry.path) as fh:
+                families = json.load(fh)
+        except (OSError, ValueError):
+            # Removed or being replaced meanwhile
+            continue
+
+        alive = _pid_alive(int(pid))
+        for family in families:
+            if family["type"] == "gauge" and not alive:
+                continue
+            _, _, samples = merged.setdefault(
+                family["name"], (family["documentation"], family["type"], {})
+            )
+            for name, labels, value in family["samples"]:
+                key = (name, tuple(sorted(labels.items())))
+                current = samples.get(key)
+                samples[key] = Sample(
+                    name, labels, value if current is None else current.value + value
+                )
+
+    return [
+        MetricFamily(name, documentation, type_, list(samples.values()))
+        for name, (documentation, type_, samples) in merged.items()
+    ]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return f"{int(value)}.0"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    """Render metric families in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {_escape(family.documentation)}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            if sample.labels:
+                labels = ",".join(
+                    f'{name}="{_escape(value)}"'
+                    for name, value in sample.labels.items()
+                )
+                lines.append(f"{sample.name}{{{labels}}} {_format_value(sample.value)}")
+            else:
+                lines.append(f"{sample.name} {_format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
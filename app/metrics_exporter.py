@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from app.config import ConfigMetrics
+from app.metrics import (
+    REGISTRY,
+    MetricFamily,
+    MetricsRegistry,
+    collect_snapshots,
+    render,
+    write_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsExporter:
+    """
+    Makes the metrics of this process available on /metrics.
+
+    In a multi-worker deployment (multiprocess_dir is set) a background thread
+    writes a snapshot of this worker's metrics every snapshot_interval seconds,
+    and collecting returns the sum over all workers. When a separate port is
+    configured, the same thread serves /metrics on it. Only one worker can bind
+    the port; the others keep trying, so one of them takes over when the serving
+    worker goes away.
+    """
+
+    def __init__(
+        self, config: ConfigMetrics, registry: MetricsRegistry = REGISTRY
+    ) -> None:
+        self.config = config
+        self._registry = registry
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._server: ThreadingHTTPServer | None = None
+
+        if config.multiprocess_dir:
+            os.makedirs(config.multiprocess_dir, exist_ok=True)
+
+    def collect(self) -> list[MetricFamily]:
+        directory = self.config.multiprocess_dir
+        if not directory:
+            return self._registry.collect()
+
+        write_snapshot(directory, self._registry)
+        return collect_snapshots(directory)
+
+    def render(self) -> str:
+        return render(self.collect())
+
+    def start(self) -> None:
+        if not (self.config.multiprocess_dir or self.config.port):
+            return
+
+        self._stop.clear()
+        self._tick()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.config.multiprocess_dir:
+            # Keep the final counter values in the aggregate
+            write_snapshot(self.config.multiprocess_dir, self._registry)
+
+    @property
+    def server_address(self) -> tuple[str, int] | None:
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.config.snapshot_interval):
+            self._tick()
+
+    def _tick(self) -> None:
+        try:
+            if self.config.multiprocess_dir:
+                write_snapshot(self.config.multiprocess_dir, self._registry)
+            if self.config.port and self._server is None:
+                self._serve()
+        except Exception:
+            logger.exception("failed to export metrics")
+
+    def _serve(self) -> None:
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        try:
+            server = ThreadingHTTPServer(
+                (self.config.host, self.config.port or 0), Handler
+            )
+        except OSError as e:
+            logger.debug("not serving metrics on port %s: %s", self.config.port, e)
+            return
+
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        self._server = server
+        logger.info("serving metrics on %s:%s", self.config.host, self.config.port)
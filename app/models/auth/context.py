@@ -3,14 +3,14 @@ from dataclasses import dataclass
 from app.models.oin import Oin
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AuthenticationClaims:
     organization_id: Oin
     client_organization_id: Oin
     client_common_name: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AuthContext:
     """
     Authentication context extracted from the bearer token. This can be used in the route handlers
@@ -1,27 +1,17 @@
-from typing import Annotated, Any, Dict, Self
-
-from fastapi import Request
-from pydantic import BaseModel, ConfigDict, Field
+from functools import lru_cache
 
 from app.models.oin import Oin
 
+ORGANIZATION_ID_HEADER = "x-gf-sub"
+CLIENT_ORGANIZATION_ID_HEADER = "x-gf-act-sub"
+CLIENT_COMMON_NAME_HEADER = "x-gf-act-cn"
+AUDIENCE_HEADER = "x-gf-audience"
 
-class AuthHeaders(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
-
-    organization_id: Annotated[Oin, Field(alias="x-gf-sub")]
-    client_organization_id: Annotated[Oin, Field(alias="x-gf-act-sub")]
-    client_organization_common_name: Annotated[str, Field(alias="x-gf-act-cn")]
-    audience: Annotated[str, Field(alias="x-gf-audience")]
-
-    @classmethod
-    def from_request(cls, req: Request) -> Self:
-        headers = req.headers
-        data: Dict[str, Any] = {}
-        for name, field in cls.model_fields.items():
-            header_name = field.alias or name
-            value = headers.get(header_name)
-
-            data[name] = value
 
-        return cls(**data)
+@lru_cache(maxsize=4096)
+def header_oin(value: str | None) -> Oin:
+    """
+    The Oin of a header value. Callers send the same few OINs on every request,
+    so validated OINs are kept; invalid values raise ValueError and are not.
+    """
+    return Oin(value)
@@ -5,7 +5,7 @@ from typing import Any, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
-from app.models.oin import RecipientOrganizationOin
+from app.models.oin import Oin, RecipientOrganizationOin
 from app.personal_id import PersonalId
 from app.services.pseudonym_service import PseudonymType
 from app.rid import RidUsage
@@ -146,6 +146,82 @@ class HsmKeyVersionUpdateRequest(BaseModel):
         return self
 
 
+class HsmKeyRotationRequest(BaseModel):
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
+            "x-temporal-constraints": [
+                "from_dt must not be earlier than now",
+                "previous_until_dt must not be earlier than from_dt (or now when from_dt is omitted)",
+                "timezone offset is required for from_dt and previous_until_dt (RFC3339 date-time format)",
+            ],
+            "examples": [
+                {
+                    "organizations": ["00000099000000001000"],
+                    "from_dt": "2026-01-01T00:00:00Z",
+                    "previous_until_dt": "2026-01-08T00:00:00Z",
+                    "provision": True,
+                },
+                {"all_organizations": True},
+            ],
+        },
+    )
+
+    organizations: List[Oin] | None = Field(
+        default=None,
+        min_length=1,
+        description="OINs of the organizations to rotate the key versions of.",
+    )
+    all_organizations: bool = Field(
+        default=False,
+        description=(
+            "Rotate the key versions of all organizations. Set either this or "
+            "`organizations`."
+        ),
+    )
+    from_dt: datetime | None = Field(
+        default=None,
+        description=(
+            "Start of the new key versions as an ISO-8601 datetime with an "
+            "explicit timezone offset. Defaults to now."
+        ),
+    )
+    previous_until_dt: datetime | None = Field(
+        default=None,
+        description=(
+            "End of the previous key versions as an ISO-8601 datetime with an "
+            "explicit timezone offset. Defaults to `from_dt`; a later moment "
+            "keeps the previous versions in use alongside the new ones until then."
+        ),
+    )
+    provision: bool = Field(
+        default=False,
+        description="Generate the keys of the new versions in the HSM right away.",
+    )
+
+    @field_validator("from_dt", "previous_until_dt")
+    @classmethod
+    def require_timezone(cls, value: datetime | None) -> datetime | None:
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            raise ValueError("datetime values must include a timezone offset")
+        return value
+
+    @model_validator(mode="after")
+    def validate_rotation(self) -> "HsmKeyRotationRequest":
+        if self.all_organizations == (self.organizations is not None):
+            raise ValueError("set either organizations or all_organizations")
+
+        now = datetime.now(timezone.utc)
+        if self.from_dt and self.from_dt < now:
+            raise ValueError("from_dt must not be earlier than now")
+        if self.previous_until_dt and self.previous_until_dt < (self.from_dt or now):
+            raise ValueError("previous_until_dt must not be earlier than from_dt")
+
+        return self
+
+
 class RidReceiveRequest(BaseModel):
     rid: str
     recipientOrganization: RecipientOrganizationOin
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination of the administration list endpoints.
+
+A page holds at most limit entries, ordered by a unique sort key. The cursor of
+the next page is the sort key of the last entry, encoded as an opaque string, so
+every page is read with an index range scan (WHERE key > cursor ORDER BY key
+LIMIT n) however far into the list it is.
+
+For exports the entries are streamed instead, as one JSON array read and
+written a page at a time, so the memory a worker uses stays bounded by the page
+size.
+"""
+
+import base64
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any, List, NamedTuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+# Entries per page when the caller gives no limit, and at most
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Entries read per page of a streamed export
+EXPORT_BATCH = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor was not returned by a previous page."""
+
+
+class Page(NamedTuple):
+    items: List[dict[str, Any]]
+    # Cursor of the next page, None on the last page
+    next_cursor: str | None
+
+
+def encode_cursor(*key: Any) -> str:
+    return (
+        base64.urlsafe_b64encode(json.dumps(jsonable_encoder(key)).encode())
+        .rstrip(b"=")
+        .decode()
+    )
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except ValueError as e:
+        raise InvalidCursorError(f"invalid cursor {cursor!r}") from e
+    if not isinstance(key, list):
+        raise InvalidCursorError(f"invalid cursor {cursor!r}")
+    return key
+
+
+def stream_json_array(pages: Iterable[List[dict[str, Any]]]) -> Iterator[bytes]:
+    """Encode the entries of the pages as one JSON array, a chunk per page."""
+    yield b"["
+    first = True
+    for page in pages:
+        if not page:
+            continue
+        chunk = json.dumps(jsonable_encoder(page))[1:-1]
+        yield (chunk if first else "," + chunk).encode()
+        first = False
+    yield b"]"
+
+
+def page_response(request: Request, page: Page) -> JSONResponse:
+    """
+    The entries of the page as a JSON array, with a Link header to the next
+    page unless it is the last one.
+    """
+    headers = {}
+    if page.next_cursor is not None:
+        # Relative, as the scheme and host seen behind the proxy are not the
+        # client's
+        url = request.url.include_query_params(after=page.next_cursor)
+        headers["Link"] = f'<{url.path}?{url.query}>; rel="next"'
+    return JSONResponse(
+        status_code=200, content=jsonable_encoder(page.items), headers=headers
+    )
+
+
+def streaming_response(pages: Iterable[List[dict[str, Any]]]) -> StreamingResponse:
+    """
+    The entries of all pages as one JSON array. The pages are read while the
+    response is sent, in a worker thread as they come from the database.
+    """
+    return StreamingResponse(stream_json_array(pages), media_type="application/json")
@@ -0,0 +1,40 @@
+import logging
+
+from fastapi import Depends, HTTPException
+
+from app import container
+from app.auth import get_auth_ctx
+from app.models.auth.context import AuthContext
+from app.models.oin import Oin
+from app.models.requests import BlindRequest
+from app.services.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+def enforce_rate_limit(
+    rate_limiter: RateLimiter, auth: AuthContext, target: Oin
+) -> None:
+    """Raise a 429 when the calling organization exceeded its limit for target."""
+    client_oin = auth.claims.client_organization_id.value
+    wait = rate_limiter.check(client_oin, target.value)
+    if wait > 0:
+        logger.warning(
+            "rate limit exceeded by oin=%s for target oin=%s", client_oin, target.value
+        )
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": rate_limiter.retry_after(wait)},
+        )
+
+
+def oprf_rate_limit(
+    # Must have the same name as the body parameter of the route, so FastAPI
+    # parses the body once and passes it to both
+    req: BlindRequest,
+    auth: AuthContext = Depends(get_auth_ctx),
+    rate_limiter: RateLimiter = Depends(container.get_rate_limiter),
+) -> None:
+    """Rate limit per calling organization and recipient organization."""
+    enforce_rate_limit(rate_limiter, auth, req.recipientOrganization)
@@ -0,0 +1,97 @@
+"""
+Bulk HSM key version rotation program.
+
+Creates a new key version for the given organizations, or for all of them, and
+ends their previous versions, see HsmKeyRotationService:
+
+    python3 -m app.rotate_keys --all --provision
+    python3 -m app.rotate_keys --oin 00000099000000001000 --oin 00000099000000002000
+
+It exits with 0 on success and 1 on failure, including keys that failed to
+provision (those are generated on first use instead).
+"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime, timezone
+
+from app import application, container
+from app.models.oin import Oin
+from app.services.hsm_key_version_service import (
+    HsmKeyRotationOrganizationsNotFoundError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _datetime(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        raise ValueError("a timezone offset is required")
+    return dt
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Rotate HSM key versions")
+    organizations = parser.add_mutually_exclusive_group(required=True)
+    organizations.add_argument(
+        "--oin",
+        action="append",
+        type=Oin,
+        help="OIN of an organization to rotate (repeatable)",
+    )
+    organizations.add_argument(
+        "--all", action="store_true", help="rotate all organizations"
+    )
+    parser.add_argument(
+        "--from",
+        dest="from_dt",
+        type=_datetime,
+        help="start of the new versions (ISO-8601 with offset, default now)",
+    )
+    parser.add_argument(
+        "--previous-until",
+        type=_datetime,
+        help="end of the previous versions (ISO-8601 with offset, default --from)",
+    )
+    parser.add_argument(
+        "--provision",
+        action="store_true",
+        help="generate the keys of the new versions in the HSM",
+    )
+    args = parser.parse_args(argv)
+
+    from_dt = args.from_dt or datetime.now(timezone.utc)
+    if args.previous_until and args.previous_until < from_dt:
+        parser.error("--previous-until must not be earlier than --from")
+
+    application.application_init()
+
+    service = container.get_hsm_key_rotation_service()
+    try:
+        result = service.rotate(
+            None if args.all else args.oin,
+            from_dt=from_dt,
+            previous_until_dt=args.previous_until,
+            provision=args.provision,
+        )
+    except HsmKeyRotationOrganizationsNotFoundError as e:
+        logger.error("HSM key rotation failed: %s", e)
+        return 1
+    except Exception:
+        logger.exception("HSM key rotation failed")
+        return 1
+
+    logger.info(
+        "HSM key rotation finished: %d version(s) created, %d ended, "
+        "%d key(s) provisioned",
+        len(result.created),
+        result.ended,
+        result.provisioned,
+    )
+    return 1 if result.provision_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
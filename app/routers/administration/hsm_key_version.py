@@ -1,16 +1,29 @@
+import itertools
 import logging
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
 from fastapi.encoders import jsonable_encoder
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 from app import container
 from app.auth import authenticated_organization
 from app.db.entities.organization import Organization
-from app.models.requests import HsmKeyVersionRequest, HsmKeyVersionUpdateRequest
+from app.pagination import (
+    MAX_LIMIT,
+    InvalidCursorError,
+    page_response,
+    streaming_response,
+)
+from app.models.requests import (
+    HsmKeyRotationRequest,
+    HsmKeyVersionRequest,
+    HsmKeyVersionUpdateRequest,
+)
+from app.services.hsm_key_rotation_service import HsmKeyRotationService
 from app.services.hsm_key_version_service import (
+    HsmKeyRotationOrganizationsNotFoundError,
     HsmKeyVersionNotFoundError,
     HsmKeyVersionService,
 )
@@ -53,15 +66,36 @@ def post_key_version(
     tags=["Key Version Services"],
 )
 def list_key_versions(
+    request: Request,
     hsm_key_version_service: Annotated[
         HsmKeyVersionService, Depends(container.get_hsm_key_version_service)
     ],
     auth_org: Annotated[Organization, Depends(authenticated_organization)],
-) -> JSONResponse:
-    versions = hsm_key_version_service.get_versions_by_organization_id(auth_org.id)
-    return JSONResponse(
-        status_code=200, content=jsonable_encoder([v.to_dict() for v in versions])
-    )
+    limit: Annotated[
+        int | None,
+        Query(
+            ge=1, le=MAX_LIMIT, description="Entries per page, all versions if omitted"
+        ),
+    ] = None,
+    after: Annotated[
+        str | None, Query(description="Cursor from the Link header of a page")
+    ] = None,
+    stream: Annotated[
+        bool, Query(description="Stream all versions (after the cursor)")
+    ] = False,
+) -> Response:
+    try:
+        if stream or limit is None:
+            pages = hsm_key_version_service.iter_by_organization_id(auth_org.id, after)
+            # Read the first page now, so an invalid cursor is still a 400
+            first = next(pages)
+            return streaming_response(itertools.chain([first], pages))
+        page = hsm_key_version_service.get_page_by_organization_id(
+            auth_org.id, after, limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(request, page)
 
 
 @router.put(
@@ -95,3 +129,47 @@ def put_key_version(
         raise HTTPException(status_code=500, detail="failed to update key version")
 
     return JSONResponse(status_code=200, content=jsonable_encoder(entry.to_dict()))
+
+
+@router.post(
+    "/key-versions/rotate",
+    summary="Rotate the HSM key versions of many or all organizations",
+    tags=["Key Version Services"],
+)
+def rotate_key_versions(
+    req: HsmKeyRotationRequest,
+    hsm_key_rotation_service: Annotated[
+        HsmKeyRotationService, Depends(container.get_hsm_key_rotation_service)
+    ],
+    auth_org: Annotated[Organization, Depends(authenticated_organization)],
+) -> JSONResponse:
+    if not hsm_key_rotation_service.may_rotate(auth_org.oin):
+        logger.warning(
+            "organization %s is not allowed to rotate key versions", auth_org.oin
+        )
+        raise HTTPException(status_code=403, detail="forbidden")
+
+    try:
+        result = hsm_key_rotation_service.rotate(
+            req.organizations,
+            from_dt=req.from_dt,
+            previous_until_dt=req.previous_until_dt,
+            provision=req.provision,
+        )
+    except HsmKeyRotationOrganizationsNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception:
+        logger.exception("failed to rotate key versions")
+        raise HTTPException(status_code=500, detail="failed to rotate key versions")
+
+    return JSONResponse(
+        status_code=201,
+        content=jsonable_encoder(
+            {
+                "created": [version._asdict() for version in result.created],
+                "ended": result.ended,
+                "provisioned": result.provisioned,
+                "provision_failed": [str(label) for label in result.provision_failed],
+            }
+        ),
+    )
@@ -1,14 +1,21 @@
+import itertools
 import logging
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Request
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from starlette.responses import JSONResponse, Response
 
 from app import container
 from app.auth import authenticated_organization
 from app.db.entities.organization import Organization
 from app.models.requests import RegisterRequest
+from app.pagination import (
+    MAX_LIMIT,
+    InvalidCursorError,
+    page_response,
+    streaming_response,
+)
 from app.services.key_resolver import (
     AlreadyExistsError,
     KeyNotFoundError,
@@ -63,12 +70,30 @@ def post_key(
     tags=["Key Registration Services"],
 )
 def list_keys_for_org(
+    request: Request,
     auth_org: Annotated[Organization, Depends(authenticated_organization)],
     key_resolver: Annotated[KeyResolver, Depends(container.get_key_resolver)],
-) -> JSONResponse:
-    entries = key_resolver.get_by_org(auth_org.id) or []
-
-    return JSONResponse(status_code=200, content=[k.to_dict() for k in entries])
+    limit: Annotated[
+        int | None,
+        Query(ge=1, le=MAX_LIMIT, description="Entries per page, all keys if omitted"),
+    ] = None,
+    after: Annotated[
+        str | None, Query(description="Cursor from the Link header of a page")
+    ] = None,
+    stream: Annotated[
+        bool, Query(description="Stream all keys (after the cursor)")
+    ] = False,
+) -> Response:
+    try:
+        if stream or limit is None:
+            pages = key_resolver.iter_by_org(auth_org.id, after)
+            # Read the first page now, so an invalid cursor is still a 400
+            first = next(pages)
+            return streaming_response(itertools.chain([first], pages))
+        page = key_resolver.get_page_by_org(auth_org.id, after, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(request, page)
 
 
 @router.put(
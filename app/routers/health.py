@@ -4,9 +4,10 @@ from typing import Annotated
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 
-from app.container import get_database
+from app.container import get_database, get_health_prober
 from app.db.db import Database
 from app.logging.events import HEALTH_UNHEALTHY, log_event
+from app.services.health_prober import HealthProber
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -84,3 +85,42 @@ def health(
             error_detail=error,
         )
     return JSONResponse(status_code=503, content=content)
+
+
+@router.get(
+    "/livez",
+    summary="Liveness probe",
+    description="Answers as long as the process can handle requests. Does not "
+    "check any dependency.",
+    tags=["Health"],
+)
+async def livez() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@router.get(
+    "/readyz",
+    summary="Readiness probe",
+    description="Reports the last results of the background database and HSM "
+    "checks. Ready once the worker has warmed up and every check succeeded "
+    "recently; does not query the dependencies itself.",
+    responses={503: {"description": "Not warmed up yet or a component is unhealthy"}},
+    tags=["Health"],
+)
+async def readyz(
+    prober: Annotated[HealthProber, Depends(get_health_prober)],
+) -> JSONResponse:
+    readiness = prober.readiness()
+    components = {
+        name: {
+            "status": "unknown" if result is None else ok_or_error(result.healthy),
+            "checked_at": None if result is None else result.checked_at,
+        }
+        for name, result in readiness.results.items()
+    }
+    content = {
+        "status": "ready" if readiness.ready else "not_ready",
+        "warmed_up": readiness.warmed_up,
+        "components": components,
+    }
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=content)
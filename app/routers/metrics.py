@@ -0,0 +1,15 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Response
+
+from app.container import get_metrics_exporter
+from app.metrics_exporter import CONTENT_TYPE, MetricsExporter
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(
+    exporter: Annotated[MetricsExporter, Depends(get_metrics_exporter)],
+) -> Response:
+    return Response(content=exporter.render(), media_type=CONTENT_TYPE)
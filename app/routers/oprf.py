@@ -14,6 +14,7 @@ from app.logging.events import (
 )
 from app.models.auth.context import AuthContext
 from app.models.requests import BlindRequest
+from app.rate_limit import oprf_rate_limit
 from app.services.key_resolver import KeyResolver
 from app.services.oprf.oprf_service import OprfService
 from app.services.org_service import OrgService
@@ -28,6 +29,7 @@ _ENDPOINT = "/oprf/eval"
     "/oprf/eval",
     summary="Evaluate OPRF blind and returns an encrypted JWE for the organization",
     tags=["OPRF Services"],
+    dependencies=[Depends(oprf_rate_limit)],
 )
 def post_eval(
     req: BlindRequest,
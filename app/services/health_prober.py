@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from functools import partial
+
+from app.logging.events import HEALTH_UNHEALTHY, log_event
+from app.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_UP = Gauge(
+    "prs_health_check_up",
+    "1 when the last background health check of a component succeeded",
+    ("component",),
+)
+
+# A check returns None when the component is healthy, the error otherwise
+HealthCheck = Callable[[], str | None]
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    error: str | None
+    # time.time() of the end of the check
+    checked_at: float
+    duration: float
+
+    @property
+    def healthy(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class Readiness:
+    ready: bool
+    warmed_up: bool
+    results: Mapping[str, ProbeResult | None]
+
+
+class HealthProber:
+    """
+    Runs the health checks (database, HSM) from a background thread every
+    interval seconds and keeps the last result of each, so liveness and
+    readiness probes only read memory instead of querying the dependencies.
+
+    The service is ready once warm-up has finished and the last check of every
+    component succeeded and is at most max_age seconds old.
+    """
+
+    def __init__(
+        self,
+        checks: Mapping[str, HealthCheck],
+        interval: float = 5.0,
+        max_age: float | None = None,
+    ) -> None:
+        self._checks = dict(checks)
+        self.interval = interval
+        self.max_age = max_age if max_age is not None else 3 * interval
+        self._results: dict[str, ProbeResult] = {}
+        self._warmed_up = False
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        for name in self._checks:
+            HEALTH_CHECK_UP.set_function(partial(self._is_up, name), component=name)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="health-prober", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Not ready anymore while shutting down
+        self._warmed_up = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def mark_warmed_up(self) -> None:
+        self._warmed_up = True
+
+    def probe(self) -> None:
+        """Run every check once and store the results."""
+        for name, check in self._checks.items():
+            start = time.perf_counter()
+            try:
+                error = check()
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            result = ProbeResult(error, time.time(), time.perf_counter() - start)
+
+            previous = self._results.get(name)
+            self._results[name] = result
+            if result.error is not None and (previous is None or previous.healthy):
+                log_event(
+                    logger,
+                    HEALTH_UNHEALTHY,
+                    "Health check unhealthy",
+                    component=name,
+                    status="error",
+                    error_detail=result.error,
+                )
+            elif result.healthy and previous is not None and not previous.healthy:
+                logger.info("health check of %s recovered", name)
+
+    def readiness(self) -> Readiness:
+        results = {name: self._results.get(name) for name in self._checks}
+        now = time.time()
+        ready = self._warmed_up and all(
+            result is not None
+            and result.healthy
+            and now - result.checked_at <= self.max_age
+            for result in results.values()
+        )
+        return Readiness(ready, self._warmed_up, results)
+
+    def _is_up(self, name: str) -> float:
+        result = self._results.get(name)
+        return 1.0 if result is not None and result.healthy else 0.0
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.probe()
+            except Exception:
+                logger.exception("health probe failed")
+            if self._stop.wait(self.interval):
+                return
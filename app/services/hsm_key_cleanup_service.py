@@ -1,13 +1,24 @@
 import logging
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import requests
 
 from app.config import ConfigOprf
+from app.db.repositories.hsm_key_version_repository import ExpiredHsmKeyVersion
+from app.models.oin import Oin
 from app.services.hsm_key_version_service import HsmKeyVersionService
-from app.services.oprf.evaluators import HsmKeyLabel
+from app.services.oprf.evaluators import HSM_REQUEST_DURATION, HsmKeyLabel
 
 logger = logging.getLogger(__name__)
 
+# Expired versions read, destroyed and marked removed (in one UPDATE) at a time;
+# a crash leaves at most this many destroyed keys unmarked
+_EXPIRED_BATCH = 500
+# Failed labels listed in the summary
+_FAILURES_LISTED = 20
+
 
 class HsmKeyCleanupService:
     """
@@ -15,6 +26,10 @@ class HsmKeyCleanupService:
     version whose end date has passed (and which has not been removed yet), the
     corresponding key is destroyed in the HSM and the version is marked as removed
     in the database.
+
+    The expired versions are streamed in batches. The keys of a batch are
+    destroyed concurrently (hsm_cleanup_concurrency) over one pool of HSM
+    connections, and the destroyed versions are marked removed in bulk.
     """
 
     def __init__(
@@ -24,6 +39,12 @@ class HsmKeyCleanupService:
     ) -> None:
         self.__hsm_config = hsm_config
         self.__version_service = version_service
+        self.__concurrency = hsm_config.hsm_cleanup_concurrency if hsm_config else 1
+        # Keeps the TLS connections to the HSM API open between keys
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.__concurrency)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def cleanup_expired_keys(self) -> int:
         """
@@ -34,45 +55,89 @@ class HsmKeyCleanupService:
             logger.debug("HSM not configured, skipping expired key cleanup")
             return 0
 
-        expired = self.__version_service.get_expired_versions()
         cleaned = 0
-        for version in expired:
+        processed = 0
+        failed: list[HsmKeyLabel] = []
+        with ThreadPoolExecutor(
+            max_workers=self.__concurrency, thread_name_prefix="hsm-cleanup"
+        ) as executor:
+            for batch in self.__version_service.iter_expired_versions(
+                batch_size=_EXPIRED_BATCH
+            ):
+                destroyed = self._destroy_keys(executor, batch, failed)
+                cleaned += self.__version_service.mark_removed_many(destroyed)
+                processed += len(batch)
+                logger.info(
+                    "HSM key cleanup progress: %d processed, %d cleaned, %d failed",
+                    processed,
+                    cleaned,
+                    len(failed),
+                )
+
+        if cleaned:
+            logger.info("cleaned up %d expired HSM key version(s)", cleaned)
+        if failed:
+            listed = ", ".join(str(label) for label in failed[:_FAILURES_LISTED])
+            if len(failed) > _FAILURES_LISTED:
+                listed += f" and {len(failed) - _FAILURES_LISTED} more"
+            logger.warning(
+                "failed to destroy %d expired HSM key(s): %s", len(failed), listed
+            )
+        return cleaned
+
+    def _destroy_keys(
+        self,
+        executor: ThreadPoolExecutor,
+        batch: list[ExpiredHsmKeyVersion],
+        failed: list[HsmKeyLabel],
+    ) -> list[uuid.UUID]:
+        """
+        Destroy the keys of a batch of expired versions concurrently. Returns the
+        ids of the versions whose key was destroyed, and adds the others to failed.
+        """
+        labels: dict[Future[None], tuple[uuid.UUID, HsmKeyLabel]] = {}
+        for expired in batch:
             try:
-                label = HsmKeyLabel(version.organization.oin, version.version)
+                label = HsmKeyLabel(Oin(expired.oin), expired.version)
             except ValueError:
-                logger.exception(
-                    "Value %r is not a correct OIN number",
-                    version.organization.oin,
-                )
+                logger.exception("Value %r is not a correct OIN number", expired.oin)
                 continue
+            labels[executor.submit(self._destroy_key, label)] = (expired.id, label)
 
+        destroyed = []
+        for future in as_completed(labels):
+            version_id, label = labels[future]
             try:
-                self._destroy_key(label)
+                future.result()
             except Exception:
                 # Leave the version untouched so the next run retries it.
                 logger.exception("failed to destroy HSM key %r", label)
-                continue
-
-            self.__version_service.mark_removed(version.id)
-            cleaned += 1
-            logger.info("removed expired HSM key %r", label)
-
-        if cleaned:
-            logger.info("cleaned up %d expired HSM key version(s)", cleaned)
-        return cleaned
+                failed.append(label)
+            else:
+                destroyed.append(version_id)
+                logger.info("removed expired HSM key %r", label)
+        return destroyed
 
     def _destroy_key(self, label: HsmKeyLabel) -> None:
         cfg = self.__hsm_config
         url = f"{cfg.hsm_url}/hsm/{cfg.hsm_module}/{cfg.hsm_slot}/destroy"
-        response = requests.post(
-            url,
-            json={"label": str(label)},
-            timeout=10,
-            verify=cfg.hsm_ca_cert_file or True,
-            cert=(
-                (cfg.hsm_cert_file, cfg.hsm_key_file)
-                if (cfg.hsm_cert_file and cfg.hsm_key_file)
-                else None
-            ),
-        )
-        response.raise_for_status()
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            response = self._session.post(
+                url,
+                json={"label": str(label)},
+                timeout=10,
+                verify=cfg.hsm_ca_cert_file or True,
+                cert=(
+                    (cfg.hsm_cert_file, cfg.hsm_key_file)
+                    if (cfg.hsm_cert_file and cfg.hsm_key_file)
+                    else None
+                ),
+            )
+            response.raise_for_status()
+            outcome = "ok"
+        finally:
+            HSM_REQUEST_DURATION.observe(
+                time.perf_counter() - start, operation="destroy", outcome=outcome
+            )
@@ -0,0 +1,146 @@
+import logging
+from collections.abc import Collection, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, NamedTuple
+
+from app.db.repositories.hsm_key_version_repository import RotatedHsmKeyVersion
+from app.models.oin import Oin
+from app.services.hsm_key_version_service import HsmKeyVersionService
+from app.services.oprf.evaluators import HsmKeyLabel, HsmOprfEvaluator
+
+logger = logging.getLogger(__name__)
+
+
+class HsmKeyRotationResult(NamedTuple):
+    created: List[RotatedHsmKeyVersion]
+    # Previous versions whose end date was set
+    ended: int
+    # Keys of the new versions generated in (or already present in) the HSM
+    provisioned: int
+    provision_failed: List[HsmKeyLabel]
+
+
+class HsmKeyRotationService:
+    """
+    Rotates the key versions of many (or all) organizations at once: creates a
+    new version for each and ends the previous ones, in a few set-based
+    statements instead of one transaction per organization.
+
+    The keys of the new versions can be provisioned in the HSM right away,
+    concurrently (hsm_provision_concurrency), so the first evaluations after the
+    rotation don't have to generate them. Keys that fail to provision are
+    generated on first use, like those of any other new version.
+
+    The maintenance daemon provisions the keys of the versions that have yet to
+    start on a schedule as well, see provision_upcoming.
+    """
+
+    def __init__(
+        self,
+        version_service: HsmKeyVersionService,
+        evaluator: HsmOprfEvaluator | None,
+        concurrency: int = 8,
+        allowed_oins: Collection[str] = (),
+    ) -> None:
+        self.__version_service = version_service
+        self.__evaluator = evaluator
+        self.__concurrency = concurrency
+        self.__allowed_oins = frozenset(allowed_oins)
+
+    def may_rotate(self, oin: Oin) -> bool:
+        """Whether the organization may rotate the versions of others."""
+        return oin.value in self.__allowed_oins
+
+    def rotate(
+        self,
+        oins: Sequence[Oin] | None = None,
+        from_dt: datetime | None = None,
+        previous_until_dt: datetime | None = None,
+        provision: bool = False,
+    ) -> HsmKeyRotationResult:
+        """
+        Rotate the key versions of the organizations with the given OINs, or of
+        all organizations when oins is None, see
+        HsmKeyVersionService.rotate_versions. With provision the keys of the new
+        versions are generated in the HSM as well.
+        """
+        rotation = self.__version_service.rotate_versions(
+            oins, from_dt=from_dt, previous_until_dt=previous_until_dt
+        )
+        logger.info(
+            "rotated hsm key versions: %d created, %d ended",
+            len(rotation.created),
+            rotation.ended,
+        )
+
+        failed: List[HsmKeyLabel] = []
+        provisioned = 0
+        if provision and rotation.created:
+            if self.__evaluator is None:
+                logger.warning("HSM not configured, not provisioning the new keys")
+            else:
+                provisioned, failed = self._provision(
+                    self.__evaluator, rotation.created
+                )
+        return HsmKeyRotationResult(
+            rotation.created, rotation.ended, provisioned, failed
+        )
+
+    def provision_upcoming(self, at: datetime | None = None) -> int:
+        """
+        Provision the keys of the versions that start after at (defaults to
+        now), unless they exist already. Returns the number of keys provisioned
+        or found; keys that fail are retried on the next run.
+        """
+        if self.__evaluator is None:
+            logger.debug("HSM not configured, skipping key provisioning")
+            return 0
+
+        provisioned = 0
+        failed: List[HsmKeyLabel] = []
+        for batch in self.__version_service.iter_upcoming_versions(at):
+            done, batch_failed = self._provision(self.__evaluator, batch)
+            provisioned += done
+            failed += batch_failed
+        logger.info(
+            "HSM key provisioning finished: %d provisioned, %d failed",
+            provisioned,
+            len(failed),
+        )
+        return provisioned
+
+    def _provision(
+        self, evaluator: HsmOprfEvaluator, created: Sequence[RotatedHsmKeyVersion]
+    ) -> tuple[int, List[HsmKeyLabel]]:
+        """
+        Provision the keys of the created versions. Returns the number of keys
+        provisioned and the labels of those that failed.
+        """
+        provisioned = 0
+        failed: List[HsmKeyLabel] = []
+        with ThreadPoolExecutor(
+            max_workers=self.__concurrency, thread_name_prefix="hsm-provision"
+        ) as executor:
+            futures: dict[Future[None], HsmKeyLabel] = {}
+            for version in created:
+                try:
+                    label = HsmKeyLabel(Oin(version.oin), version.version)
+                except ValueError:
+                    logger.exception(
+                        "Value %r is not a correct OIN number", version.oin
+                    )
+                    continue
+                futures[executor.submit(evaluator.provision_key, label)] = label
+            for future in as_completed(futures):
+                label = futures[future]
+                try:
+                    future.result()
+                except Exception:
+                    logger.exception("failed to provision HSM key %r", label)
+                    failed.append(label)
+                else:
+                    provisioned += 1
+        if failed:
+            logger.warning("failed to provision %d HSM key(s)", len(failed))
+        return provisioned, failed
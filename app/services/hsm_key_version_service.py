@@ -1,15 +1,28 @@
 import logging
 import uuid
+from collections.abc import Iterator, Sequence
 from datetime import datetime, timezone
-from typing import List
+from typing import Any, List, NamedTuple
 
 from sqlalchemy.exc import IntegrityError
 
 from app.db.db import Database
 from app.db.entities.hsm_key_versions import HsmKeyVersion
-from app.db.repositories.hsm_key_version_repository import HsmKeyVersionRepository
+from app.db.repositories.hsm_key_version_repository import (
+    ExpiredHsmKeyVersion,
+    HsmKeyVersionRepository,
+    RotatedHsmKeyVersion,
+)
 from app.db.repositories.org_repository import OrgRepository
 from app.models.oin import Oin
+from app.pagination import (
+    DEFAULT_LIMIT,
+    EXPORT_BATCH,
+    InvalidCursorError,
+    Page,
+    decode_cursor,
+    encode_cursor,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +49,22 @@ class HsmKeyVersionCreateConflictError(ValueError):
         self.organization_id = organization_id
 
 
+class HsmKeyRotationOrganizationsNotFoundError(ValueError):
+    """Raised when organizations to rotate the key versions of do not exist."""
+
+    def __init__(self, oins: Sequence[Oin]):
+        super().__init__(
+            "organization(s) not found: " + ", ".join(str(oin) for oin in oins)
+        )
+        self.oins = list(oins)
+
+
+class HsmKeyRotation(NamedTuple):
+    created: List[RotatedHsmKeyVersion]
+    # Previous versions whose end date was set
+    ended: int
+
+
 class HsmKeyVersionService:
     """Manages HSM key versions in the local database."""
 
@@ -50,18 +79,51 @@ class HsmKeyVersionService:
             repo = session.get_repository(HsmKeyVersionRepository)
             return repo.get_by_id(version_id)
 
-    def get_versions_by_organization_id(
+    def get_page_by_organization_id(
         self,
         organization_id: uuid.UUID,
-    ) -> List[HsmKeyVersion]:
+        cursor: str | None = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> Page:
         """
-        Returns all key versions for the given organization id, regardless of
-        date or removed state (for administrative listing).
+        Returns a page of up to limit key versions of the organization, ordered
+        by version number and starting after the cursor of the previous page.
+        Raises InvalidCursorError for a cursor that was not returned by a
+        previous page.
         """
+        after = None
+        if cursor is not None:
+            try:
+                version, version_id = decode_cursor(cursor)
+                after = (int(version), uuid.UUID(version_id))
+            except (TypeError, ValueError) as e:
+                raise InvalidCursorError(f"invalid cursor {cursor!r}") from e
+        # On the primary, so an administrator sees the changes just made
         with self.__db.get_db_session() as session:
             repo = session.get_repository(HsmKeyVersionRepository)
-            versions = repo.get_by_organization_id(organization_id)
-            return versions
+            # One more than the limit, to know whether there is a next page
+            items = repo.get_page_by_organization_id(organization_id, after, limit + 1)
+        if len(items) <= limit:
+            return Page(items, None)
+        items = items[:limit]
+        return Page(items, encode_cursor(items[-1]["version"], items[-1]["id"]))
+
+    def iter_by_organization_id(
+        self,
+        organization_id: uuid.UUID,
+        cursor: str | None = None,
+        batch_size: int = EXPORT_BATCH,
+    ) -> Iterator[List[dict[str, Any]]]:
+        """
+        Yields the key versions of the organization a page at a time, each read
+        in its own session.
+        """
+        while True:
+            page = self.get_page_by_organization_id(organization_id, cursor, batch_size)
+            yield page.items
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
 
     def get_active_versions_by_organization_id(
         self,
@@ -73,7 +135,7 @@ class HsmKeyVersionService:
         the current date/time), restricted to a single organization id.
         """
         at = at or datetime.now(timezone.utc)
-        with self.__db.get_db_session() as session:
+        with self.__db.get_read_session() as session:
             repo = session.get_repository(HsmKeyVersionRepository)
             versions = repo.get_active_versions(at, organization_id=organization_id)
             return versions
@@ -87,7 +149,7 @@ class HsmKeyVersionService:
         Returns all active key versions for the organization with the provided OIN.
         """
         at = at or datetime.now(timezone.utc)
-        with self.__db.get_db_session() as session:
+        with self.__db.get_read_session() as session:
             repo = session.get_repository(HsmKeyVersionRepository)
             versions = repo.get_active_versions_by_organization_oin(
                 at, organization_oin=oin
@@ -126,16 +188,49 @@ class HsmKeyVersionService:
                 )
                 raise
 
-    def get_expired_versions(self, at: datetime | None = None) -> List[HsmKeyVersion]:
+    def iter_expired_versions(
+        self,
+        at: datetime | None = None,
+        batch_size: int = 500,
+    ) -> Iterator[List[ExpiredHsmKeyVersion]]:
         """
-        Returns all key versions that have expired (until_dt in the past) but are
-        not yet removed, at the given moment (defaults to the current date/time).
+        Yields the key versions that have expired at the given moment (defaults
+        to the current date/time) in batches. Every batch is read in its own
+        session, so neither memory use nor a transaction grows with the number
+        of expired versions.
         """
         at = at or datetime.now(timezone.utc)
-        with self.__db.get_db_session() as session:
-            repo = session.get_repository(HsmKeyVersionRepository)
-            versions = repo.get_expired_versions(at)
-            return versions
+        after: ExpiredHsmKeyVersion | None = None
+        while True:
+            with self.__db.get_db_session() as session:
+                repo = session.get_repository(HsmKeyVersionRepository)
+                batch = repo.get_expired_versions_page(at, after, batch_size)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]
+
+    def iter_upcoming_versions(
+        self,
+        at: datetime | None = None,
+        batch_size: int = 500,
+    ) -> Iterator[List[RotatedHsmKeyVersion]]:
+        """
+        Yields the key versions that start after the given moment (defaults to
+        the current date/time) in batches, each read in its own session.
+        """
+        at = at or datetime.now(timezone.utc)
+        after: RotatedHsmKeyVersion | None = None
+        while True:
+            with self.__db.get_db_session() as session:
+                repo = session.get_repository(HsmKeyVersionRepository)
+                batch = repo.get_upcoming_versions_page(at, after, batch_size)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]
 
     def create_version(
         self,
@@ -263,3 +358,60 @@ class HsmKeyVersionService:
                     "failed to mark hsm key version %s as removed", version_id
                 )
                 raise
+
+    def mark_removed_many(self, version_ids: Sequence[uuid.UUID]) -> int:
+        """
+        Flags the given key versions as removed in one transaction. Returns the
+        number of versions that were not removed yet.
+        """
+        if not version_ids:
+            return 0
+        with self.__db.get_db_session() as session:
+            repo = session.get_repository(HsmKeyVersionRepository)
+            try:
+                updated = repo.mark_removed_many(version_ids)
+                session.commit()
+                return updated
+            except Exception:
+                session.rollback()
+                logger.exception(
+                    "failed to mark %d hsm key version(s) as removed", len(version_ids)
+                )
+                raise
+
+    def rotate_versions(
+        self,
+        oins: Sequence[Oin] | None = None,
+        from_dt: datetime | None = None,
+        previous_until_dt: datetime | None = None,
+    ) -> HsmKeyRotation:
+        """
+        Creates a new key version, starting at from_dt (defaults to now), for
+        the organizations with the given OINs, or for all organizations when
+        oins is None. The versions they have are ended at previous_until_dt,
+        which defaults to from_dt. Everything is done in one transaction, with
+        one statement for each step regardless of the number of organizations.
+
+        Raises HsmKeyRotationOrganizationsNotFoundError, without rotating
+        anything, when an OIN has no organization.
+        """
+        from_dt = from_dt or datetime.now(timezone.utc)
+        previous_until_dt = previous_until_dt or from_dt
+        with self.__db.get_db_session() as session:
+            repo = session.get_repository(HsmKeyVersionRepository)
+            try:
+                if oins is not None:
+                    missing = repo.get_missing_oins(oins)
+                    if missing:
+                        raise HsmKeyRotationOrganizationsNotFoundError(missing)
+                ended = repo.end_versions(previous_until_dt, oins)
+                created = repo.create_next_versions(from_dt, oins)
+                session.commit()
+                return HsmKeyRotation(created, ended)
+            except HsmKeyRotationOrganizationsNotFoundError:
+                session.rollback()
+                raise
+            except Exception:
+                session.rollback()
+                logger.exception("failed to rotate hsm key versions")
+                raise
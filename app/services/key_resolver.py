@@ -1,6 +1,8 @@
 import logging
 import uuid
-from typing import List, Optional
+from collections.abc import Iterator
+from functools import lru_cache
+from typing import Any, List, Optional
 
 from jwcrypto import jwk
 from pydantic import BaseModel, ConfigDict, Field, field_validator
@@ -12,6 +14,14 @@ from app.db.repositories.org_key_repository import (
 )
 from app.db.repositories.org_repository import OrgRepository
 from app.models.oin import Oin
+from app.pagination import (
+    DEFAULT_LIMIT,
+    EXPORT_BATCH,
+    InvalidCursorError,
+    Page,
+    decode_cursor,
+    encode_cursor,
+)
 from app.rid import RidUsage
 
 logger = logging.getLogger(__name__)
@@ -66,12 +76,18 @@ class KeyRequest(BaseModel):
         return v
 
 
+@lru_cache(maxsize=1024)
+def _parse_pem(key_data: str) -> jwk.JWK:
+    # Keyed on the PEM itself, so an updated key is parsed again
+    return jwk.JWK.from_pem(key_data.encode("ascii"))
+
+
 class KeyResolver:
     def __init__(self, db: Database):
         self.db = db
 
     def max_rid_usage(self, oin: Oin) -> RidUsage | None:
-        with self.db.get_db_session() as session:
+        with self.db.get_read_session() as session:
             org = session.get_repository(OrgRepository).get_by_oin(oin)
             if org is None:
                 return None
@@ -88,7 +104,7 @@ class KeyResolver:
         return None
 
     def resolve_entry(self, org_id: uuid.UUID, scope: str) -> OrganizationKey | None:
-        with self.db.get_db_session() as session:
+        with self.db.get_read_session() as session:
             return session.get_repository(OrganizationKeyRepository).get(org_id, scope)
 
     def resolve(
@@ -99,7 +115,18 @@ class KeyResolver:
         if entry is None:
             return None, None
 
-        return jwk.JWK.from_pem(entry.key_data.encode("ascii")), entry.key_id
+        return _parse_pem(entry.key_data), entry.key_id
+
+    def warm_up(self) -> int:
+        """
+        Parse all stored public keys ahead of the first requests for them.
+        Returns the number of keys.
+        """
+        with self.db.get_read_session() as session:
+            entries = session.get_repository(OrganizationKeyRepository).get_all()
+        for entry in entries:
+            _parse_pem(entry.key_data)
+        return len(entries)
 
     def create(
         self, org_id: uuid.UUID, scope: list[str], key_id: str | None, key_data: str
@@ -173,12 +200,50 @@ class KeyResolver:
             entry = session.get_repository(OrganizationKeyRepository).get_by_id(key_id)
         return entry
 
-    def get_by_org(self, org_id: uuid.UUID) -> List[OrganizationKey]:
+    def get_page_by_org(
+        self,
+        org_id: uuid.UUID,
+        cursor: str | None = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> Page:
+        """
+        Returns a page of up to limit key entries of the organization, starting
+        after the cursor of the previous page. Raises InvalidCursorError for a
+        cursor that was not returned by a previous page.
+        """
+        after = None
+        if cursor is not None:
+            try:
+                (key_id,) = decode_cursor(cursor)
+                after = uuid.UUID(key_id)
+            except (TypeError, ValueError) as e:
+                raise InvalidCursorError(f"invalid cursor {cursor!r}") from e
+        # On the primary, so an administrator sees the changes just made
         with self.db.get_db_session() as session:
-            entries = session.get_repository(OrganizationKeyRepository).get_by_org(
-                org_id
-            )
-            return entries
+            repository = session.get_repository(OrganizationKeyRepository)
+            # One more than the limit, to know whether there is a next page
+            items = repository.get_page_by_org(org_id, after, limit + 1)
+        if len(items) <= limit:
+            return Page(items, None)
+        items = items[:limit]
+        return Page(items, encode_cursor(items[-1]["id"]))
+
+    def iter_by_org(
+        self,
+        org_id: uuid.UUID,
+        cursor: str | None = None,
+        batch_size: int = EXPORT_BATCH,
+    ) -> Iterator[List[dict[str, Any]]]:
+        """
+        Yields the key entries of the organization a page at a time, each read
+        in its own session.
+        """
+        while True:
+            page = self.get_page_by_org(org_id, cursor, batch_size)
+            yield page.items
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
 
     def delete(self, key_id: uuid.UUID, organization_id: uuid.UUID) -> bool:
         with self.db.get_db_session() as session:
@@ -1,5 +1,10 @@
+import hashlib
 import logging
 import textwrap
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization
@@ -7,6 +12,7 @@ from fastapi import HTTPException
 from starlette.requests import Request
 
 from app.db.entities.organization import Organization
+from app.metrics import CACHE_REQUESTS
 from app.models.oin import Oin
 from app.services.org_service import OrgService
 
@@ -18,6 +24,16 @@ class InvalidOinCertificate(HTTPException):
         super().__init__(status_code=400, detail=msg)
 
 
+@dataclass(frozen=True)
+class ClientCertificate:
+    cert: x509.Certificate
+    # None when the subject serial number is not a valid OIN
+    oin: Oin | None
+    public_key_pem: str
+    # time.time() at which the certificate expires
+    not_valid_after: float
+
+
 class MtlsService:
     _CERT_START = "-----BEGIN CERTIFICATE-----"
     _CERT_END = "-----END CERTIFICATE-----"
@@ -27,9 +43,15 @@ class MtlsService:
         self,
         override_cert: str | None,
         org_service: OrgService,
+        cache_size: int = 1024,
     ) -> None:
         self.__cert: bytes | None = None
         self.org_service = org_service
+        # Parsed certificates by the SHA-256 of the header value. Callers present
+        # the same few certificates over and over.
+        self._cache: OrderedDict[bytes, ClientCertificate] = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
 
         if override_cert is not None and override_cert != "":
             with open(override_cert, "r") as f:
@@ -72,26 +94,62 @@ class MtlsService:
             .encode("ascii")
         )
 
-    def get_mtls_pub_key(self, request: Request) -> str:
+    def get_client_certificate(self, request: Request) -> ClientCertificate:
         """
-        Extract the public key from the client certificate
+        Returns the parsed client certificate of the request. Parsed certificates
+        are cached until they expire. Raises ValueError when the certificate
+        can't be parsed.
         """
         cert_bytes = self.get_mtls_cert(request)
+        key = hashlib.sha256(cert_bytes).digest()
+        now = time.time()
+
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if now < entry.not_valid_after:
+                    self._cache.move_to_end(key)
+                    CACHE_REQUESTS.inc(cache="mtls_certificates", result="hit")
+                    return entry
+                del self._cache[key]
+
+        CACHE_REQUESTS.inc(cache="mtls_certificates", result="miss")
+        entry = self._parse(cert_bytes)
+        if now < entry.not_valid_after:
+            with self._cache_lock:
+                self._cache[key] = entry
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return entry
+
+    def _parse(self, cert_bytes: bytes) -> ClientCertificate:
         formatted_cert = self._enforce_cert_newlines(cert_bytes)
         cert = x509.load_pem_x509_certificate(formatted_cert.encode("ascii"))
-        public_key = cert.public_key()
-        public_pem = public_key.public_bytes(
+        public_pem = cert.public_key().public_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo,
         )
+        try:
+            oin: Oin | None = self.get_oin_from_cert(cert)
+        except (InvalidOinCertificate, IndexError):
+            oin = None
+
+        return ClientCertificate(
+            cert=cert,
+            oin=oin,
+            public_key_pem=public_pem.decode("ascii"),
+            not_valid_after=cert.not_valid_after_utc.timestamp(),
+        )
 
-        return public_pem.decode("ascii")
+    def get_mtls_pub_key(self, request: Request) -> str:
+        """
+        Extract the public key from the client certificate
+        """
+        return self.get_client_certificate(request).public_key_pem
 
     def get_oin_cert(self, request: Request) -> x509.Certificate:
         try:
-            cert_bytes = self.get_mtls_cert(request)
-            cert_pem = self._enforce_cert_newlines(cert_bytes)
-            return x509.load_pem_x509_certificate(cert_pem.encode())
+            return self.get_client_certificate(request).cert
         except ValueError as e:
             logger.warning(f"Unable to read certificate from header {e}")
             raise InvalidOinCertificate()
@@ -107,8 +165,14 @@ class MtlsService:
             raise InvalidOinCertificate()
 
     def get_org_from_request(self, request: Request) -> Organization:
-        oin_cert = self.get_oin_cert(request)
-        oin = self.get_oin_from_cert(oin_cert)
+        try:
+            oin = self.get_client_certificate(request).oin
+        except ValueError as e:
+            logger.warning(f"Unable to read certificate from header {e}")
+            raise InvalidOinCertificate()
+        if oin is None:
+            raise InvalidOinCertificate()
+
         org = self.org_service.get_by_oin(oin)
         if org is None:
             raise HTTPException(
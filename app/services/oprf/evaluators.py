@@ -1,26 +1,46 @@
 import base64
 import logging
+import time
 from dataclasses import dataclass
 from typing import Any, Protocol
 
 import pyoprf
 import requests
 
+from app import timing, tracing
 from app.config import ConfigOprf
 from app.logging.context import correlation_headers
 from app.logging.events import SYS_HSM_UNREACHABLE, log_event
+from app.metrics import Histogram
 from app.models.oin import Oin
 from app.services.hsm_key_version_service import HsmKeyVersionService
 from app.services.org_service import OrgService
 
 logger = logging.getLogger(__name__)
 
+HSM_REQUEST_DURATION = Histogram(
+    "prs_hsm_request_duration_seconds",
+    "HSM API call latency by operation and outcome (ok or error)",
+    ("operation", "outcome"),
+)
+
+
+# Connections kept open to the HSM API; at least the number of threads that
+# can call it concurrently (the default anyio worker thread limit is 40)
+_HSM_MAX_CONNECTIONS = 40
+# Seconds a health check waits for the HSM API
+_HSM_HEALTH_TIMEOUT = 2
+
 
 class OprfEvaluator(Protocol):
     def evaluate(
         self, recipient_org_oin: Oin, blinded_bytes: bytes
     ) -> dict[int, bytes]: ...
 
+    def warm_up(self) -> None: ...
+
+    def health_error(self) -> str | None: ...
+
 
 @dataclass(frozen=True)
 class HsmKeyLabel:
@@ -38,7 +58,15 @@ class LocalOprfEvaluator:
     def evaluate(
         self, recipient_org_oin: Oin, blinded_bytes: bytes
     ) -> dict[int, bytes]:
-        return {1: pyoprf.evaluate(self._server_key, blinded_bytes)}
+        with timing.phase(timing.CRYPTO), tracing.span("crypto.oprf_evaluate"):
+            return {1: pyoprf.evaluate(self._server_key, blinded_bytes)}
+
+    def warm_up(self) -> None:
+        # The key is parsed when the evaluator is created
+        pass
+
+    def health_error(self) -> str | None:
+        return None
 
 
 class HsmOprfEvaluator:
@@ -51,6 +79,11 @@ class HsmOprfEvaluator:
         self._hsm_config = hsm_config
         self._hsm_key_version_service = hsm_key_version_service
         self._org_service = org_service
+        # Keeps the TLS connections to the HSM API open between requests
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=_HSM_MAX_CONNECTIONS)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def evaluate(
         self,
@@ -68,29 +101,72 @@ class HsmOprfEvaluator:
         ret: dict[int, bytes] = {}
         for version in active_versions:
             label = HsmKeyLabel(recipient_org_oin, version)
-            if not self._label_exists(label):
-                self._generate_key(label)
+            self.provision_key(label)
 
             ret[version] = self._evaluate_label(label, blinded_bytes)
 
         return ret
 
-    def _hsm_post(self, path: str, payload: dict[str, str]) -> Any:
-        cfg = self._hsm_config
-        url = f"{cfg.hsm_url}/hsm/{cfg.hsm_module}/{cfg.hsm_slot}{path}"
+    def provision_key(self, label: HsmKeyLabel) -> None:
+        """Generate the OPRF secret of label in the HSM, unless it exists."""
+        if not self._label_exists(label):
+            self._generate_key(label)
+
+    def warm_up(self) -> None:
+        """Open a connection to the HSM API (TLS handshake included)."""
+        self._hsm_post("", {"label": "warmup", "objtype": "SECRET_KEY"}, "warmup")
+
+    def health_error(self) -> str | None:
+        """
+        None when the HSM API answers, the error otherwise. Unlike the other
+        calls this does not log PRS-SYS-006, so a health probe repeating every
+        few seconds doesn't flood the logs while the HSM is down.
+        """
         try:
-            response = requests.post(
-                url,
-                json=payload,
-                headers=correlation_headers(),
-                timeout=10,
-                verify=cfg.hsm_ca_cert_file or True,
-                cert=(
-                    (cfg.hsm_cert_file, cfg.hsm_key_file)
-                    if (cfg.hsm_cert_file and cfg.hsm_key_file)
-                    else None
-                ),
+            response = self._session.post(
+                self._url(""),
+                json={"label": "healthcheck", "objtype": "SECRET_KEY"},
+                timeout=_HSM_HEALTH_TIMEOUT,
+                **self._tls_options(),
             )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            return str(e)
+        return None
+
+    def _url(self, path: str) -> str:
+        cfg = self._hsm_config
+        return f"{cfg.hsm_url}/hsm/{cfg.hsm_module}/{cfg.hsm_slot}{path}"
+
+    def _tls_options(self) -> dict[str, Any]:
+        cfg = self._hsm_config
+        return {
+            "verify": cfg.hsm_ca_cert_file or True,
+            "cert": (
+                (cfg.hsm_cert_file, cfg.hsm_key_file)
+                if (cfg.hsm_cert_file and cfg.hsm_key_file)
+                else None
+            ),
+        }
+
+    def _hsm_post(self, path: str, payload: dict[str, str], operation: str) -> Any:
+        url = self._url(path)
+        headers = correlation_headers()
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"hsm.{operation}"):
+                tracing.inject_headers(headers)
+                response = self._session.post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=10,
+                    **self._tls_options(),
+                )
+                response.raise_for_status()
+                data = response.json()
+            outcome = "ok"
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
             log_event(
                 logger,
@@ -99,16 +175,21 @@ class HsmOprfEvaluator:
                 error_reason=str(e),
             )
             raise
-        response.raise_for_status()
-        return response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            HSM_REQUEST_DURATION.observe(elapsed, operation=operation, outcome=outcome)
+            timing.record(timing.HSM, elapsed)
+        return data
 
     def _generate_key(self, label: HsmKeyLabel) -> None:
-        data = self._hsm_post("/generate/oprf", {"label": str(label)})
+        data = self._hsm_post("/generate/oprf", {"label": str(label)}, "generate")
         if "result" not in data:
             raise ValueError("could not generate the OPRF secret in HSM")
 
     def _label_exists(self, label: HsmKeyLabel) -> bool:
-        data = self._hsm_post("", {"label": str(label), "objtype": "SECRET_KEY"})
+        data = self._hsm_post(
+            "", {"label": str(label), "objtype": "SECRET_KEY"}, "label_exists"
+        )
         result = data["objects"] or []
         return len(result) > 0
 
@@ -119,5 +200,6 @@ class HsmOprfEvaluator:
                 "label": str(label),
                 "blinded_point": base64.b64encode(blinded_bytes).decode(),
             },
+            "evaluate",
         )
         return base64.b64decode(data["result"])
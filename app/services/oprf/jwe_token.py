@@ -4,9 +4,19 @@ from typing import Any
 
 from jwcrypto import jwe, jwk
 
+from app import timing, tracing
+from app.metrics import Histogram
+
+JWE_BUILD_DURATION = Histogram(
+    "prs_jwe_build_duration_seconds",
+    "Time spent building and encrypting a JWE",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
 
 class BlindJwe:
     @staticmethod
+    @tracing.span("jwe.build")
     def build(
         audience: str,
         scope: str,
@@ -18,6 +28,7 @@ class BlindJwe:
         """
         Build a JWT token
         """
+        start = time.perf_counter()
         now = int(time.time())
         claims = {
             "subject": subject,
@@ -41,4 +52,8 @@ class BlindJwe:
             protected=json.dumps(protected_headers),
         )
         jwe_token.add_recipient(pub_key)
-        return str(jwe_token.serialize(compact=True))
+        token = str(jwe_token.serialize(compact=True))
+        elapsed = time.perf_counter() - start
+        JWE_BUILD_DURATION.observe(elapsed)
+        timing.record(timing.JWE, elapsed)
+        return token
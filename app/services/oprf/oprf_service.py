@@ -37,6 +37,12 @@ class OprfService:
     def __init__(self, evaluator: OprfEvaluator):
         self.__evaluator = evaluator
 
+    def warm_up(self) -> None:
+        self.__evaluator.warm_up()
+
+    def health_error(self) -> str | None:
+        return self.__evaluator.health_error()
+
     @staticmethod
     def generate_server_key() -> str:
         """
@@ -14,7 +14,7 @@ class OrgService:
         self.__db = db
 
     def get_by_oin(self, oin: Oin) -> Organization | None:
-        with self.__db.get_db_session() as session:
+        with self.__db.get_read_session() as session:
             repo = session.get_repository(OrgRepository)
             return repo.get_by_oin(oin)
 
@@ -8,6 +8,7 @@ from Crypto.Cipher import AES
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
+from app import timing, tracing
 from app.personal_id import PersonalId
 
 logger = logging.getLogger(__name__)
@@ -47,9 +48,13 @@ class PseudonymService:
         subject = self._get_subject(
             personal_id, recipient_organization, recipient_scope
         )
-        digest = hmac.new(
-            self.__irp_hmac_key, subject.encode("utf-8"), hashlib.sha256
-        ).digest()
+        with (
+            timing.phase(timing.CRYPTO),
+            tracing.span("crypto.irreversible_pseudonym"),
+        ):
+            digest = hmac.new(
+                self.__irp_hmac_key, subject.encode("utf-8"), hashlib.sha256
+            ).digest()
         return base64.urlsafe_b64encode(digest).decode("utf-8")
 
     def generate_reversible_pseudonym(
@@ -64,7 +69,8 @@ class PseudonymService:
         subject = self._get_subject(
             personal_id, recipient_organization, recipient_scope
         )
-        return self._encrypt_data(subject, recipient_organization)
+        with timing.phase(timing.CRYPTO), tracing.span("crypto.reversible_pseudonym"):
+            return self._encrypt_data(subject, recipient_organization)
 
     def decrypt_reversible_pseudonym(
         self, reversible_pseudonym: str, recipient_organization: str
@@ -73,7 +79,13 @@ class PseudonymService:
         Decode a reversible pseudonym to retrieve the original personal ID and associated info.
         """
         try:
-            subject = self._decrypt_data(reversible_pseudonym, recipient_organization)
+            with (
+                timing.phase(timing.CRYPTO),
+                tracing.span("crypto.decrypt_reversible_pseudonym"),
+            ):
+                subject = self._decrypt_data(
+                    reversible_pseudonym, recipient_organization
+                )
             parts = subject.split("|")
             if len(parts) != 3:
                 logger.error(
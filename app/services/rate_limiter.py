@@ -0,0 +1,276 @@
+"""
+Token-bucket rate limiting per calling organization and target OIN.
+
+The buckets use the generic cell rate algorithm: instead of a token count, a
+bucket only stores the theoretical arrival time (TAT) of the next request, so a
+bucket is a single number and an expired one is the same as a missing one.
+
+Buckets live in memory, per worker, unless a shared backend speaking the Redis
+protocol (RESP) is configured. Then limits hold across workers and nodes, and the
+in-memory buckets are only used while that backend can't be reached. After a
+failed call the backend is left alone for backend_retry_interval seconds, so an
+outage doesn't cost every request a connection attempt.
+"""
+
+import logging
+import math
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Protocol
+from urllib.parse import urlparse
+
+from app.config import ConfigRateLimit
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = Counter(
+    "prs_rate_limited_total",
+    "Requests rejected because the caller exceeded its rate limit",
+)
+RATE_LIMIT_BACKEND_ERRORS = Counter(
+    "prs_rate_limit_backend_errors_total",
+    "Failed calls to the shared rate limit backend",
+)
+
+# Buckets are pruned once there are more than this many in memory
+_MAX_MEMORY_BUCKETS = 100_000
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    # Sustained requests per second
+    rate: float
+    # Requests that may be made at once after being idle
+    burst: int
+
+    @property
+    def emission_interval(self) -> float:
+        return 1.0 / self.rate
+
+
+class TokenBuckets(Protocol):
+    def take(self, key: str, limit: RateLimit) -> float:
+        """
+        Take a token from the bucket of key. Returns 0 when one was available,
+        otherwise the seconds until one will be.
+        """
+        ...
+
+
+class MemoryTokenBuckets:
+    def __init__(self, max_buckets: int = _MAX_MEMORY_BUCKETS) -> None:
+        self._tats: dict[str, float] = {}
+        self._max_buckets = max_buckets
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        interval = limit.emission_interval
+        with self._lock:
+            tat = max(self._tats.get(key, now), now) + interval
+            allowed_at = tat - limit.burst * interval
+            if now < allowed_at:
+                return allowed_at - now
+            if key not in self._tats and len(self._tats) >= self._max_buckets:
+                self._prune(now)
+            self._tats[key] = tat
+            return 0.0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def _prune(self, now: float) -> None:
+        # Buckets that have filled up again are the same as missing ones
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+
+# Same algorithm as MemoryTokenBuckets, on the clock of the server so the
+# clocks of the nodes don't matter. Returns a string as Redis truncates numbers
+# returned by scripts to integers.
+_TAKE_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now) + interval
+local allowed_at = tat - burst * interval
+if now < allowed_at then
+  return tostring(allowed_at - now)
+end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return '0'
+"""
+
+
+class RespError(Exception):
+    pass
+
+
+class RespConnection:
+    """A minimal client for the Redis serialization protocol (RESP2)."""
+
+    def __init__(
+        self, host: str, port: int, timeout: float, password: str | None, db: int
+    ) -> None:
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rb")
+        if password is not None:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", str(db))
+
+    def command(self, *args: str) -> object:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read()
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def _read(self) -> object:
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by the rate limit backend")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RespError(f"unexpected reply {line!r}")
+
+
+class RespTokenBuckets:
+    """
+    Buckets in a server speaking the Redis protocol (Redis, Valkey, KeyDB), at
+    a redis://[:password@]host[:port][/db] URL. Every thread keeps its own
+    connection.
+    """
+
+    def __init__(self, url: str, timeout: float, key_prefix: str) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"unsupported rate limit backend url {url}")
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or 6379
+        self._password = parsed.password
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._timeout = timeout
+        self._key_prefix = key_prefix
+        self._local = threading.local()
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        connection = self._connection()
+        try:
+            reply = connection.command(
+                "EVAL",
+                _TAKE_SCRIPT,
+                "1",
+                self._key_prefix + key,
+                repr(limit.emission_interval),
+                str(limit.burst),
+            )
+        except (OSError, RespError):
+            # Reconnect on the next call
+            connection.close()
+            self._local.connection = None
+            raise
+        return float(str(reply))
+
+    def _connection(self) -> RespConnection:
+        connection: RespConnection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = RespConnection(
+                self._host, self._port, self._timeout, self._password, self._db
+            )
+            self._local.connection = connection
+        return connection
+
+
+class RateLimiter:
+    """
+    Limits the requests of a calling organization (x-gf-act-sub) per target
+    OIN, with per-organization overrides of the default limit.
+    """
+
+    def __init__(
+        self, config: ConfigRateLimit, backend: TokenBuckets | None = None
+    ) -> None:
+        self.enabled = config.enabled
+        self.default = RateLimit(config.rate, config.burst)
+        self.overrides = {
+            oin: RateLimit(rate, burst)
+            for oin, (rate, burst) in config.overrides.items()
+        }
+        self._memory = MemoryTokenBuckets()
+        if backend is None and config.backend_url:
+            backend = RespTokenBuckets(
+                config.backend_url, config.backend_timeout, config.key_prefix
+            )
+        self._backend = backend
+        self._backend_down = False
+        self._backend_retry_interval = config.backend_retry_interval
+        # Monotonic time before which the backend is not called
+        self._backend_retry_at = 0.0
+
+    def limit_for(self, client_oin: str) -> RateLimit:
+        return self.overrides.get(client_oin, self.default)
+
+    def check(self, client_oin: str, target_oin: str) -> float:
+        """
+        Count a request of client_oin for target_oin. Returns 0 when it is
+        allowed, otherwise the seconds until the client may try again.
+        """
+        if not self.enabled:
+            return 0.0
+
+        key = f"{client_oin}:{target_oin}"
+        limit = self.limit_for(client_oin)
+        wait = self._take(key, limit)
+        if wait > 0:
+            RATE_LIMITED.inc()
+        return wait
+
+    @staticmethod
+    def retry_after(wait: float) -> str:
+        return str(max(1, math.ceil(wait)))
+
+    def _take(self, key: str, limit: RateLimit) -> float:
+        if self._backend is None or time.monotonic() < self._backend_retry_at:
+            return self._memory.take(key, limit)
+
+        try:
+            wait = self._backend.take(key, limit)
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            self._backend_retry_at = time.monotonic() + self._backend_retry_interval
+            if not self._backend_down:
+                self._backend_down = True
+                logger.warning(
+                    "rate limit backend unavailable, limiting per worker: %s", e
+                )
+            return self._memory.take(key, limit)
+
+        if self._backend_down:
+            self._backend_down = False
+            logger.info("rate limit backend available again")
+        return wait
@@ -3,6 +3,7 @@ import base64
 from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
 
+from app import timing, tracing
 from app.services.pseudonym_service import hkdf_derive
 
 
@@ -15,11 +16,12 @@ class RidService:
     def encrypt_rid(self, rid: str) -> str:
         message = rid.encode("utf-8")
 
-        nonce = get_random_bytes(12)
-        cipher = AES.new(self.__rid_aes_key, AES.MODE_GCM, nonce=nonce)
-        cipher.update(self.__aad)
+        with timing.phase(timing.CRYPTO), tracing.span("crypto.encrypt_rid"):
+            nonce = get_random_bytes(12)
+            cipher = AES.new(self.__rid_aes_key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(self.__aad)
 
-        ciphertext, tag = cipher.encrypt_and_digest(message)
+            ciphertext, tag = cipher.encrypt_and_digest(message)
 
         token = nonce + tag + ciphertext
 
@@ -32,8 +34,9 @@ class RidService:
         tag = data[12:28]
         ciphertext = data[28:]
 
-        cipher = AES.new(self.__rid_aes_key, AES.MODE_GCM, nonce=nonce)
-        cipher.update(self.__aad)
+        with timing.phase(timing.CRYPTO), tracing.span("crypto.decrypt_rid"):
+            cipher = AES.new(self.__rid_aes_key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(self.__aad)
 
-        message = cipher.decrypt_and_verify(ciphertext, tag)
+            message = cipher.decrypt_and_verify(ciphertext, tag)
         return message.decode("utf-8")
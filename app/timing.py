@@ -0,0 +1,96 @@
+"""
+Per-request phase timings.
+
+RequestContextMiddleware binds a RequestTimings for every request. Code that
+talks to the database, the HSM or does crypto wraps that work in phase(), so the
+time spent per phase can be reported on the access log entry and in the
+Server-Timing response header.
+"""
+
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DB = "db"
+HSM = "hsm"
+CRYPTO = "crypto"
+JWE = "jwe"
+
+
+class RequestTimings:
+    """
+    Total seconds spent per phase. Sync endpoints run in a worker thread, so a
+    request can record phases from more than one thread.
+    """
+
+    def __init__(self) -> None:
+        self._totals: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0.0) + seconds
+
+    def totals(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+    def log_fields(self) -> dict[str, float]:
+        """The totals as <phase>_ms fields for the access log entry."""
+        return {
+            f"{name}_ms": round(seconds * 1000, 1)
+            for name, seconds in self.totals().items()
+        }
+
+    def server_timing(self, total: float | None = None) -> str:
+        """
+        The totals as a Server-Timing header value (durations in milliseconds),
+        e.g. ``db;dur=3.2, hsm;dur=12.0, total;dur=17.9``.
+        """
+        entries = [
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.totals().items()
+        ]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+timings_var: ContextVar[RequestTimings | None] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def bind_timings() -> Generator[RequestTimings]:
+    timings = RequestTimings()
+    token = timings_var.set(timings)
+    try:
+        yield timings
+    finally:
+        timings_var.reset(token)
+
+
+def record(name: str, seconds: float) -> None:
+    """Add seconds to phase name of the current request, if any."""
+    timings = timings_var.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str) -> Generator[None]:
+    """
+    Add the time spent in the block to phase name of the current request. Does
+    nothing outside a request.
+    """
+    timings = timings_var.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
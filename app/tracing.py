@@ -0,0 +1,141 @@
+"""
+Optional OpenTelemetry tracing.
+
+Tracing is off unless setup_tracing() is called, and then needs the
+opentelemetry-sdk package (and opentelemetry-exporter-otlp-proto-http to export
+over OTLP), which are only installed with the tracing extra:
+
+    poetry install --extras tracing
+
+While tracing is off, span() and inject_headers() only check a module global,
+so instrumented code costs next to nothing.
+"""
+
+import logging
+from collections.abc import Generator, MutableMapping
+from contextlib import contextmanager
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import ConfigTracing
+
+logger = logging.getLogger(__name__)
+
+_tracer: Any = None
+_provider: Any = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def setup_tracing(config: ConfigTracing, exporter: Any = None) -> None:
+    """
+    Start tracing. Spans go to exporter when given (e.g. an InMemorySpanExporter
+    in tests), otherwise to the OTLP endpoint from the config.
+    """
+    global _tracer, _provider
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": config.service_name}),
+        sampler=ParentBased(TraceIdRatioBased(config.sample_ratio)),
+    )
+    if exporter is not None:
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        provider.add_span_processor(
+            BatchSpanProcessor(OTLPSpanExporter(endpoint=config.otlp_endpoint))
+        )
+
+    _provider = provider
+    _tracer = provider.get_tracer("app")
+    logger.info("tracing enabled for service %s", config.service_name)
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans and stop tracing."""
+    global _tracer, _provider
+
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+@contextmanager
+def span(name: str, **attributes: str | int | float | bool) -> Generator[None]:
+    """Trace the block as a child span of the current span."""
+    if _tracer is None:
+        yield
+        return
+
+    with _tracer.start_as_current_span(name, attributes=attributes):
+        yield
+
+
+def inject_headers(headers: MutableMapping[str, str]) -> None:
+    """Add the trace context (traceparent) of the current span to headers."""
+    if _tracer is None:
+        return
+
+    from opentelemetry.propagate import inject
+
+    inject(headers)
+
+
+class TracingMiddleware:
+    """
+    Traces every HTTP request as a server span, continuing the trace of the
+    caller when the request carries a traceparent header. The span is named
+    after the template of the matched route (e.g. GET /rid/{rid}).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if _tracer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        from opentelemetry.propagate import extract
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        method = scope["method"]
+
+        with _tracer.start_as_current_span(
+            method,
+            context=extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as server_span:
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    server_span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    server_span.update_name(f"{method} {route}")
+                    server_span.set_attribute("http.route", route)
@@ -0,0 +1,49 @@
+"""
+Worker warm-up.
+
+Runs in every worker process before it accepts requests, so the first requests
+to reach a fresh worker don't pay for opening database and HSM connections or
+parsing the stored public keys. A step that fails is logged and skipped: the
+worker still starts, and the connection is opened by the first request instead.
+"""
+
+import logging
+import time
+from collections.abc import Callable
+
+from app.container import get_database, get_key_resolver, get_oprf_service
+from app.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DURATION = Gauge(
+    "prs_warmup_duration_seconds",
+    "Time the worker spent warming up, per step",
+    ("step",),
+)
+
+
+def _step(name: str, f: Callable[[], object]) -> bool:
+    start = time.perf_counter()
+    try:
+        f()
+        return True
+    except Exception as e:
+        logger.warning("warm-up of %s failed: %s", name, e)
+        return False
+    finally:
+        WARMUP_DURATION.set(time.perf_counter() - start, step=name)
+
+
+def warm_up() -> float:
+    """Warm up the dependencies of this worker. Returns the seconds it took."""
+    start = time.perf_counter()
+    database_up = _step("database", get_database().warm_up)
+    _step("hsm", get_oprf_service().warm_up)
+    # Reading the keys would go through the database retries and hold up the
+    # start of the worker for as long as the database is down
+    if database_up:
+        _step("keys", get_key_resolver().warm_up)
+    elapsed = time.perf_counter() - start
+    logger.info("worker warmed up in %.0f ms", elapsed * 1000)
+    return elapsed
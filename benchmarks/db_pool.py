@@ -0,0 +1,204 @@
+"""
+Benchmark of the database connection pool settings.
+
+Runs the database part of an OPRF/exchange request (organization lookup and key
+resolution, with a pause in between that stands in for the HSM call) from a
+number of threads, once for every pool_size/max_overflow combination. Reports
+the throughput, request latencies, the time spent waiting for a connection and
+the pool size recommended by the pool advisor.
+
+A Postgres testcontainer is started unless --dsn is given:
+
+    python -m benchmarks.db_pool --threads 32 --pools 2:0,5:10,20:10
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from jwcrypto import jwk
+
+from app.db.db import Database
+from app.db.pool import POOL_CHECKOUT_TIMEOUTS, POOL_CHECKOUT_WAIT
+from app.metrics import REGISTRY
+from app.models.oin import Oin
+from app.rid import RidUsage
+from app.services.key_resolver import KeyResolver
+from app.services.org_service import OrgService
+
+ORGANIZATIONS = 50
+
+
+@dataclass
+class Result:
+    pool_size: int
+    max_overflow: int
+    requests: int
+    errors: int
+    elapsed: float
+    latencies: list[float]
+    checkout_wait: float
+    checkout_timeouts: int
+    recommendation: str
+
+
+@contextmanager
+def postgres_dsn(dsn: str | None) -> Iterator[str]:
+    if dsn is not None:
+        yield dsn
+        return
+
+    from testcontainers.community.postgres import PostgresContainer
+
+    with PostgresContainer("postgres:16-alpine", driver="psycopg") as container:
+        yield container.get_connection_url()
+
+
+def seed(dsn: str) -> list[Oin]:
+    db = Database(dsn, retry_backoff=[])
+    db.generate_tables()
+    db.truncate_tables()
+
+    org_service = OrgService(db)
+    key_resolver = KeyResolver(db)
+    pem = (
+        jwk.JWK.generate(kty="RSA", size=2048).export_to_pem(private_key=False).decode()
+    )
+
+    oins = []
+    for i in range(ORGANIZATIONS):
+        oin = Oin(f"000000990000{i:04d}0000")
+        org = org_service.create(oin, f"org {i}", RidUsage.ReversiblePseudonym)
+        key_resolver.create(org.id, ["nvi"], f"key-{i}", pem)
+        oins.append(oin)
+
+    db.engine.dispose()
+    return oins
+
+
+def run(
+    dsn: str,
+    oins: list[Oin],
+    pool_size: int,
+    max_overflow: int,
+    threads: int,
+    duration: float,
+    pause: float,
+) -> Result:
+    REGISTRY.clear()
+    db = Database(dsn, pool_size=pool_size, max_overflow=max_overflow, retry_backoff=[])
+    org_service = OrgService(db)
+    key_resolver = KeyResolver(db)
+
+    latencies: list[list[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+    stop = threading.Event()
+
+    def worker(index: int) -> None:
+        i = index
+        while not stop.is_set():
+            oin = oins[i % len(oins)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                org = org_service.get_by_oin(oin)
+                assert org is not None
+                time.sleep(pause)
+                key_resolver.resolve(org.id, "nvi")
+            except Exception:
+                errors[index] += 1
+                continue
+            latencies[index].append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    recommendation = db.telemetry.recommend()
+    db.engine.dispose()
+
+    all_latencies = sorted(latency for items in latencies for latency in items)
+    wait_sum, wait_count = POOL_CHECKOUT_WAIT.snapshot(pool="primary")
+    return Result(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        requests=len(all_latencies),
+        errors=sum(errors),
+        elapsed=elapsed,
+        latencies=all_latencies,
+        checkout_wait=wait_sum / wait_count if wait_count else 0.0,
+        checkout_timeouts=int(POOL_CHECKOUT_TIMEOUTS.value(pool="primary")),
+        recommendation=(
+            f"{recommendation.pool_size}:{recommendation.max_overflow}"
+            if recommendation
+            else "-"
+        ),
+    )
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(results: list[Result]) -> None:
+    print(
+        f"{'pool':>8} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'wait ms':>8} {'timeouts':>9} {'advice':>8}"
+    )
+    for result in results:
+        print(
+            f"{result.pool_size:>4}:{result.max_overflow:<3} "
+            f"{result.requests / result.elapsed:>9.1f} "
+            f"{result.errors:>7} "
+            f"{statistics.median(result.latencies or [0.0]) * 1000:>8.2f} "
+            f"{_percentile(result.latencies, 0.99) * 1000:>8.2f} "
+            f"{result.checkout_wait * 1000:>8.3f} "
+            f"{result.checkout_timeouts:>9} "
+            f"{result.recommendation:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the database pool settings")
+    parser.add_argument("--dsn", help="use this database instead of a container")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "--pause", type=float, default=0.005, help="seconds between the queries"
+    )
+    parser.add_argument(
+        "--pools",
+        default="2:0,5:10,10:10,20:20",
+        help="comma separated pool_size:max_overflow combinations",
+    )
+    args = parser.parse_args()
+
+    pools = [
+        (int(size), int(overflow))
+        for size, overflow in (pool.split(":") for pool in args.pools.split(","))
+    ]
+
+    with postgres_dsn(args.dsn) as dsn:
+        oins = seed(dsn)
+        results = [
+            run(dsn, oins, size, overflow, args.threads, args.duration, args.pause)
+            for size, overflow in pools
+        ]
+
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Throughput benchmark of the JSON log formatter.
+
+Formats an OPRF audit event the way the syslog handlers do: once for the app
+stream, once for the SIEM stream and once for the debug stream. Compares the
+formatter as it was before the per-record caching (every formatter gathering
+the context and extra fields and building the allowed field sets itself) with
+the current one, with the standard json encoder and with orjson.
+
+    python -m benchmarks.log_formatter --records 50000
+"""
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from app.config import JsonEncoder
+from app.logging.context import request_id_var
+from app.logging.events import OPRF_EVAL_OK
+from app.logging.filters import LoggingStreams
+from app.logging.formatter import (
+    ALWAYS_KEEP_FIELDS,
+    JsonFormatter,
+    _collect_context,
+    _collect_extras,
+    _sanitize_message,
+)
+
+STREAMS: tuple[tuple[LoggingStreams | None, str], ...] = (
+    (LoggingStreams.APP, "app"),
+    (LoggingStreams.SIEM, "siem"),
+    (None, "debug"),
+)
+
+
+class LegacyJsonFormatter(logging.Formatter):
+    """JsonFormatter before the per-record caching and precomputed routing."""
+
+    def __init__(self, stream: LoggingStreams | None, stream_id: str) -> None:
+        super().__init__()
+        self.stream = stream
+        self.stream_id = stream_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {**_collect_context(), **_collect_extras(record)}
+        field_streams = OPRF_EVAL_OK.fields
+        if self.stream is not None:
+            allowed = set(field_streams.get(self.stream, ())) | ALWAYS_KEEP_FIELDS
+            data = {key: value for key, value in data.items() if key in allowed}
+        log_record: dict[str, Any] = {
+            "event_id": getattr(record, "event_id", None),
+            "timestamp": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "event_description": _sanitize_message(record.getMessage()),
+            "source": f"{record.module}:{record.lineno}",
+            "stream_id": self.stream_id,
+            "message": data,
+        }
+        return json.dumps(log_record, default=str)
+
+
+def build_record() -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="app.routers.oprf",
+        level=logging.INFO,
+        pathname="app/routers/oprf.py",
+        lineno=90,
+        msg="OPRF evaluation succeeded",
+        args=(),
+        exc_info=None,
+    )
+    record.__dict__.update(
+        event_id=OPRF_EVAL_OK.event_id,
+        stream=OPRF_EVAL_OK.streams,
+        field_streams=OPRF_EVAL_OK.allowed_fields,
+        handelende_oin="00000099000000001000",
+        namens_oin="00000099000000001000",
+        doel_oin="00000099000000002000",
+        oprf_secret_versie=3,
+        ontvanger_pubkey_id="key-1",
+    )
+    return record
+
+
+def run(formatters: list[logging.Formatter], records: int) -> float:
+    """Records per second, each formatted by all formatters."""
+    start = time.perf_counter()
+    for _ in range(records):
+        record = build_record()
+        for formatter in formatters:
+            formatter.format(record)
+    return records / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON log formatter")
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    setups: list[tuple[str, list[logging.Formatter]]] = [
+        (
+            "before",
+            [LegacyJsonFormatter(stream, stream_id) for stream, stream_id in STREAMS],
+        ),
+        (
+            "json",
+            [
+                JsonFormatter(include_traces=False, stream=stream, stream_id=stream_id)
+                for stream, stream_id in STREAMS
+            ],
+        ),
+    ]
+    try:
+        import orjson  # noqa: F401
+
+        setups.append(
+            (
+                "orjson",
+                [
+                    JsonFormatter(
+                        include_traces=False,
+                        stream=stream,
+                        stream_id=stream_id,
+                        json_encoder=JsonEncoder.orjson,
+                    )
+                    for stream, stream_id in STREAMS
+                ],
+            )
+        )
+    except ImportError:
+        print("orjson is not installed, skipping")
+
+    token = request_id_var.set("benchmark-request-id")
+    try:
+        for name, formatters in setups:
+            rate = run(formatters, args.records)
+            print(f"{name:<10} {rate:>10.0f} records/s")
+    finally:
+        request_id_var.reset(token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Request latency benchmark of log shipping with a slow log collector.
+
+Every simulated request logs what a request to /oprf/eval logs: an OPRF audit
+event and the access log entry. The syslog handlers are replaced by handlers
+that take --delay milliseconds per record, as a slow or congested collector
+would. Compares shipping on the request thread with the queue of
+app.logging.queueing.
+
+    python -m benchmarks.log_queue --requests 2000 --delay 2
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from app.logging import queueing
+from app.logging.events import ACCESS_REQUEST, OPRF_EVAL_OK, log_event
+from app.logging.filters import AppFilter, LoggingStreams, SiemFilter
+from app.logging.formatter import JsonFormatter
+
+_LOGGER = "app.benchmark"
+
+
+class SlowHandler(logging.Handler):
+    """Formats the record and takes delay seconds to ship it."""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.format(record)
+        time.sleep(self.delay)
+
+
+def build_logger(delay: float) -> logging.Logger:
+    logger = logging.getLogger(_LOGGER)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for stream, stream_filter in (
+        (LoggingStreams.APP, AppFilter()),
+        (LoggingStreams.SIEM, SiemFilter()),
+    ):
+        handler = SlowHandler(delay)
+        handler.setFormatter(JsonFormatter(include_traces=False, stream=stream))
+        handler.addFilter(stream_filter)
+        logger.addHandler(handler)
+    return logger
+
+
+def request(logger: logging.Logger) -> None:
+    log_event(
+        logger,
+        OPRF_EVAL_OK,
+        "OPRF evaluation succeeded",
+        handelende_oin="00000099000000001000",
+        doel_oin="00000099000000002000",
+        oprf_secret_versie=1,
+        ontvanger_pubkey_id="key-1",
+    )
+    log_event(logger, ACCESS_REQUEST, "access", status_code=200, duration_ms=3)
+
+
+def run(logger: logging.Logger, requests: int) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request(logger)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    ms = sorted(latency * 1000 for latency in latencies)
+    p99 = ms[int(len(ms) * 0.99) - 1]
+    print(f"{name:<12} p50 {statistics.median(ms):>8.3f} ms   p99 {p99:>8.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark log shipping")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=2, help="ms per record")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    logger = build_logger(args.delay / 1000)
+    report("direct", run(logger, args.requests))
+
+    queueing.install(args.queue_size, [_LOGGER])
+    latencies = run(logger, args.requests)
+    start = time.perf_counter()
+    queueing.stop()
+    report("queued", latencies)
+    print(f"flushing the queue took {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
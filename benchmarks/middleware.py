@@ -0,0 +1,168 @@
+"""
+Requests-per-second benchmark of RequestContextMiddleware.
+
+Drives a FastAPI app with a trivial endpoint directly through ASGI (no network
+and no HTTP parsing, so the middleware overhead is not drowned out) with three
+setups: without middleware, with the BaseHTTPMiddleware implementation the
+service used before, and with the current pure ASGI RequestContextMiddleware.
+
+    python -m benchmarks.middleware --requests 20000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message
+
+from app.deadline import bind_deadline
+from app.logging.context import CLIENT_TRACE_ID_HEADER, CORRELATION_ID_HEADER, UNSET
+from app.logging.events import ACCESS_REQUEST, SYS_MISSING_CORRELATION_ID, log_event
+from app.logging.middleware import (
+    RequestContext,
+    RequestContextMiddleware,
+    _bind,
+    _sanitize,
+)
+
+_access_logger = logging.getLogger("app.access")
+_logger = logging.getLogger("app.logging.middleware")
+
+
+class BaseHTTPRequestContextMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation RequestContextMiddleware replaced."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        correlation_id_expected: bool = False,
+        request_deadline: float | None = None,
+    ) -> None:
+        super().__init__(app)
+        self.correlation_id_expected = correlation_id_expected
+        self.request_deadline = request_deadline or None
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        context = RequestContext(
+            request_id=str(uuid.uuid4()),
+            ip=request.client.host if request.client else UNSET,
+            client_trace_id=_sanitize(
+                request.headers.get(CLIENT_TRACE_ID_HEADER, UNSET)
+            ),
+            correlation_id=_sanitize(request.headers.get(CORRELATION_ID_HEADER, UNSET)),
+            endpoint=request.url.path,
+            method=request.method,
+        )
+
+        response: Response | None = None
+        start = time.perf_counter()
+        with _bind(context), bind_deadline(self.request_deadline):
+            if self.correlation_id_expected and context.correlation_id == UNSET:
+                log_event(
+                    _logger,
+                    SYS_MISSING_CORRELATION_ID,
+                    f"Request arrived without {CORRELATION_ID_HEADER}",
+                    endpoint=context.endpoint,
+                    method=context.method,
+                )
+            try:
+                response = await call_next(request)
+                context.apply_to(response.headers)
+                return response
+            finally:
+                log_event(
+                    _access_logger,
+                    ACCESS_REQUEST,
+                    "access",
+                    status_code=response.status_code if response is not None else None,
+                    duration_ms=round((time.perf_counter() - start) * 1000),
+                )
+
+
+Middleware = type[RequestContextMiddleware] | type[BaseHTTPRequestContextMiddleware]
+
+
+def build_app(middleware: Middleware | None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> dict[str, str]:
+        return {"status": "ok"}
+
+    if middleware is not None:
+        app.add_middleware(middleware, request_deadline=10.0)
+    return app
+
+
+async def _request(app: FastAPI) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"localhost"),
+            (CORRELATION_ID_HEADER.lower().encode(), b"benchmark-correlation-id"),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    per_worker = requests // concurrency
+
+    async def worker() -> None:
+        for _ in range(per_worker):
+            await _request(app)
+
+    # Warm up routing and the logging machinery
+    await asyncio.gather(*(_request(app) for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark RequestContextMiddleware")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Only measure the middleware, not the log handlers
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    setups: list[tuple[str, Middleware | None]] = [
+        ("no middleware", None),
+        ("BaseHTTPMiddleware", BaseHTTPRequestContextMiddleware),
+        ("pure ASGI", RequestContextMiddleware),
+    ]
+    for name, middleware in setups:
+        rps = asyncio.run(run(build_app(middleware), args.requests, args.concurrency))
+        print(f"{name:<20} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup-time benchmark of a worker.
+
+Builds the container and the FastAPI app the way a uvicorn worker does, and
+measures how long that takes, how long the warm-up takes and how long the first
+requests take afterwards, once without and once with the warm-up. The first
+requests are a health check (a database connection) and a key resolution (a
+database query and parsing the public key).
+
+Uses the configuration in FASTAPI_CONFIG_PATH (app.conf by default), with the
+database replaced by a seeded Postgres testcontainer unless --dsn is given:
+
+    python -m benchmarks.startup --rounds 5
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+import inject
+from fastapi.testclient import TestClient
+
+from app.application import create_fastapi_app
+from app.config import get_config, set_config
+from app.container import container_config, get_database, get_key_resolver
+from app.db.repositories.org_repository import OrgRepository
+from app.models.oin import Oin
+from app.services import key_resolver
+from app.warmup import warm_up
+from benchmarks.db_pool import postgres_dsn, seed
+
+STEPS = ("container", "app", "warm-up", "first /health", "first key")
+
+
+def _timed(f: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def start_worker(oin: Oin, warm: bool) -> dict[str, float]:
+    # Start from a cold process as far as possible
+    key_resolver._parse_pem.cache_clear()
+    inject.clear()
+
+    timings = {
+        "container": _timed(lambda: inject.configure(container_config)),
+    }
+    start = time.perf_counter()
+    app = create_fastapi_app()
+    timings["app"] = time.perf_counter() - start
+    timings["warm-up"] = warm_up() if warm else 0.0
+
+    client = TestClient(app)
+    timings["first /health"] = _timed(lambda: client.get("/health"))
+
+    db = get_database()
+    with db.get_read_session() as session:
+        org = session.get_repository(OrgRepository).get_by_oin(oin)
+    assert org is not None
+    resolver = get_key_resolver()
+    timings["first key"] = _timed(lambda: resolver.resolve(org.id, "nvi"))
+
+    db.engine.dispose()
+    return timings
+
+
+def report(name: str, rounds: list[dict[str, float]]) -> None:
+    print(name)
+    for step in STEPS:
+        ms = statistics.median(r[step] for r in rounds) * 1000
+        print(f"  {step:<15} {ms:>8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark worker startup")
+    parser.add_argument("--dsn", help="database to use instead of a testcontainer")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with postgres_dsn(args.dsn) as dsn:
+        oins = seed(dsn)
+
+        config = get_config()
+        config.database.dsn = dsn
+        # Warmed up explicitly below
+        config.uvicorn.warmup = False
+        set_config(config)
+
+        for name, warm in (("without warm-up", False), ("with warm-up", True)):
+            rounds = [start_worker(oins[0], warm) for _ in range(args.rounds)]
+            report(name, rounds)
+
+
+if __name__ == "__main__":
+    main()
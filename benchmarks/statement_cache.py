@@ -0,0 +1,241 @@
+"""
+Benchmark of the Python overhead of the hot-path repository queries.
+
+Every query is executed in two forms: built on every call, as the repositories
+did before, and the prebuilt statement with bound parameters the repositories
+use now. Each run is profiled with cProfile. The report shows the wall time per
+query, the time spent inside SQLAlchemy itself (its own Python code, without
+the database driver and the network) and the number of SQL compilations.
+
+A Postgres testcontainer is started unless --dsn is given:
+
+    python -m benchmarks.statement_cache --iterations 2000
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+import sqlalchemy
+from sqlalchemy import and_, func, insert, literal, or_, select
+from sqlalchemy.dialects.postgresql.json import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.db.db import Database
+from app.db.entities.hsm_key_versions import HsmKeyVersion
+from app.db.entities.organization import Organization
+from app.db.entities.organization_key import OrganizationKey
+from app.db.repositories.hsm_key_version_repository import HsmKeyVersionRepository
+from app.db.repositories.org_key_repository import OrganizationKeyRepository
+from app.db.repositories.org_repository import OrgRepository
+from app.db.session import DbSession
+from app.models.oin import Oin
+from app.rid import RidUsage
+from benchmarks.db_pool import postgres_dsn
+
+_SQLALCHEMY_DIR = os.path.dirname(sqlalchemy.__file__)
+
+TEST_OIN = Oin("00000099000000001000")
+
+Query = Callable[[DbSession], Any]
+
+
+def _active_filter(at: datetime) -> ColumnElement[bool]:
+    return and_(
+        HsmKeyVersion.removed.is_(False),
+        HsmKeyVersion.from_dt <= at,
+        or_(HsmKeyVersion.until_dt.is_(None), HsmKeyVersion.until_dt > at),
+    )
+
+
+def built_get_by_oin(session: DbSession, oin: Oin) -> Any:
+    query = select(Organization).where(Organization.oin == oin)
+    return session.execute(query).scalars().first()
+
+
+def built_get_key(session: DbSession, org_id: uuid.UUID, scope: str) -> Any:
+    query = (
+        select(OrganizationKey)
+        .where(OrganizationKey.organization_id == org_id)
+        .where(
+            or_(
+                OrganizationKey.scope.contains(literal([scope], JSONB)),
+                OrganizationKey.scope.contains(literal(["*"], JSONB)),
+            )
+        )
+    )
+    return session.execute(query).scalars().first()
+
+
+def built_get_active_versions(
+    session: DbSession, at: datetime, organization_id: uuid.UUID
+) -> Any:
+    query = (
+        select(HsmKeyVersion)
+        .where(HsmKeyVersion.organization_id == organization_id, _active_filter(at))
+        .order_by(HsmKeyVersion.version)
+    )
+    return list(session.execute(query).scalars().all())
+
+
+def built_active_or_create(
+    session: DbSession, organization_id: uuid.UUID, at: datetime
+) -> Any:
+    active_versions = (
+        select(HsmKeyVersion.version)
+        .where(HsmKeyVersion.organization_id == organization_id, _active_filter(at))
+        .order_by(HsmKeyVersion.version)
+        .cte("active_versions")
+    )
+    next_version = (
+        select(func.max(HsmKeyVersion.version) + 1)
+        .where(HsmKeyVersion.organization_id == organization_id)
+        .scalar_subquery()
+    )
+    created_versions = (
+        insert(HsmKeyVersion)
+        .from_select(
+            [
+                HsmKeyVersion.id,
+                HsmKeyVersion.organization_id,
+                HsmKeyVersion.version,
+                HsmKeyVersion.from_dt,
+                HsmKeyVersion.until_dt,
+                HsmKeyVersion.removed,
+            ],
+            select(
+                literal(uuid.uuid4()),
+                literal(organization_id),
+                func.coalesce(next_version, 1),
+                literal(at),
+                literal(None),
+                literal(False),
+            ).where(~select(active_versions.c.version).limit(1).exists()),
+        )
+        .returning(HsmKeyVersion.version)
+        .cte("created_version")
+    )
+    rows = (
+        select(active_versions.c.version)
+        .union_all(select(created_versions.c.version))
+        .order_by(active_versions.c.version)
+    )
+    return list(
+        session.execute(select(HsmKeyVersion.version).from_statement(rows))
+        .scalars()
+        .all()
+    )
+
+
+def seed(db: Database) -> uuid.UUID:
+    db.generate_tables()
+    db.truncate_tables()
+    with db.get_db_session() as session:
+        org = session.get_repository(OrgRepository).create(
+            TEST_OIN, "benchmark", RidUsage.ReversiblePseudonym
+        )
+        session.get_repository(OrganizationKeyRepository).create(
+            org.id, ["nvi"], "-----BEGIN PUBLIC KEY-----", None
+        )
+        session.get_repository(HsmKeyVersionRepository).create(
+            org.id, datetime.now(timezone.utc)
+        )
+        session.commit()
+        return org.id
+
+
+def queries(org_id: uuid.UUID) -> dict[str, tuple[Query, Query]]:
+    at = datetime.now(timezone.utc)
+
+    def repo(session: DbSession, cls: type[Any]) -> Any:
+        return session.get_repository(cls)
+
+    return {
+        "get_by_oin": (
+            lambda s: built_get_by_oin(s, TEST_OIN),
+            lambda s: repo(s, OrgRepository).get_by_oin(TEST_OIN),
+        ),
+        "get_key": (
+            lambda s: built_get_key(s, org_id, "nvi"),
+            lambda s: repo(s, OrganizationKeyRepository).get(org_id, "nvi"),
+        ),
+        "get_active_versions": (
+            lambda s: built_get_active_versions(s, at, org_id),
+            lambda s: repo(s, HsmKeyVersionRepository).get_active_versions(at, org_id),
+        ),
+        "active_or_create": (
+            lambda s: built_active_or_create(s, org_id, at),
+            lambda s: repo(
+                s, HsmKeyVersionRepository
+            ).get_active_or_create_version_numbers_by_organization_id(org_id, at),
+        ),
+    }
+
+
+def profile(db: Database, query: Query, iterations: int) -> tuple[float, float, int]:
+    """
+    Returns the wall time and SQLAlchemy self time per query in microseconds,
+    and the number of SQL compilations.
+    """
+    with db.get_db_session() as session:
+        # Warm up the statement cache, as a running service would have
+        query(session)
+        session.rollback()
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        for _ in range(iterations):
+            query(session)
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        session.rollback()
+
+    stats = pstats.Stats(profiler).stats  # type: ignore[attr-defined]
+    sqlalchemy_time = 0.0
+    compilations = 0
+    for (filename, _, function), (_, calls, tottime, _, _) in stats.items():
+        if filename.startswith(_SQLALCHEMY_DIR):
+            sqlalchemy_time += tottime
+            if function == "_compiler":
+                compilations += calls
+
+    per_query = 1_000_000 / iterations
+    return elapsed * per_query, sqlalchemy_time * per_query, compilations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hot-path query overhead")
+    parser.add_argument("--dsn", help="use this database instead of a container")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with postgres_dsn(args.dsn) as dsn:
+        db = Database(dsn, retry_backoff=[])
+        org_id = seed(db)
+
+        print(
+            f"{'query':<22} {'variant':<9} {'wall us':>9} {'sqla us':>9} "
+            f"{'compiles':>9}"
+        )
+        for name, variants in queries(org_id).items():
+            for variant, query in zip(("built", "prebuilt"), variants):
+                wall, sqlalchemy_time, compilations = profile(
+                    db, query, args.iterations
+                )
+                print(
+                    f"{name:<22} {variant:<9} {wall:>9.1f} {sqlalchemy_time:>9.1f} "
+                    f"{compilations:>9}"
+                )
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+-- Serves the keyset-paginated scan of expired key versions by the HSM key
+-- cleanup: removed = FALSE AND until_dt IS NOT NULL AND until_dt <= :at,
+-- ordered by (until_dt, id).
+CREATE INDEX hsm_key_version_expired_idx
+    ON hsm_key_version (until_dt, id)
+    WHERE removed = FALSE AND until_dt IS NOT NULL;
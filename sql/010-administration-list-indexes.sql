@@ -0,0 +1,13 @@
+-- Serve the keyset-paginated administration listings with index range scans:
+-- the keys of an organization ordered by id, and its key versions ordered by
+-- (version, id).
+CREATE INDEX organization_key_organization_id_id_idx
+    ON organization_key (organization_id, id);
+
+CREATE INDEX hsm_key_version_organization_id_version_id_idx
+    ON hsm_key_version (organization_id, version, id);
+
+-- The (organization_id, version, id) index replaces the (organization_id,
+-- version) index of 008-hsm-key-version-indexes.sql: it also serves the lookups
+-- of the highest version, so keeping both only slows down writes.
+DROP INDEX IF EXISTS hsm_key_version_organization_id_version_idx;
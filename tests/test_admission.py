@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from collections.abc import Generator
+from typing import Callable, List
+
+import httpx
+import pytest
+from starlette.types import Receive, Scope, Send
+
+from app.admission import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_SHED,
+    EXCHANGE,
+    HEALTH,
+    OPRF,
+    SHED_DEADLINE,
+    SHED_QUEUE_FULL,
+    AdmissionLimiter,
+    AdmissionMiddleware,
+    Shed,
+    endpoint_class,
+)
+from app.config import ConfigAdmission
+from app.deadline import bind_deadline
+from app.logging.events import SYS_LOAD_SHED
+from app.metrics import REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def test_endpoint_classes() -> None:
+    assert endpoint_class("/oprf/eval") == OPRF
+    assert endpoint_class("/exchange/pseudonym") == EXCHANGE
+    assert endpoint_class("/receive") == EXCHANGE
+    assert endpoint_class("/administration/keys") == "admin"
+    assert endpoint_class("/health") == HEALTH
+    assert endpoint_class("/livez") is None
+    assert endpoint_class("/readyz") is None
+    assert endpoint_class("/version.json") is None
+    assert endpoint_class("/test/oprf/client") is None
+
+
+def test_limiter_queues_and_hands_over_slots() -> None:
+    async def run() -> list[str]:
+        limiter = AdmissionLimiter(OPRF, concurrency=1, queue_size=2)
+        order: list[str] = []
+
+        async def request(name: str) -> None:
+            await limiter.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release(0.01)
+
+        await asyncio.gather(request("a"), request("b"), request("c"))
+        assert limiter.active == 0
+        assert limiter.queued == 0
+        return order
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert ADMISSION_IN_FLIGHT.value(endpoint_class=OPRF) == 0
+
+
+def test_limiter_sheds_when_queue_is_full(
+    record_logs: Callable[[str], List[logging.LogRecord]],
+) -> None:
+    records = record_logs("app.admission")
+
+    async def run() -> Shed:
+        limiter = AdmissionLimiter(OPRF, concurrency=1, queue_size=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Shed) as shed:
+            await limiter.acquire()
+        with pytest.raises(Shed):
+            await limiter.acquire()
+        limiter.release(0.01)
+        await waiting
+        limiter.release(0.01)
+        return shed.value
+
+    shed = asyncio.run(run())
+
+    assert shed.reason == SHED_QUEUE_FULL
+    assert shed.retry_after >= 1
+    assert ADMISSION_SHED.value(endpoint_class=OPRF, reason=SHED_QUEUE_FULL) == 2
+    # One audit event per episode, not per rejected request
+    events = [r for r in records if getattr(r, "event_id", None) == "270408"]
+    assert len(events) == 1
+    assert events[0].event_id == SYS_LOAD_SHED.event_id  # type: ignore[attr-defined]
+    assert events[0].endpoint_class == OPRF  # type: ignore[attr-defined]
+
+
+def test_limiter_sheds_when_expected_wait_exceeds_deadline() -> None:
+    async def run() -> Shed:
+        limiter = AdmissionLimiter(OPRF, concurrency=1, queue_size=10)
+        limiter.service_time = 2.0
+        await limiter.acquire()
+        with bind_deadline(1.0):
+            with pytest.raises(Shed) as shed:
+                await limiter.acquire()
+        limiter.release(2.0)
+        return shed.value
+
+    shed = asyncio.run(run())
+
+    assert shed.reason == SHED_DEADLINE
+    assert shed.retry_after == 2
+
+
+def test_limiter_never_waits_beyond_deadline() -> None:
+    async def run() -> AdmissionLimiter:
+        limiter = AdmissionLimiter(OPRF, concurrency=1, queue_size=10)
+        await limiter.acquire()
+        with bind_deadline(0.05):
+            with pytest.raises(Shed) as shed:
+                await limiter.acquire()
+        assert shed.value.reason == SHED_DEADLINE
+        limiter.release(0.01)
+        return limiter
+
+    limiter = asyncio.run(run())
+
+    assert limiter.active == 0
+    assert limiter.queued == 0
+
+
+def test_middleware_rejects_with_retry_after() -> None:
+    release = asyncio.Event()
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["path"] == "/oprf/eval":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    config = ConfigAdmission(oprf_concurrency=1, oprf_queue=0)
+    middleware = AdmissionMiddleware(app, config)
+
+    async def run() -> tuple[httpx.Response, httpx.Response, httpx.Response]:
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            first = asyncio.create_task(c.post("/oprf/eval"))
+            while middleware.limiters[OPRF].active == 0:
+                await asyncio.sleep(0)
+            rejected = await c.post("/oprf/eval")
+            # Other classes are not affected
+            health = await c.get("/health")
+            release.set()
+            await first
+            return rejected, health, await c.post("/oprf/eval")
+
+    rejected, health, after = asyncio.run(run())
+
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "1"
+    assert health.status_code == 200
+    assert after.status_code == 200
@@ -0,0 +1,91 @@
+from typing import Dict
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.auth import get_auth_ctx
+from app.models.auth.headers import header_oin
+from app.models.oin import Oin
+from app.services.auth.header import AuthHeaderService
+
+
+def _request(headers: Dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def service() -> AuthHeaderService:
+    return AuthHeaderService(expected_audiences=["prs.service"])
+
+
+def test_auth_ctx_from_headers(
+    service: AuthHeaderService,
+    valid_headers: Dict[str, str],
+    valid_organization_id: Oin,
+    valid_client_organization_id: Oin,
+    valid_client_common_name: str,
+) -> None:
+    request = _request(valid_headers)
+
+    ctx = get_auth_ctx(request, None, service)
+
+    assert ctx.claims.organization_id == valid_organization_id
+    assert ctx.claims.client_organization_id == valid_client_organization_id
+    assert ctx.claims.client_common_name == valid_client_common_name
+    assert ctx.audience == "prs.service"
+    assert request.state.auth is ctx
+
+
+def test_validated_oins_are_reused(
+    service: AuthHeaderService, valid_headers: Dict[str, str]
+) -> None:
+    first = get_auth_ctx(_request(valid_headers), None, service)
+    second = get_auth_ctx(_request(valid_headers), None, service)
+
+    assert second.claims.organization_id is first.claims.organization_id
+
+
+def test_invalid_oin_is_not_cached() -> None:
+    header_oin.cache_clear()
+
+    with pytest.raises(ValueError):
+        header_oin("not-an-oin")
+
+    assert header_oin.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize(
+    "header, value",
+    [
+        ("x-gf-sub", "not-an-oin"),
+        ("x-gf-act-sub", None),
+        ("x-gf-act-cn", None),
+        ("x-gf-audience", None),
+        ("x-gf-audience", "other.service"),
+    ],
+)
+def test_invalid_headers_are_rejected(
+    service: AuthHeaderService,
+    valid_headers: Dict[str, str],
+    header: str,
+    value: str | None,
+) -> None:
+    headers = dict(valid_headers)
+    if value is None:
+        del headers[header]
+    else:
+        headers[header] = value
+
+    with pytest.raises(HTTPException) as exc:
+        get_auth_ctx(_request(headers), None, service)
+
+    assert exc.value.status_code == 403
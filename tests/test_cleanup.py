@@ -23,3 +23,34 @@ def test_main_returns_one_on_failure() -> None:
         "app.cleanup.container.get_hsm_key_cleanup_service", return_value=service
     ):
         assert cleanup.main() == 1
+
+
+def test_daemon_requires_direct_lock_dsn_behind_pooler() -> None:
+    config = MagicMock()
+    config.database.external_pooler = True
+    config.maintenance.lock_dsn = None
+
+    with patch("app.cleanup.get_config", return_value=config):
+        assert cleanup.main(daemon=True) == 1
+
+
+def test_daemon_schedules_provisioning_when_configured() -> None:
+    config = MagicMock()
+    config.database.external_pooler = False
+    config.maintenance.provision_interval = 600.0
+    config.maintenance.port = None
+
+    with (
+        patch("app.cleanup.get_config", return_value=config),
+        patch("app.cleanup.AdvisoryLock"),
+        patch("app.cleanup.application.application_init"),
+        patch("app.cleanup.MaintenanceDaemon") as daemon,
+        patch("app.cleanup.signal.signal"),
+    ):
+        assert cleanup.main(daemon=True) == 0
+
+    jobs = daemon.call_args.args[0]
+    assert [(job.name, job.interval) for job in jobs] == [
+        ("hsm_key_cleanup", config.maintenance.cleanup_interval),
+        ("hsm_key_provisioning", 600.0),
+    ]
@@ -0,0 +1,196 @@
+import gc
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, literal, select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db.db import Database
+from app.db.pool import (
+    POOL_CHECKED_OUT,
+    POOL_CHECKOUT_TIMEOUTS,
+    POOL_CHECKOUT_WAIT,
+    POOL_CONNECTION_AGE,
+    POOL_CONNECTIONS_OPENED,
+    POOL_SIZE,
+    InstrumentedQueuePool,
+    PoolTelemetry,
+)
+from app.db.pool_advisor import PoolSizeRecommendation, recommend_pool_size
+from app.metrics import CACHE_REQUESTS, REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> None:
+    REGISTRY.clear()
+
+
+def _engine(
+    tmp_path: Path, pool_size: int = 2, max_overflow: int = 1, name: str = "test"
+) -> PoolTelemetry:
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=0.01,
+    )
+    return PoolTelemetry(engine, name)
+
+
+def test_telemetry_tracks_checked_out_and_overflow(tmp_path: Path) -> None:
+    telemetry = _engine(tmp_path)
+
+    connections = [telemetry.engine.connect() for _ in range(3)]
+    assert telemetry.checked_out() == 3
+    assert telemetry.overflow() == 1
+    assert telemetry.size() == 2
+
+    for connection in connections:
+        connection.close()
+    assert telemetry.checked_out() == 0
+    # The overflow connection is closed when it is returned
+    assert telemetry.overflow() == 0
+
+    assert POOL_CONNECTIONS_OPENED.value(pool="test") == 3
+    _, waits = POOL_CHECKOUT_WAIT.snapshot(pool="test")
+    assert waits == 3
+    _, ages = POOL_CONNECTION_AGE.snapshot(pool="test")
+    assert ages == 3
+
+
+def test_engines_with_the_same_pool_name_are_added_up(tmp_path: Path) -> None:
+    first = _engine(tmp_path, name="shared")
+    second = _engine(tmp_path, name="shared")
+
+    with first.engine.connect(), second.engine.connect():
+        with second.engine.connect():
+            assert POOL_CHECKED_OUT.value(pool="shared") == 3
+            assert POOL_SIZE.value(pool="shared") == 4
+
+    del second
+    gc.collect()
+    with first.engine.connect():
+        assert POOL_CHECKED_OUT.value(pool="shared") == 1
+        assert POOL_SIZE.value(pool="shared") == 2
+
+
+def test_telemetry_counts_checkout_timeouts(tmp_path: Path) -> None:
+    telemetry = _engine(tmp_path, pool_size=1, max_overflow=0)
+
+    with telemetry.engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            telemetry.engine.connect()
+
+    assert POOL_CHECKOUT_TIMEOUTS.value(pool="test") == 1
+    _, waits = POOL_CHECKOUT_WAIT.snapshot(pool="test")
+    assert waits == 2
+
+
+def test_telemetry_survives_dispose(tmp_path: Path) -> None:
+    telemetry = _engine(tmp_path)
+    telemetry.engine.dispose()
+
+    with telemetry.engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert telemetry.checked_out() == 1
+
+    _, waits = POOL_CHECKOUT_WAIT.snapshot(pool="test")
+    assert waits == 1
+
+
+def test_telemetry_recommendation_follows_concurrency(tmp_path: Path) -> None:
+    telemetry = _engine(tmp_path, pool_size=4, max_overflow=0)
+    assert telemetry.recommend() is None
+
+    connections = [telemetry.engine.connect() for _ in range(4)]
+    for connection in connections:
+        connection.close()
+
+    recommendation = telemetry.recommend()
+    assert recommendation is not None
+    assert recommendation.observed_peak == 4
+    assert recommendation.samples == 4
+
+
+def test_telemetry_counts_statement_cache_hits(tmp_path: Path) -> None:
+    telemetry = _engine(tmp_path)
+
+    with telemetry.engine.connect() as connection:
+        for _ in range(3):
+            connection.execute(select(literal(1)))
+
+    assert CACHE_REQUESTS.value(cache="sqlalchemy_statements", result="miss") == 1
+    assert CACHE_REQUESTS.value(cache="sqlalchemy_statements", result="hit") == 2
+
+
+def test_database_warm_up_opens_pool_connections(tmp_path: Path) -> None:
+    db = Database("sqlite://", retry_backoff=[])
+    db.telemetry = _engine(tmp_path, pool_size=3)
+
+    db.warm_up()
+
+    assert POOL_CONNECTIONS_OPENED.value(pool="test") == 3
+    assert db.telemetry.checked_out() == 0
+    assert db.telemetry.overflow() == 0
+
+
+def test_database_exposes_pool_telemetry() -> None:
+    db = Database(
+        "sqlite:///:memory:",
+        replica_dsns=["sqlite:///:memory:"],
+        retry_backoff=[],
+    )
+
+    telemetry = db.pool_telemetry()
+    assert [t.name for t in telemetry] == ["primary", "replica-0"]
+
+    with db.get_db_session() as session:
+        session.execute(text("SELECT 1"))
+        assert telemetry[0].checked_out() == 1
+    assert telemetry[0].checked_out() == 0
+
+    rendered = "\n".join(family.name for family in REGISTRY.collect() if family.samples)
+    assert "prs_db_pool_checked_out" in rendered
+    assert "prs_db_pool_connection_age_seconds" in rendered
+
+
+@pytest.mark.parametrize(
+    "samples, expected",
+    [
+        pytest.param([], None, id="no_samples"),
+        pytest.param(
+            [1] * 95 + [8] * 5,
+            PoolSizeRecommendation(
+                pool_size=2,
+                max_overflow=8,
+                observed_p95=1,
+                observed_peak=8,
+                samples=100,
+            ),
+            id="rare_bursts_go_to_overflow",
+        ),
+        pytest.param(
+            [4] * 100,
+            PoolSizeRecommendation(
+                pool_size=5,
+                max_overflow=0,
+                observed_p95=4,
+                observed_peak=4,
+                samples=100,
+            ),
+            id="steady_load",
+        ),
+        pytest.param(
+            [0, 0],
+            PoolSizeRecommendation(
+                pool_size=1, max_overflow=0, observed_p95=0, observed_peak=0, samples=2
+            ),
+            id="minimum_pool_size",
+        ),
+    ],
+)
+def test_recommend_pool_size(
+    samples: list[int], expected: PoolSizeRecommendation | None
+) -> None:
+    assert recommend_pool_size(samples) == expected
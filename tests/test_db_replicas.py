@@ -0,0 +1,139 @@
+import threading
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import ConfigDatabase, ReplicaRouting
+from app.db.db import Database, _Replica
+
+PRIMARY_DSN = "sqlite://"
+REPLICA_DSNS = ["sqlite://", "sqlite://"]
+
+
+def _lag(values: dict[int, float | None]) -> Any:
+    def measure(self: _Replica) -> float | None:
+        return values[id(self)]
+
+    return measure
+
+
+def test_read_session_uses_primary_without_replicas() -> None:
+    db = Database(dsn=PRIMARY_DSN)
+
+    with db.get_read_session() as session:
+        assert session._engine is db.engine
+
+
+def test_read_sessions_are_spread_round_robin() -> None:
+    db = Database(dsn=PRIMARY_DSN, replica_dsns=REPLICA_DSNS)
+    db.check_replica_lag()
+    replicas = [replica.engine for replica in db._replicas]
+
+    engines = [db.get_read_session()._engine for _ in range(4)]
+
+    assert engines == [replicas[0], replicas[1], replicas[0], replicas[1]]
+
+
+def test_lagging_replica_is_skipped(monkeypatch: pytest.MonkeyPatch) -> None:
+    db = Database(dsn=PRIMARY_DSN, replica_dsns=REPLICA_DSNS, replica_max_lag=5.0)
+    fresh, lagging = db._replicas
+    monkeypatch.setattr(
+        _Replica, "_measure_lag", _lag({id(fresh): 0.5, id(lagging): 30.0})
+    )
+    db.check_replica_lag()
+
+    engines = {db.get_read_session()._engine for _ in range(4)}
+
+    assert engines == {fresh.engine}
+
+
+@pytest.mark.parametrize("lag", [None, 30.0])
+def test_falls_back_to_primary_when_no_replica_is_usable(
+    monkeypatch: pytest.MonkeyPatch, lag: float | None
+) -> None:
+    db = Database(dsn=PRIMARY_DSN, replica_dsns=REPLICA_DSNS)
+    monkeypatch.setattr(_Replica, "_measure_lag", lambda self: lag)
+    db.check_replica_lag()
+
+    assert db.get_read_session()._engine is db.engine
+
+
+def test_replicas_are_not_used_before_their_lag_is_measured() -> None:
+    db = Database(dsn=PRIMARY_DSN, replica_dsns=REPLICA_DSNS)
+
+    assert db.get_read_session()._engine is db.engine
+
+
+def test_lag_is_measured_in_the_background(monkeypatch: pytest.MonkeyPatch) -> None:
+    db = Database(
+        dsn=PRIMARY_DSN,
+        replica_dsns=REPLICA_DSNS[:1],
+        replica_lag_check_interval=0.01,
+    )
+    measured = threading.Event()
+    calls: list[str] = []
+
+    def measure(self: _Replica) -> float:
+        calls.append(threading.current_thread().name)
+        if len(calls) >= 3:
+            measured.set()
+        return 0.0
+
+    monkeypatch.setattr(_Replica, "_measure_lag", measure)
+
+    db.start_lag_checks()
+    try:
+        assert measured.wait(5)
+    finally:
+        db.stop_lag_checks()
+    count = len(calls)
+    for _ in range(3):
+        assert db.get_read_session()._engine is db._replicas[0].engine
+
+    # Read sessions only use the last measurement
+    assert len(calls) == count
+    assert set(calls) == {"replica-lag"}
+
+
+def test_lag_checks_run_for_the_lifespan_of_the_application(app: FastAPI) -> None:
+    with (
+        patch.object(Database, "start_lag_checks") as start,
+        patch.object(Database, "stop_lag_checks") as stop,
+    ):
+        with TestClient(app):
+            start.assert_called_once_with()
+            stop.assert_not_called()
+        stop.assert_called_once_with()
+
+
+def test_least_connections_picks_the_idlest_replica(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = Database(
+        dsn=PRIMARY_DSN,
+        replica_dsns=REPLICA_DSNS,
+        replica_routing=ReplicaRouting.least_connections,
+    )
+    db.check_replica_lag()
+    busy, idle = db._replicas
+    checked_out = {id(busy): 4, id(idle): 1}
+    monkeypatch.setattr(_Replica, "checked_out", lambda self: checked_out[id(self)])
+
+    assert db.get_read_session()._engine is idle.engine
+
+
+def test_replica_dsns_are_parsed_from_a_comma_separated_string() -> None:
+    config = ConfigDatabase.model_validate(
+        {
+            "dsn": PRIMARY_DSN,
+            "replica_dsns": "postgresql://replica1/db, postgresql://replica2/db",
+        }
+    )
+
+    assert config.replica_dsns == [
+        "postgresql://replica1/db",
+        "postgresql://replica2/db",
+    ]
@@ -0,0 +1,104 @@
+import logging
+from typing import Callable, List
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import Integer, bindparam, create_engine, select
+from sqlalchemy.exc import DatabaseError, OperationalError
+
+from app.db.session import (
+    DB_RETRIES,
+    DB_RETRIES_EXHAUSTED,
+    DeadlineExceededError,
+    DbSession,
+)
+from app.deadline import bind_deadline
+from app.metrics import REGISTRY
+
+RecordLogs = Callable[[str], List[logging.LogRecord]]
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> None:
+    REGISTRY.clear()
+
+
+def _failing_operation() -> None:
+    raise OperationalError("stmt", {}, Exception("connection lost"))
+
+
+def _session(retry_backoff: list[float]) -> DbSession:
+    return DbSession(create_engine("sqlite://"), retry_backoff=retry_backoff)
+
+
+def test_retry_gives_up_when_the_deadline_would_be_exceeded() -> None:
+    with (
+        _session([5.0, 5.0]) as session,
+        bind_deadline(1.0),
+        patch("app.db.session.sleep") as sleep,
+        pytest.raises(DeadlineExceededError) as exc,
+    ):
+        session._retry(_failing_operation)
+
+    sleep.assert_not_called()
+    assert exc.value.attempts == 1
+    assert DB_RETRIES_EXHAUSTED.value(reason="deadline") == 1
+
+
+def test_retry_sleeps_while_the_deadline_allows_it() -> None:
+    with (
+        _session([0.0, 5.0]) as session,
+        bind_deadline(1.0),
+        patch("app.db.session.sleep") as sleep,
+        pytest.raises(DeadlineExceededError) as exc,
+    ):
+        session._retry(_failing_operation)
+
+    assert sleep.call_count == 1
+    assert exc.value.attempts == 2
+    assert DB_RETRIES.value(error_type="OperationalError") == 1
+
+
+def test_retry_without_deadline_walks_the_whole_backoff() -> None:
+    with (
+        _session([0.0, 0.0]) as session,
+        patch("app.db.session.sleep") as sleep,
+        pytest.raises(DatabaseError) as exc,
+    ):
+        session._retry(_failing_operation)
+
+    assert not isinstance(exc.value, DeadlineExceededError)
+    assert sleep.call_count == 2
+    assert DB_RETRIES.value(error_type="OperationalError") == 2
+    assert DB_RETRIES_EXHAUSTED.value(reason="attempts") == 1
+
+
+def test_deadline_exceeded_emits_connection_event(record_logs: RecordLogs) -> None:
+    records = record_logs("app.db.session")
+
+    with (
+        _session([5.0]) as session,
+        bind_deadline(0.5),
+        pytest.raises(DeadlineExceededError),
+    ):
+        session._retry(_failing_operation)
+
+    events = [r for r in records if getattr(r, "event_id", None) == "270403"]
+    assert len(events) == 1
+    assert events[0].retry_attempt == 1  # type: ignore[attr-defined]
+    assert events[0].error_type == "OperationalError"  # type: ignore[attr-defined]
+
+
+def test_successful_operation_is_not_retried() -> None:
+    with _session([0.0]) as session:
+        assert session._retry(lambda: 42) == 42
+
+    assert DB_RETRIES.value(error_type="OperationalError") == 0
+
+
+def test_execute_binds_parameters() -> None:
+    statement = select(bindparam("value", type_=Integer) + 1)
+
+    with _session([]) as session:
+        assert session.execute(statement, {"value": 41}).scalar_one() == 42
+        assert session.execute(statement, {"value": 1}).scalar_one() == 2
@@ -0,0 +1,26 @@
+from app.deadline import bind_deadline, deadline_var, remaining
+
+
+def test_no_deadline_outside_a_request() -> None:
+    assert remaining() is None
+
+
+def test_bound_deadline_counts_down() -> None:
+    with bind_deadline(5.0):
+        left = remaining()
+        assert left is not None
+        assert 4.0 < left <= 5.0
+
+    assert deadline_var.get() is None
+
+
+def test_nested_deadline_cannot_extend_the_outer_one() -> None:
+    with bind_deadline(1.0), bind_deadline(60.0):
+        left = remaining()
+        assert left is not None
+        assert left <= 1.0
+
+
+def test_none_timeout_binds_nothing() -> None:
+    with bind_deadline(None):
+        assert remaining() is None
@@ -0,0 +1,100 @@
+import logging
+import time
+from typing import Callable, List
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from app.config import ConfigOprf
+from app.services.health_prober import HEALTH_CHECK_UP, HealthProber
+from app.services.oprf.evaluators import HsmOprfEvaluator
+
+RecordLogs = Callable[[str], List[logging.LogRecord]]
+
+
+def test_ready_once_warmed_up_and_all_checks_pass() -> None:
+    prober = HealthProber({"database": lambda: None, "hsm": lambda: None})
+
+    assert not prober.readiness().ready
+    prober.probe()
+    assert not prober.readiness().ready
+    prober.mark_warmed_up()
+
+    readiness = prober.readiness()
+    assert readiness.ready
+    assert readiness.warmed_up
+    assert all(result and result.healthy for result in readiness.results.values())
+    assert HEALTH_CHECK_UP.value(component="hsm") == 1
+
+
+def test_failing_or_raising_check_makes_it_not_ready() -> None:
+    def raising() -> str | None:
+        raise ConnectionError("hsm down")
+
+    prober = HealthProber({"database": lambda: None, "hsm": raising})
+    prober.mark_warmed_up()
+    prober.probe()
+
+    readiness = prober.readiness()
+    assert not readiness.ready
+    result = readiness.results["hsm"]
+    assert result is not None and result.error == "hsm down"
+    assert HEALTH_CHECK_UP.value(component="hsm") == 0
+
+
+def test_stale_results_make_it_not_ready() -> None:
+    prober = HealthProber({"database": lambda: None}, interval=0.01, max_age=0.01)
+    prober.mark_warmed_up()
+    prober.probe()
+    time.sleep(0.02)
+
+    assert not prober.readiness().ready
+
+
+def test_unhealthy_event_is_logged_once_per_outage(record_logs: RecordLogs) -> None:
+    records = record_logs("app.services.health_prober")
+    errors: list[str | None] = ["refused", "refused", None, "refused"]
+    prober = HealthProber({"database": lambda: errors.pop(0)})
+
+    for _ in range(4):
+        prober.probe()
+
+    events = [r for r in records if getattr(r, "event_id", None) == "270400"]
+    assert [r.error_detail for r in events] == ["refused", "refused"]  # type: ignore[attr-defined]
+
+
+def test_background_thread_probes_until_stopped() -> None:
+    calls: list[float] = []
+
+    def check() -> str | None:
+        calls.append(time.monotonic())
+        return None
+
+    prober = HealthProber({"database": check}, interval=0.01)
+    prober.start()
+    prober.mark_warmed_up()
+    deadline = time.monotonic() + 2
+    while len(calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    prober.stop()
+
+    assert len(calls) >= 3
+    # Stopping also takes it out of rotation
+    assert not prober.readiness().ready
+
+
+def test_hsm_health_check_does_not_log_unreachable(record_logs: RecordLogs) -> None:
+    records = record_logs("app.services.oprf.evaluators")
+    evaluator = HsmOprfEvaluator(
+        ConfigOprf(hsm_url="https://hsm.local"), MagicMock(), MagicMock()
+    )
+
+    with patch(
+        "app.services.oprf.evaluators.requests.Session.post",
+        side_effect=requests.exceptions.ConnectionError("refused"),
+    ):
+        assert evaluator.health_error() == "refused"
+    with patch("app.services.oprf.evaluators.requests.Session.post"):
+        assert evaluator.health_error() is None
+
+    assert records == []
@@ -4,6 +4,9 @@ from typing import Callable, List
 from fastapi.testclient import TestClient
 from pytest import MonkeyPatch
 
+from app.container import get_health_prober
+from app.services.health_prober import HealthProber
+
 RecordLogs = Callable[[str], List[logging.LogRecord]]
 
 
@@ -67,3 +70,58 @@ def test_health_check_healthy_emits_no_event(
     client.get("/health")
 
     assert not [r for r in records if getattr(r, "event_id", None) == "270400"]
+
+
+def _with_prober(client: TestClient, prober: HealthProber) -> TestClient:
+    client.app.dependency_overrides[get_health_prober] = lambda: prober  # type: ignore[attr-defined]
+    return client
+
+
+def test_livez(client: TestClient) -> None:
+    response = client.get("/livez")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_is_not_ready_before_warm_up(client: TestClient) -> None:
+    prober = HealthProber({"database": lambda: None})
+    prober.probe()
+
+    response = _with_prober(client, prober).get("/readyz")
+
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "not_ready"
+    assert body["warmed_up"] is False
+    assert body["components"]["database"]["status"] == "ok"
+
+
+def test_readyz_is_ready_after_warm_up(client: TestClient) -> None:
+    prober = HealthProber({"database": lambda: None, "hsm": lambda: None})
+    prober.probe()
+    prober.mark_warmed_up()
+
+    response = _with_prober(client, prober).get("/readyz")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert set(body["components"]) == {"database", "hsm"}
+
+
+def test_readyz_reports_unhealthy_and_unchecked_components(client: TestClient) -> None:
+    prober = HealthProber({"database": lambda: "connection refused"})
+    prober.mark_warmed_up()
+
+    unchecked = _with_prober(client, prober).get("/readyz")
+    prober.probe()
+    unhealthy = client.get("/readyz")
+
+    assert unchecked.status_code == 503
+    assert unchecked.json()["components"]["database"] == {
+        "status": "unknown",
+        "checked_at": None,
+    }
+    assert unhealthy.status_code == 503
+    assert unhealthy.json()["components"]["database"]["status"] == "error"
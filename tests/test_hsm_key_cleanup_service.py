@@ -1,6 +1,11 @@
+import logging
+import threading
+import time
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from uuid import UUID
+from typing import Any
+from uuid import UUID, uuid4
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
@@ -11,6 +16,7 @@ from app.config import ConfigOprf
 from app.db.db import Database
 from app.db.entities.hsm_key_versions import HsmKeyVersion
 from app.db.entities.organization import Organization
+from app.db.repositories.hsm_key_version_repository import ExpiredHsmKeyVersion
 from app.db.repositories.org_repository import OrgRepository
 from app.db.session import DbSession
 from app.models.oin import Oin
@@ -58,6 +64,11 @@ def _add(
     return version, org
 
 
+def _expired(db: Database, at: datetime | None = None) -> list[ExpiredHsmKeyVersion]:
+    service = HsmKeyVersionService(db)
+    return [v for batch in service.iter_expired_versions(at=at) for v in batch]
+
+
 def _hsm_config() -> ConfigOprf:
     return ConfigOprf(
         hsm_url="https://hsm.local", hsm_module="softhsm", hsm_slot="SoftHSMLabel"
@@ -139,7 +150,7 @@ def test_cleanup_removes_expired_keys_from_hsm_and_db(
             SimpleNamespace(now=lambda tz=None: now),
         ),
         patch(
-            "app.services.hsm_key_cleanup_service.requests.post",
+            "app.services.hsm_key_cleanup_service.requests.Session.post",
             return_value=MagicMock(),
         ) as post,
     ):
@@ -164,7 +175,7 @@ def test_cleanup_removes_expired_keys_from_hsm_and_db(
         assert active == expected_active_versions.get(oin, set())
 
     # Nothing expired remains.
-    assert version_service.get_expired_versions(at=now) == []
+    assert _expired(database, at=now) == []
 
     for index in removed_version_indexes:
         removed_version = version_service.get_version(versions[index].id)
@@ -187,13 +198,13 @@ def test_cleanup_skips_when_hsm_not_configured(database: Database) -> None:
         HsmKeyVersionService(database),
     )
 
-    with patch("app.services.hsm_key_cleanup_service.requests.post") as post:
+    with patch("app.services.hsm_key_cleanup_service.requests.Session.post") as post:
         cleaned = service.cleanup_expired_keys()
 
     assert cleaned == 0
     post.assert_not_called()
     # The expired version is untouched (still expired, not removed).
-    assert len(HsmKeyVersionService(database).get_expired_versions()) == 1
+    assert len(_expired(database)) == 1
 
 
 def test_cleanup_keeps_version_when_hsm_destroy_fails(database: Database) -> None:
@@ -215,16 +226,17 @@ def test_cleanup_keeps_version_when_hsm_destroy_fails(database: Database) -> Non
     failing.raise_for_status.side_effect = requests.HTTPError("boom")
 
     with patch(
-        "app.services.hsm_key_cleanup_service.requests.post", return_value=failing
+        "app.services.hsm_key_cleanup_service.requests.Session.post",
+        return_value=failing,
     ):
         cleaned = service.cleanup_expired_keys()
 
     # HSM removal failed, so the version is left for the next run to retry.
     assert cleaned == 0
-    assert len(HsmKeyVersionService(database).get_expired_versions()) == 1
+    assert len(_expired(database)) == 1
 
 
-def test_get_expired_versions_filters(database: Database) -> None:
+def test_iter_expired_versions_filters(database: Database) -> None:
     now = datetime.now(timezone.utc)
     _add(
         database,
@@ -256,15 +268,39 @@ def test_get_expired_versions_filters(database: Database) -> None:
         removed=True,
     )  # expired but already removed
 
-    expired = HsmKeyVersionService(database).get_expired_versions()
+    expired = _expired(database)
     assert len(expired) == 1
-    with database.get_db_session() as session:
-        org = (
-            session.query(Organization)
-            .filter(Organization.id == expired[0].organization_id)
-            .one()
-        )
-    assert org.oin == TEST_OIN_111
+    assert expired[0].oin == TEST_OIN_111.value
+
+
+def test_iter_expired_versions_pages_through_all_expired(database: Database) -> None:
+    now = datetime.now(timezone.utc)
+    expected = set()
+    for i, oin in enumerate([TEST_OIN, TEST_OIN_111, TEST_OIN_EXPIRED_OTHER]):
+        for version in (1, 2):
+            created, _ = _add(
+                database,
+                oin=oin,
+                version=version,
+                from_dt=now - timedelta(days=10),
+                # Two versions share an end date, so the id breaks the tie
+                until_dt=now - timedelta(days=i + 1),
+            )
+            expected.add((created.id, oin.value, version))
+    _add(
+        database,
+        oin=TEST_OIN_ACTIVE,
+        version=1,
+        from_dt=now - timedelta(days=10),
+        until_dt=None,
+    )
+
+    batches = list(
+        HsmKeyVersionService(database).iter_expired_versions(at=now, batch_size=4)
+    )
+
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert {(v.id, v.oin, v.version) for batch in batches for v in batch} == expected
 
 
 @pytest.mark.parametrize("hsm_url", ["", None])
@@ -275,6 +311,73 @@ def test_cleanup_skips_for_empty_or_missing_hsm_url(
         ConfigOprf(hsm_url=hsm_url),
         HsmKeyVersionService(database),
     )
-    with patch("app.services.hsm_key_cleanup_service.requests.post") as post:
+    with patch("app.services.hsm_key_cleanup_service.requests.Session.post") as post:
         assert service.cleanup_expired_keys() == 0
     post.assert_not_called()
+
+
+class _FakeVersionService:
+    def __init__(self, versions: list[ExpiredHsmKeyVersion]) -> None:
+        self.versions = versions
+        self.marked: list[list[UUID]] = []
+
+    def iter_expired_versions(
+        self, batch_size: int
+    ) -> Iterator[list[ExpiredHsmKeyVersion]]:
+        for i in range(0, len(self.versions), batch_size):
+            yield self.versions[i : i + batch_size]
+
+    def mark_removed_many(self, version_ids: Sequence[UUID]) -> int:
+        if version_ids:
+            self.marked.append(list(version_ids))
+        return len(version_ids)
+
+
+@patch("app.services.hsm_key_cleanup_service._EXPIRED_BATCH", 6)
+def test_cleanup_destroys_concurrently_and_marks_removed_in_bulk(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    now = datetime.now(timezone.utc)
+    versions = [
+        ExpiredHsmKeyVersion(uuid4(), TEST_OIN.value, v, now) for v in range(1, 11)
+    ]
+    version_service = _FakeVersionService(versions)
+    config = _hsm_config()
+    config.hsm_cleanup_concurrency = 4
+    service = HsmKeyCleanupService(config, version_service)  # type: ignore[arg-type]
+
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def post(url: str, **kwargs: Any) -> MagicMock:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        response = MagicMock()
+        if kwargs["json"]["label"] == f"oin-{TEST_OIN}-v3":
+            response.raise_for_status.side_effect = requests.HTTPError("boom")
+        return response
+
+    with (
+        caplog.at_level(logging.WARNING),
+        patch(
+            "app.services.hsm_key_cleanup_service.requests.Session.post",
+            side_effect=post,
+        ),
+    ):
+        cleaned = service.cleanup_expired_keys()
+
+    assert cleaned == 9
+    assert 1 < max_running <= 4
+    # One bulk update per batch of destroyed keys, the failed one is left for
+    # the next run
+    assert [len(marked) for marked in version_service.marked] == [5, 4]
+    assert {id for marked in version_service.marked for id in marked} == {
+        v.id for v in versions if v.version != 3
+    }
+    assert f"failed to destroy 1 expired HSM key(s): oin-{TEST_OIN}-v3" in caplog.text
@@ -0,0 +1,223 @@
+import threading
+import uuid
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.db.db import Database
+from app.db.entities.hsm_key_versions import HsmKeyVersion
+from app.db.entities.organization import Organization
+from app.db.repositories.hsm_key_version_repository import RotatedHsmKeyVersion
+from app.models.oin import Oin
+from app.rid import RidUsage
+from app.services.hsm_key_rotation_service import HsmKeyRotationService
+from app.services.hsm_key_version_service import (
+    HsmKeyRotation,
+    HsmKeyRotationOrganizationsNotFoundError,
+    HsmKeyVersionService,
+)
+from app.services.oprf.evaluators import HsmKeyLabel, HsmOprfEvaluator
+
+TEST_OIN_A = Oin("00000099000000001000")
+TEST_OIN_B = Oin("00000099000000002000")
+TEST_OIN_C = Oin("00000099000000003000")
+
+
+def _add_organization(db: Database, oin: Oin, versions: int = 0) -> Organization:
+    now = datetime.now(timezone.utc)
+    with db.get_db_session() as session:
+        org = Organization(
+            oin=oin,
+            name=f"org-{oin.value}",
+            max_rid_usage=RidUsage.IrreversiblePseudonym.value,
+        )
+        session.add(org)
+        session.flush()
+        for version in range(1, versions + 1):
+            session.add(
+                HsmKeyVersion(
+                    organization_id=org.id,
+                    version=version,
+                    from_dt=now - timedelta(days=versions - version + 1),
+                )
+            )
+        session.commit()
+        return org
+
+
+def _versions(db: Database, org: Organization) -> list[tuple[int, datetime | None]]:
+    versions = HsmKeyVersionService(db).get_page_by_organization_id(org.id).items
+    return sorted((v["version"], v["until_dt"]) for v in versions)
+
+
+def test_rotate_versions_of_all_organizations(database: Database) -> None:
+    org_a = _add_organization(database, TEST_OIN_A, versions=2)
+    org_b = _add_organization(database, TEST_OIN_B)
+    from_dt = datetime.now(timezone.utc) + timedelta(hours=1)
+    previous_until_dt = from_dt + timedelta(days=7)
+
+    rotation = HsmKeyVersionService(database).rotate_versions(
+        from_dt=from_dt, previous_until_dt=previous_until_dt
+    )
+
+    assert [(v.oin, v.version) for v in rotation.created] == [
+        (TEST_OIN_A.value, 3),
+        (TEST_OIN_B.value, 1),
+    ]
+    assert rotation.ended == 2
+    assert _versions(database, org_a) == [
+        (1, previous_until_dt),
+        (2, previous_until_dt),
+        (3, None),
+    ]
+    assert _versions(database, org_b) == [(1, None)]
+
+
+def test_rotate_versions_of_some_organizations(database: Database) -> None:
+    org_a = _add_organization(database, TEST_OIN_A, versions=1)
+    org_b = _add_organization(database, TEST_OIN_B, versions=1)
+    service = HsmKeyVersionService(database)
+
+    rotation = service.rotate_versions([TEST_OIN_B])
+
+    assert [(v.oin, v.version) for v in rotation.created] == [(TEST_OIN_B.value, 2)]
+    assert rotation.ended == 1
+    assert _versions(database, org_a) == [(1, None)]
+    assert [v for v, _ in _versions(database, org_b)] == [1, 2]
+    active = service.get_active_versions_by_organization_id(org_b.id)
+    assert [v.version for v in active] == [2]
+
+
+def test_rotate_versions_with_unknown_organization_rotates_nothing(
+    database: Database,
+) -> None:
+    org_a = _add_organization(database, TEST_OIN_A, versions=1)
+
+    with pytest.raises(HsmKeyRotationOrganizationsNotFoundError) as e:
+        HsmKeyVersionService(database).rotate_versions([TEST_OIN_A, TEST_OIN_C])
+
+    assert e.value.oins == [TEST_OIN_C]
+    assert _versions(database, org_a) == [(1, None)]
+
+
+def test_iter_upcoming_versions_of_a_rotation_ahead(database: Database) -> None:
+    _add_organization(database, TEST_OIN_A, versions=1)
+    _add_organization(database, TEST_OIN_B, versions=1)
+    service = HsmKeyVersionService(database)
+    from_dt = datetime.now(timezone.utc) + timedelta(days=1)
+    rotation = service.rotate_versions(from_dt=from_dt)
+
+    batches = list(service.iter_upcoming_versions(batch_size=1))
+
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert {v.id for batch in batches for v in batch} == {
+        v.id for v in rotation.created
+    }
+
+
+class _FakeVersionService:
+    def __init__(self, created: Sequence[RotatedHsmKeyVersion]) -> None:
+        self.created = list(created)
+        self.calls: list[tuple[object, ...]] = []
+
+    def rotate_versions(
+        self,
+        oins: Sequence[Oin] | None = None,
+        from_dt: datetime | None = None,
+        previous_until_dt: datetime | None = None,
+    ) -> HsmKeyRotation:
+        self.calls.append((oins, from_dt, previous_until_dt))
+        return HsmKeyRotation(self.created, len(self.created))
+
+
+def _created(count: int) -> list[RotatedHsmKeyVersion]:
+    now = datetime.now(timezone.utc)
+    return [
+        RotatedHsmKeyVersion(uuid.uuid4(), f"000000990000{i:04d}1000", 2, now)
+        for i in range(count)
+    ]
+
+
+def test_rotate_provisions_new_keys_concurrently() -> None:
+    created = _created(8)
+    failing = HsmKeyLabel(Oin(created[3].oin), 2)
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+    all_started = threading.Barrier(4, timeout=5)
+
+    def provision_key(label: HsmKeyLabel) -> None:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        try:
+            all_started.wait()
+        except threading.BrokenBarrierError:
+            pass
+        with lock:
+            running -= 1
+        if label == failing:
+            raise RuntimeError("HSM unavailable")
+
+    evaluator = MagicMock(spec=HsmOprfEvaluator)
+    evaluator.provision_key.side_effect = provision_key
+    version_service = _FakeVersionService(created)
+    service = HsmKeyRotationService(
+        version_service,  # type: ignore[arg-type]
+        evaluator,
+        concurrency=4,
+    )
+
+    result = service.rotate([TEST_OIN_A], provision=True)
+
+    assert version_service.calls == [([TEST_OIN_A], None, None)]
+    assert result.created == created
+    assert result.provisioned == 7
+    assert result.provision_failed == [failing]
+    assert evaluator.provision_key.call_count == 8
+    assert max_running == 4
+
+
+def test_rotate_without_provisioning_or_hsm() -> None:
+    evaluator = MagicMock(spec=HsmOprfEvaluator)
+    service = HsmKeyRotationService(
+        _FakeVersionService(_created(2)),  # type: ignore[arg-type]
+        evaluator,
+    )
+    result = service.rotate()
+    assert result.provisioned == 0
+    evaluator.provision_key.assert_not_called()
+
+    service = HsmKeyRotationService(
+        _FakeVersionService(_created(2)),  # type: ignore[arg-type]
+        None,
+    )
+    result = service.rotate(provision=True)
+    assert (result.ended, result.provisioned, result.provision_failed) == (2, 0, [])
+
+
+def test_may_rotate_only_allowed_organizations() -> None:
+    service = HsmKeyRotationService(
+        _FakeVersionService([]),  # type: ignore[arg-type]
+        None,
+        allowed_oins=[TEST_OIN_A.value],
+    )
+    assert service.may_rotate(TEST_OIN_A)
+    assert not service.may_rotate(TEST_OIN_B)
+
+
+def test_provision_upcoming_versions_in_batches() -> None:
+    batches = [_created(3), _created(2)]
+    version_service = MagicMock(spec=HsmKeyVersionService)
+    version_service.iter_upcoming_versions.return_value = iter(batches)
+    evaluator = MagicMock(spec=HsmOprfEvaluator)
+    service = HsmKeyRotationService(version_service, evaluator)
+
+    assert service.provision_upcoming() == 5
+    assert evaluator.provision_key.call_count == 5
+
+    without_hsm = HsmKeyRotationService(version_service, None)
+    assert without_hsm.provision_upcoming() == 0
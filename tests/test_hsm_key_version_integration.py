@@ -5,7 +5,7 @@ It registers an organization with a public key, creates key versions through
 the public ``/administration/key-versions`` endpoint and verifies that an OPRF evaluation
 returns a pseudonym carrying every active key version in the resulting JWE.
 
-The HSM itself is mocked: ``requests.post`` returns a deterministic evaluation
+The HSM itself is mocked: ``requests.Session.post`` returns a deterministic evaluation
 per key version, so we can assert exactly which versions end up in the JWE.
 """
 
@@ -129,7 +129,8 @@ def test_new_key_version_is_added_to_jwe(
 
     try:
         with patch(
-            "app.services.oprf.evaluators.requests.post", side_effect=_fake_hsm_post
+            "app.services.oprf.evaluators.requests.Session.post",
+            side_effect=_fake_hsm_post,
         ):
             # 2. Create version 1 of the HSM key.
             resp = client.post(
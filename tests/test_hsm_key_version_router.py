@@ -364,8 +364,8 @@ def test_list_versions_isolated_for_different_organizations(
     assert [entry["version"] for entry in response_for_other_org.json()] == [1]
 
     service = HsmKeyVersionService(database)
-    assert len(service.get_versions_by_organization_id(auth_org.id)) == 2
-    assert len(service.get_versions_by_organization_id(other_org.id)) == 1
+    assert len(service.get_page_by_organization_id(auth_org.id).items) == 2
+    assert len(service.get_page_by_organization_id(other_org.id).items) == 1
 
 
 def test_update_other_org_version_is_unauthorized(
@@ -400,3 +400,59 @@ def test_update_other_org_version_is_unauthorized(
     # Ensure the version still belongs to the authenticated owner organization.
     service = HsmKeyVersionService(database)
     assert len(service.get_active_versions_by_organization_id(auth_org.id)) == 1
+
+
+def test_rotate_is_forbidden_for_organizations_not_allowed(
+    client: TestClient, database: Database, org_service: OrgService
+) -> None:
+    auth_org = org_service.create(
+        TEST_ORGANIZATION_A_OIN,
+        f"MyOrg-{TEST_ORGANIZATION_A_OIN}",
+        RidUsage.IrreversiblePseudonym,
+    )
+
+    response = client.post(
+        "/administration/key-versions/rotate",
+        json={"all_organizations": True},
+        headers=TEST_ORGANIZATION_A_HEADERS,
+    )
+
+    assert response.status_code == 403
+    service = HsmKeyVersionService(database)
+    assert service.get_page_by_organization_id(auth_org.id).items == []
+
+
+def test_list_versions_pages_with_cursor_and_streams(
+    client: TestClient, database: Database, org_service: OrgService
+) -> None:
+    org_service.create(
+        TEST_ORGANIZATION_A_OIN,
+        f"MyOrg-{TEST_ORGANIZATION_A_OIN}",
+        RidUsage.IrreversiblePseudonym,
+    )
+    for _ in range(5):
+        client.post("/administration/key-versions", headers=TEST_ORGANIZATION_A_HEADERS)
+
+    versions = []
+    url: str | None = "/administration/key-versions?limit=2"
+    while url:
+        response = client.get(url, headers=TEST_ORGANIZATION_A_HEADERS)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        versions += [v["version"] for v in response.json()]
+        url = response.links.get("next", {}).get("url")
+    assert versions == [1, 2, 3, 4, 5]
+
+    streamed = client.get(
+        "/administration/key-versions?stream=true",
+        headers=TEST_ORGANIZATION_A_HEADERS,
+    )
+    assert streamed.status_code == 200
+    assert [v["version"] for v in streamed.json()] == [1, 2, 3, 4, 5]
+
+    unlimited = client.get(
+        "/administration/key-versions", headers=TEST_ORGANIZATION_A_HEADERS
+    )
+    assert unlimited.status_code == 200
+    assert "link" not in unlimited.headers
+    assert [v["version"] for v in unlimited.json()] == [1, 2, 3, 4, 5]
@@ -136,7 +136,9 @@ def test_get_active_versions_excludes_version_ending_now(database: Database) ->
     assert active == set()
 
     # The same row is considered expired at this exact boundary.
-    expired = {v.version for v in service.get_expired_versions(at=now)}
+    expired = {
+        v.version for batch in service.iter_expired_versions(at=now) for v in batch
+    }
     assert expired == {1}
 
 
@@ -184,11 +186,11 @@ def test_get_active_or_create_version_numbers_creates_when_none_active(
 
     assert versions == [2]
 
-    all_versions = service.get_versions_by_organization_id(org_id)
-    assert [v.version for v in all_versions] == [1, 2]
+    all_versions = service.get_page_by_organization_id(org_id).items
+    assert [v["version"] for v in all_versions] == [1, 2]
 
-    created_version = next(v for v in all_versions if v.version == 2)
-    assert created_version.from_dt >= now
+    created_version = next(v for v in all_versions if v["version"] == 2)
+    assert created_version["from_dt"] >= now
 
 
 def test_eval_via_hsm_returns_entry_per_active_version(
@@ -347,7 +349,9 @@ def test_eval_blind_subject_is_latest_with_extra_versions(
         recipientScope="scope",
     )
 
-    with patch("app.services.oprf.evaluators.requests.post", side_effect=fake_post):
+    with patch(
+        "app.services.oprf.evaluators.requests.Session.post", side_effect=fake_post
+    ):
         result = service.eval_blind(req, pub, None)
 
     assert result.key_versions == (2, 7)
@@ -443,7 +447,9 @@ def test_eval_blind_jwe_contains_only_versions_active_at_date(
         recipientScope="scope",
     )
 
-    with patch("app.services.oprf.evaluators.requests.post", side_effect=fake_post):
+    with patch(
+        "app.services.oprf.evaluators.requests.Session.post", side_effect=fake_post
+    ):
         result = service.eval_blind(req, pub, None)
 
     assert result.key_versions == (3, 5)
@@ -558,8 +564,8 @@ def test_eval_blind_without_active_versions_creates_active_version(
     ]
 
     version_service = HsmKeyVersionService(database)
-    versions = version_service.get_versions_by_organization_id(org.id)
-    assert [v.version for v in versions] == [1]
+    versions = version_service.get_page_by_organization_id(org.id).items
+    assert [v["version"] for v in versions] == [1]
 
 
 def test_eval_via_hsm_without_service_raises() -> None:
@@ -0,0 +1,86 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.http_metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    UNMATCHED_ROUTE,
+    RequestMetricsMiddleware,
+)
+from app.metrics import REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str) -> dict[str, float]:
+        return {"in_flight": HTTP_REQUESTS_IN_FLIGHT.value()}
+
+    @app.get("/fail")
+    def fail() -> None:
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestMetricsMiddleware)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def _count(route: str, method: str, status: str) -> float:
+    _, count = HTTP_REQUEST_DURATION.snapshot(route=route, method=method, status=status)
+    return count
+
+
+def test_requests_are_labelled_by_route_template() -> None:
+    client = _client()
+
+    client.get("/items/1")
+    client.get("/items/2")
+
+    assert _count("/items/{item_id}", "GET", "200") == 2
+
+
+def test_unmatched_paths_share_one_label() -> None:
+    client = _client()
+
+    client.get("/does-not-exist")
+    client.get("/also-missing")
+
+    assert _count(UNMATCHED_ROUTE, "GET", "404") == 2
+
+
+def test_exceptions_are_recorded_as_500() -> None:
+    client = _client()
+
+    response = client.get("/fail")
+
+    assert response.status_code == 500
+    assert _count("/fail", "GET", "500") == 1
+
+
+def test_in_flight_gauge_counts_active_requests() -> None:
+    client = _client()
+
+    response = client.get("/items/1")
+
+    assert response.json() == {"in_flight": 1}
+    assert HTTP_REQUESTS_IN_FLIGHT.value() == 0
+
+
+def test_metrics_endpoint_on_api_port(client: TestClient) -> None:
+    client.get("/")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'prs_http_request_duration_seconds_count{route="/",' in response.text
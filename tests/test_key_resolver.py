@@ -57,9 +57,9 @@ def test_resolver_get_and_delete(
 
     e = key_resolver.create(org.id, ["*"], "my-key-id", TEST_PUBKEY)
 
-    items = key_resolver.get_by_org(org.id) or []
+    items = key_resolver.get_page_by_org(org.id).items
     assert len(items) == 1
-    assert items[0].id == e.id
+    assert items[0]["id"] == str(e.id)
 
     by_id = key_resolver.get_by_id(e.id)
     assert by_id is not None
@@ -67,7 +67,7 @@ def test_resolver_get_and_delete(
     ok = key_resolver.delete(e.id, org.id)
     assert ok is True
 
-    items2 = key_resolver.get_by_org(org.id)
+    items2 = key_resolver.get_page_by_org(org.id).items
     assert items2 == []
 
 
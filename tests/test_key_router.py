@@ -61,12 +61,12 @@ def test_register_certificate_creates_key_for_authenticated_org(
     assert response.status_code == 201
     assert response.json() == {"message": "Key created successfully"}
 
-    keys = key_resolver.get_by_org(auth_org.id)
-    assert keys is not None and len(keys) == 1
+    keys = key_resolver.get_page_by_org(auth_org.id).items
+    assert len(keys) == 1
     created = keys[0]
-    assert created.scope == ["nvi"]
-    assert created.key_id == "k1"
-    assert created.key_data == public_key
+    assert created["scope"] == ["nvi"]
+    assert created["key_id"] == "k1"
+    assert created["key_data"] == public_key
 
 
 def test_register_certificate_rejects_duplicate_scope_with_conflict(
@@ -483,3 +483,45 @@ def test_update_rejects_extra_field_with_422(
     detail = response.json().get("detail", [])
     assert isinstance(detail, list)
     assert any(item.get("type") == "extra_forbidden" for item in detail)
+
+
+def test_list_keys_pages_with_cursor_and_streams(
+    client: TestClient,
+    org_service: OrgService,
+    key_resolver: KeyResolver,
+    valid_headers: Dict[str, str],
+) -> None:
+    auth_org = org_service.create(
+        Oin("00000099000000001000"),
+        "MyOrg A",
+        RidUsage.IrreversiblePseudonym,
+    )
+    public_key = _generate_rsa_public_key()
+    created = {
+        str(key_resolver.create(auth_org.id, [scope], None, public_key).id)
+        for scope in ("nvi", "brp", "lsp")
+    }
+    headers = _auth_headers(valid_headers, auth_org.oin)
+
+    first = client.get("/administration/keys?limit=2", headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    assert first.links["next"]["rel"] == "next"
+
+    second = client.get(first.links["next"]["url"], headers=headers)
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+    assert "link" not in second.headers
+    assert {e["id"] for e in first.json() + second.json()} == created
+
+    streamed = client.get("/administration/keys?stream=true", headers=headers)
+    assert streamed.status_code == 200
+    assert {e["id"] for e in streamed.json()} == created
+
+    unlimited = client.get("/administration/keys", headers=headers)
+    assert unlimited.status_code == 200
+    assert "link" not in unlimited.headers
+    assert {e["id"] for e in unlimited.json()} == created
+
+    invalid = client.get("/administration/keys?after=nope", headers=headers)
+    assert invalid.status_code == 400
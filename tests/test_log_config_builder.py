@@ -54,3 +54,38 @@ def test_no_application_id_without_config() -> None:
     conf = _build(syslog_path="logserver:514")
     for formatter in conf["formatters"].values():
         assert "application_id" not in formatter
+
+
+def test_siem_records_go_through_the_spool() -> None:
+    conf = _build(syslog_path="logserver:514", siem_spool_dir="/var/spool/prs")
+
+    siem = conf["handlers"]["syslog_siem"]
+    assert siem["class"] == "app.logging.spool.SpoolHandler"
+    assert siem["directory"] == "/var/spool/prs"
+    assert siem["address"] == ("logserver", 514)
+    assert conf["handlers"]["syslog_app"]["class"] == "logging.handlers.SysLogHandler"
+
+
+def test_tcp_transport_uses_the_stream_handler() -> None:
+    conf = _build(syslog_path="logserver:6514", syslog_transport="tls")
+
+    for name in _SYSLOG_HANDLERS:
+        handler = conf["handlers"][name]
+        assert handler["class"] == "app.logging.transport.StreamSyslogHandler"
+        assert handler["address"] == ("logserver", 6514)
+        assert handler["tls"] is True
+
+
+def test_all_handlers_are_rate_limited() -> None:
+    conf = _build(syslog_path="logserver:514", rate_limit_burst=5)
+
+    assert conf["filters"]["rate_limit_filter"]["burst"] == 5
+    for handler in conf["handlers"].values():
+        assert handler["filters"][-1] == "rate_limit_filter"
+
+
+def test_rate_limit_can_be_disabled() -> None:
+    conf = _build(rate_limit_burst=0)
+
+    assert "rate_limit_filter" not in conf["filters"]
+    assert "rate_limit_filter" not in conf["handlers"]["console"].get("filters", [])
@@ -0,0 +1,91 @@
+import json
+import logging
+
+import pytest
+
+from app.config import JsonEncoder
+from app.logging.context import request_id_var
+from app.logging.events import HEALTH_UNHEALTHY
+from app.logging.filters import LoggingStreams
+from app.logging.formatter import ALWAYS_KEEP_FIELDS, JsonFormatter
+
+
+def _record(**extra: object) -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="app.test",
+        level=logging.ERROR,
+        pathname="",
+        lineno=0,
+        msg="unhealthy %s",
+        args=("database",),
+        exc_info=None,
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def _event_record() -> logging.LogRecord:
+    return _record(
+        event_id=HEALTH_UNHEALTHY.event_id,
+        stream=HEALTH_UNHEALTHY.streams,
+        field_streams=HEALTH_UNHEALTHY.allowed_fields,
+        component="database",
+        status="error",
+        error_detail="connection refused",
+    )
+
+
+def test_allowed_fields_are_precomputed_per_stream() -> None:
+    siem = HEALTH_UNHEALTHY.allowed_fields[LoggingStreams.SIEM]
+
+    assert siem == {"component", "status"} | ALWAYS_KEEP_FIELDS
+
+
+def test_context_is_gathered_once_per_record() -> None:
+    record = _event_record()
+    app = JsonFormatter(include_traces=False, stream=LoggingStreams.APP)
+    siem = JsonFormatter(include_traces=False, stream=LoggingStreams.SIEM)
+
+    token = request_id_var.set("req-1")
+    try:
+        app_out = json.loads(app.format(record))
+    finally:
+        request_id_var.reset(token)
+    # Formatted by a later handler, e.g. from the log queue thread
+    siem_out = json.loads(siem.format(record))
+
+    assert app_out["message"]["request_id"] == "req-1"
+    assert siem_out["message"] == {
+        "request_id": "req-1",
+        "component": "database",
+        "status": "error",
+    }
+    assert siem_out["event_description"] == "unhealthy database"
+
+
+def test_orjson_encoder_gives_the_same_record() -> None:
+    pytest.importorskip("orjson")
+    record = _event_record()
+
+    default = JsonFormatter(include_traces=False, stream=LoggingStreams.APP)
+    fast = JsonFormatter(
+        include_traces=False,
+        stream=LoggingStreams.APP,
+        json_encoder=JsonEncoder.orjson,
+    )
+
+    assert json.loads(fast.format(record)) == json.loads(default.format(record))
+
+
+def test_exception_is_formatted_once() -> None:
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError as e:
+        record = _record(exc_info=(type(e), e, e.__traceback__))
+
+    first = json.loads(JsonFormatter().format(record))
+    second = json.loads(JsonFormatter().format(record))
+
+    assert "RuntimeError: boom" in first["message"]["exception"]
+    assert record.exc_text == first["message"]["exception"]
+    assert second["message"]["exception"] == record.exc_text
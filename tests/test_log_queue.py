@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Generator
+from typing import List
+
+import pytest
+
+from app.logging import queueing
+from app.logging.context import request_id_var
+from app.logging.events import ACCESS_REQUEST, SYS_HSM_UNREACHABLE, log_event
+from app.logging.formatter import record_fields
+from app.logging.queueing import LOG_RECORDS_DROPPED, LOG_RECORDS_OVERFLOWED
+from app.metrics import REGISTRY
+
+_LOGGER = "test.log_queue"
+
+
+class _BlockingHandler(logging.Handler):
+    """Records what it handles, on which thread, once released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.unblock = threading.Event()
+        self.unblock.set()
+        self.records: List[logging.LogRecord] = []
+        self.threads: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.unblock.wait()
+        self.records.append(record)
+        self.threads.append(threading.current_thread().name)
+
+
+@pytest.fixture
+def handler() -> Generator[_BlockingHandler, None, None]:
+    REGISTRY.clear()
+    logger = logging.getLogger(_LOGGER)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = _BlockingHandler()
+    logger.addHandler(handler)
+    yield handler
+    handler.unblock.set()
+    queueing.stop()
+    logger.removeHandler(handler)
+
+
+def test_records_are_shipped_from_the_listener_thread(
+    handler: _BlockingHandler,
+) -> None:
+    queueing.install(100, [_LOGGER])
+    logger = logging.getLogger(_LOGGER)
+
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("handled %s", "request")
+    finally:
+        request_id_var.reset(token)
+    queueing.stop()
+
+    assert handler.threads == ["log-shipper"]
+    record = handler.records[0]
+    assert record.getMessage() == "handled request"
+    # The request context is captured before the record leaves the request
+    assert record_fields(record)["request_id"] == "req-1"
+
+
+def test_stop_gives_the_handlers_back(handler: _BlockingHandler) -> None:
+    logger = logging.getLogger(_LOGGER)
+    queueing.install(100, [_LOGGER])
+    assert handler not in logger.handlers
+
+    queueing.stop()
+
+    assert handler in logger.handlers
+    assert not any(isinstance(h, queueing.QueueingHandler) for h in logger.handlers)
+
+
+def test_full_queue_drops_records_but_keeps_siem_events(
+    handler: _BlockingHandler,
+) -> None:
+    logger = logging.getLogger(_LOGGER)
+    handler.unblock.clear()
+    log_queue = queueing.install(1, [_LOGGER])
+
+    # The listener takes the first record and blocks in the handler, the second
+    # fills the queue and the third is dropped
+    log_event(logger, ACCESS_REQUEST, "access")
+    while log_queue.queue.qsize():
+        pass
+    log_event(logger, ACCESS_REQUEST, "access")
+    log_event(logger, ACCESS_REQUEST, "access")
+    assert LOG_RECORDS_DROPPED.value(stream="other") == 1
+
+    # A SIEM event waits for room instead
+    siem = threading.Thread(
+        target=log_event,
+        args=(logger, SYS_HSM_UNREACHABLE, "HSM unreachable"),
+        kwargs={"error_reason": "timeout", "retry_attempt": 1},
+    )
+    siem.start()
+    handler.unblock.set()
+    siem.join()
+    queueing.stop()
+
+    assert LOG_RECORDS_DROPPED.value(stream="siem") == 0
+    assert [r.getMessage() for r in handler.records] == [
+        "access",
+        "access",
+        "HSM unreachable",
+    ]
+
+
+def test_full_queue_overflows_siem_events_on_the_event_loop(
+    handler: _BlockingHandler,
+) -> None:
+    logger = logging.getLogger(_LOGGER)
+    handler.unblock.clear()
+    log_queue = queueing.install(1, [_LOGGER])
+    log_event(logger, ACCESS_REQUEST, "access")
+    while log_queue.queue.qsize():
+        pass
+    log_event(logger, ACCESS_REQUEST, "access")
+
+    async def log_siem_event() -> None:
+        log_event(
+            logger,
+            SYS_HSM_UNREACHABLE,
+            "HSM unreachable",
+            error_reason="timeout",
+            retry_attempt=1,
+        )
+
+    # Returns right away instead of waiting for room
+    start = time.monotonic()
+    asyncio.run(log_siem_event())
+    assert time.monotonic() - start < 1
+    handler.unblock.set()
+    queueing.stop()
+
+    assert LOG_RECORDS_DROPPED.value(stream="siem") == 0
+    assert LOG_RECORDS_OVERFLOWED.value() == 1
+    # The overflow is shipped before the records queued meanwhile
+    assert [r.getMessage() for r in handler.records] == [
+        "access",
+        "HSM unreachable",
+        "access",
+    ]
@@ -0,0 +1,152 @@
+import logging
+import time
+from collections.abc import Generator
+from typing import List
+
+import pytest
+
+from app.logging import queueing
+from app.logging.events import ACCESS_REQUEST, log_event
+from app.logging.filters import LOG_RECORDS_SUPPRESSED, RateLimitFilter
+from app.metrics import REGISTRY
+
+_LOGGER = "app.test_log_rate_limit"
+_INTERVAL = 0.05
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def handlers() -> Generator[tuple[_ListHandler, _ListHandler], None, None]:
+    REGISTRY.clear()
+    rate_limit = RateLimitFilter(burst=2, interval=_INTERVAL)
+    # Like the configured handlers, both share the one filter
+    first, second = _ListHandler(), _ListHandler()
+    for handler in (first, second):
+        handler.addFilter(rate_limit)
+
+    logger = logging.getLogger(_LOGGER)
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [first, second]
+    logger.propagate = False
+    try:
+        yield first, second
+    finally:
+        rate_limit.close()
+        logger.handlers = []
+
+
+def test_similar_records_are_suppressed_and_summarized(
+    handlers: tuple[_ListHandler, _ListHandler],
+) -> None:
+    first, second = handlers
+    logger = logging.getLogger(_LOGGER)
+
+    for i in range(5):
+        logger.warning("failed to decrypt RID: %s", i)
+    assert first.messages == ["failed to decrypt RID: 0", "failed to decrypt RID: 1"]
+    assert second.messages == first.messages
+    assert LOG_RECORDS_SUPPRESSED.value(logger=_LOGGER) == 3
+
+    time.sleep(_INTERVAL)
+    logger.warning("failed to decrypt RID: %s", 5)
+
+    assert first.messages[2:] == [
+        "suppressed 3 similar log records: failed to decrypt RID: %s",
+        "failed to decrypt RID: 5",
+    ]
+    assert second.messages == first.messages
+
+
+def test_templates_are_limited_separately(
+    handlers: tuple[_ListHandler, _ListHandler],
+) -> None:
+    first, _ = handlers
+    logger = logging.getLogger(_LOGGER)
+
+    for _ in range(3):
+        logger.warning("decrypted RID is empty")
+        logger.warning("failed to parse RID payload as JSON")
+
+    assert (
+        first.messages
+        == [
+            "decrypted RID is empty",
+            "failed to parse RID payload as JSON",
+        ]
+        * 2
+    )
+
+
+def test_audit_events_are_never_suppressed(
+    handlers: tuple[_ListHandler, _ListHandler],
+) -> None:
+    first, _ = handlers
+    logger = logging.getLogger(_LOGGER)
+
+    for _ in range(5):
+        log_event(logger, ACCESS_REQUEST, "access")
+
+    assert first.messages == ["access"] * 5
+    assert LOG_RECORDS_SUPPRESSED.value(logger=_LOGGER) == 0
+
+
+def test_queued_records_are_limited_by_template(
+    handlers: tuple[_ListHandler, _ListHandler],
+) -> None:
+    first, _ = handlers
+    logger = logging.getLogger(_LOGGER)
+
+    queueing.install(100, [_LOGGER])
+    try:
+        for i in range(5):
+            logger.warning("failed to decrypt RID: %s", i)
+    finally:
+        queueing.stop()
+
+    assert first.messages == ["failed to decrypt RID: 0", "failed to decrypt RID: 1"]
+    assert LOG_RECORDS_SUPPRESSED.value(logger=_LOGGER) == 3
+
+
+def test_summaries_are_logged_without_a_later_record(
+    handlers: tuple[_ListHandler, _ListHandler],
+) -> None:
+    first, _ = handlers
+    logger = logging.getLogger(_LOGGER)
+
+    for i in range(3):
+        logger.warning("failed to decrypt RID: %s", i)
+
+    deadline = time.monotonic() + 5
+    while len(first.messages) < 3 and time.monotonic() < deadline:
+        time.sleep(_INTERVAL / 5)
+    assert first.messages[2:] == [
+        "suppressed 1 similar log records: failed to decrypt RID: %s"
+    ]
+
+
+def test_close_logs_the_pending_summaries() -> None:
+    rate_limit = RateLimitFilter(burst=1, interval=60.0)
+    handler = _ListHandler()
+    handler.addFilter(rate_limit)
+    logger = logging.getLogger(_LOGGER)
+    logger.handlers = [handler]
+    logger.propagate = False
+    try:
+        for i in range(3):
+            logger.warning("failed to decrypt RID: %s", i)
+        rate_limit.close()
+    finally:
+        logger.handlers = []
+
+    assert handler.messages == [
+        "failed to decrypt RID: 0",
+        "suppressed 2 similar log records: failed to decrypt RID: %s",
+    ]
@@ -142,7 +142,7 @@ def test_eval_blind_hsm_failure_raises_crypto_evaluation_failure(
 
     with (
         patch(
-            "app.services.oprf.evaluators.requests.post",
+            "app.services.oprf.evaluators.requests.Session.post",
             side_effect=RuntimeError("HSM unreachable"),
         ),
         pytest.raises(OprfEvaluationError) as exc,
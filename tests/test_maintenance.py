@@ -0,0 +1,165 @@
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+from app.maintenance import (
+    MAINTENANCE_JOB_RUNS,
+    MAINTENANCE_LEADER,
+    Job,
+    MaintenanceDaemon,
+    MaintenanceServer,
+)
+from app.metrics import REGISTRY
+
+
+class _FakeLock:
+    def __init__(self, leader: bool = True) -> None:
+        self.leader = leader
+        self.released = False
+
+    def try_acquire(self) -> bool:
+        return self.leader
+
+    def release(self) -> None:
+        self.released = True
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_registry() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def _daemon(
+    runs: list[str], lock: _FakeLock, clock: _FakeClock, jitter: float = 0.0
+) -> MaintenanceDaemon:
+    jobs = [
+        Job("cleanup", 60, lambda: runs.append("cleanup")),
+        Job("other", 600, lambda: runs.append("other")),
+    ]
+    return MaintenanceDaemon(jobs, lock, jitter=jitter, poll_interval=5, clock=clock)
+
+
+def test_leader_runs_due_jobs_on_their_schedule() -> None:
+    runs: list[str] = []
+    clock = _FakeClock()
+    daemon = _daemon(runs, _FakeLock(), clock)
+
+    daemon.run_pending()
+    assert runs == ["cleanup", "other"]
+    assert MAINTENANCE_LEADER.value() == 1
+
+    clock.now += 59
+    daemon.run_pending()
+    assert runs == ["cleanup", "other"]
+
+    clock.now += 1
+    daemon.run_pending()
+    assert runs == ["cleanup", "other", "cleanup"]
+    assert MAINTENANCE_JOB_RUNS.value(job="cleanup", outcome="ok") == 2
+    assert daemon.status["cleanup"].last_success is not None
+
+
+def test_standby_does_not_run_jobs() -> None:
+    runs: list[str] = []
+    lock = _FakeLock(leader=False)
+    clock = _FakeClock()
+    daemon = _daemon(runs, lock, clock)
+
+    daemon.run_pending()
+    assert runs == []
+    assert MAINTENANCE_LEADER.value() == 0
+
+    # Takes over once the lock is free, and runs the overdue jobs
+    lock.leader = True
+    clock.now += 5
+    daemon.run_pending()
+    assert runs == ["cleanup", "other"]
+
+
+def test_failed_job_is_recorded_and_rescheduled() -> None:
+    def fail() -> None:
+        raise RuntimeError("HSM unavailable")
+
+    clock = _FakeClock()
+    daemon = MaintenanceDaemon(
+        [Job("cleanup", 60, fail)], _FakeLock(), jitter=0, clock=clock
+    )
+
+    daemon.run_pending()
+    assert daemon.status["cleanup"].last_error == "HSM unavailable"
+    assert daemon.status["cleanup"].last_success is None
+    assert MAINTENANCE_JOB_RUNS.value(job="cleanup", outcome="error") == 1
+
+    clock.now += 60
+    daemon.run_pending()
+    assert MAINTENANCE_JOB_RUNS.value(job="cleanup", outcome="error") == 2
+
+
+def test_jitter_spreads_the_runs_within_bounds() -> None:
+    clock = _FakeClock()
+    daemon = _daemon([], _FakeLock(), clock, jitter=0.1)
+
+    # The first runs are delayed by at most jitter * interval
+    assert 1000 <= daemon._next_run["cleanup"] <= 1006
+    intervals = [daemon._jittered(60) for _ in range(200)]
+    assert all(54 <= interval <= 66 for interval in intervals)
+    assert len(set(intervals)) > 1
+
+    with patch("app.maintenance.random.uniform", return_value=0.1):
+        clock.now += 6
+        daemon.run_pending()
+    assert daemon._next_run["cleanup"] == pytest.approx(clock.now + 66)
+
+
+def test_run_stops_and_releases_the_lock() -> None:
+    runs: list[str] = []
+    lock = _FakeLock()
+    daemon = _daemon(runs, lock, _FakeClock())
+    daemon.jobs[0] = Job("cleanup", 60, daemon.stop)
+
+    daemon.run()
+    assert lock.released
+    assert MAINTENANCE_LEADER.value() == 0
+    # Stopped before the second job was due to run
+    assert runs == []
+
+
+def test_server_serves_health_and_metrics() -> None:
+    clock = _FakeClock()
+    daemon = _daemon([], _FakeLock(), clock)
+    daemon.run_pending()
+    server = MaintenanceServer(daemon, "127.0.0.1", 0)
+    server.start()
+    host, port = server.server_address
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health") as response:
+            health = json.load(response)
+        assert health["status"] == "ok"
+        assert health["leader"] is True
+        assert health["jobs"]["cleanup"]["last_error"] is None
+
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            metrics = response.read().decode()
+        assert 'prs_maintenance_job_runs_total{job="cleanup",outcome="ok"} 1' in metrics
+
+        # No poll for longer than three poll intervals: stuck
+        clock.now += 16
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(f"http://{host}:{port}/health")
+        assert e.value.code == 503
+    finally:
+        server.stop()
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from app.metrics import Counter, Gauge, Histogram, MetricsRegistry, render
+
+
+@pytest.fixture
+def registry() -> MetricsRegistry:
+    return MetricsRegistry()
+
+
+def test_counter_sums_increments_from_all_threads(registry: MetricsRegistry) -> None:
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(5, kind="b")
+
+    assert counter.value(kind="a") == 4000
+    assert counter.value(kind="b") == 5
+
+
+def test_counter_rejects_unknown_labels(registry: MetricsRegistry) -> None:
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_duplicate_metric_names_are_rejected(registry: MetricsRegistry) -> None:
+    Counter("test_total", "Test counter", registry=registry)
+
+    with pytest.raises(ValueError):
+        Counter("test_total", "Test counter", registry=registry)
+
+
+def test_gauge_combines_increments_and_functions(registry: MetricsRegistry) -> None:
+    gauge = Gauge("test_gauge", "Test gauge", ("pool",), registry=registry)
+    gauge.inc(pool="a")
+    gauge.inc(pool="a")
+    gauge.dec(pool="a")
+    gauge.set(3, pool="b")
+    gauge.set_function(lambda: 7, pool="c")
+
+    assert gauge.value(pool="a") == 1
+    assert gauge.value(pool="b") == 3
+    assert gauge.value(pool="c") == 7
+
+
+def test_histogram_renders_cumulative_buckets(registry: MetricsRegistry) -> None:
+    histogram = Histogram(
+        "test_seconds", "Test histogram", buckets=(0.1, 1.0), registry=registry
+    )
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+
+    text = render(registry.collect())
+
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'test_seconds_bucket{le="1.0"} 3.0' in text
+    assert 'test_seconds_bucket{le="+Inf"} 4.0' in text
+    assert "test_seconds_sum 6.05" in text
+    assert "test_seconds_count 4.0" in text
+    assert histogram.snapshot() == pytest.approx((6.05, 4))
+
+
+def test_label_values_are_escaped(registry: MetricsRegistry) -> None:
+    counter = Counter("test_total", "Test counter", ("path",), registry=registry)
+    counter.inc(path='say "hi"')
+
+    assert 'test_total{path="say \\"hi\\""} 1.0' in render(registry.collect())
+
+
+def test_clear_resets_values(registry: MetricsRegistry) -> None:
+    counter = Counter("test_total", "Test counter", registry=registry)
+    counter.inc()
+
+    registry.clear()
+
+    assert counter.value() == 0
@@ -0,0 +1,137 @@
+import json
+import os
+import socket
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from app.config import ConfigMetrics
+from app.metrics import Counter, Gauge, MetricsRegistry, collect_snapshots
+from app.metrics_exporter import MetricsExporter
+
+# Far above any pid_max, so never a running process
+DEAD_PID = 999999999
+
+
+@pytest.fixture
+def registry() -> MetricsRegistry:
+    return MetricsRegistry()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def _write_worker_snapshot(directory: Path, pid: int, requests: float) -> None:
+    families = [
+        {
+            "name": "test_requests_total",
+            "documentation": "Test counter",
+            "type": "counter",
+            "samples": [["test_requests_total", {"kind": "a"}, requests]],
+        },
+        {
+            "name": "test_in_flight",
+            "documentation": "Test gauge",
+            "type": "gauge",
+            "samples": [["test_in_flight", {}, 1]],
+        },
+    ]
+    (directory / f"{pid}.json").write_text(json.dumps(families))
+
+
+def _values(exporter: MetricsExporter) -> dict[str, float]:
+    return {
+        sample.name: sample.value
+        for family in exporter.collect()
+        for sample in family.samples
+    }
+
+
+def test_collect_without_multiprocess_dir_uses_registry(
+    registry: MetricsRegistry,
+) -> None:
+    counter = Counter("test_requests_total", "Test counter", registry=registry)
+    counter.inc(3)
+
+    exporter = MetricsExporter(ConfigMetrics(), registry)
+
+    assert _values(exporter) == {"test_requests_total": 3}
+    assert "test_requests_total 3.0" in exporter.render()
+
+
+def test_collect_sums_snapshots_of_all_workers(
+    registry: MetricsRegistry, tmp_path: Path
+) -> None:
+    counter = Counter(
+        "test_requests_total", "Test counter", ("kind",), registry=registry
+    )
+    gauge = Gauge("test_in_flight", "Test gauge", registry=registry)
+    counter.inc(2, kind="a")
+    gauge.set(1)
+    # A worker that is still running (our parent) and one that is gone
+    _write_worker_snapshot(tmp_path, os.getppid(), 5)
+    _write_worker_snapshot(tmp_path, DEAD_PID, 10)
+
+    exporter = MetricsExporter(ConfigMetrics(multiprocess_dir=str(tmp_path)), registry)
+
+    values = _values(exporter)
+    # Counters of all workers are kept, gauges of the dead worker are dropped
+    assert values["test_requests_total"] == 17
+    assert values["test_in_flight"] == 2
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_collect_snapshots_skips_unrelated_files(tmp_path: Path) -> None:
+    _write_worker_snapshot(tmp_path, os.getpid(), 1)
+    (tmp_path / "notes.txt").write_text("hello")
+    (tmp_path / "123.json.tmp").write_text("{")
+
+    names = [family.name for family in collect_snapshots(str(tmp_path))]
+
+    assert names == ["test_requests_total", "test_in_flight"]
+
+
+def test_serves_metrics_on_separate_port(registry: MetricsRegistry) -> None:
+    Counter("test_requests_total", "Test counter", registry=registry).inc()
+    exporter = MetricsExporter(
+        ConfigMetrics(port=_free_port(), host="127.0.0.1"), registry
+    )
+
+    exporter.start()
+    try:
+        assert exporter.server_address is not None
+        host, port = exporter.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "test_requests_total 1.0" in response.read().decode()
+
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(f"http://{host}:{port}/other")
+        assert exc_info.value.code == 404
+    finally:
+        exporter.stop()
+
+    assert exporter.server_address is None
+
+
+def test_second_exporter_does_not_fail_when_port_is_taken(
+    registry: MetricsRegistry,
+) -> None:
+    config = ConfigMetrics(port=_free_port(), host="127.0.0.1")
+    first = MetricsExporter(config, registry)
+    second = MetricsExporter(config, registry)
+
+    first.start()
+    second.start()
+    try:
+        assert first.server_address is not None
+        assert second.server_address is None
+    finally:
+        second.stop()
+        first.stop()
@@ -0,0 +1,139 @@
+import datetime
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from starlette.requests import Request
+
+from app.metrics import CACHE_REQUESTS, REGISTRY
+from app.models.oin import Oin
+from app.services.mtls_service import InvalidOinCertificate, MtlsService
+
+OIN = "00000099000000001000"
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+class _FakeOrgService:
+    def __init__(self) -> None:
+        self.lookups: list[Oin] = []
+
+    def get_by_oin(self, oin: Oin) -> Any:
+        self.lookups.append(oin)
+        return {"oin": oin.value}
+
+
+def _certificate(serial_number: str, not_valid_after: datetime.datetime) -> str:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name(
+        [x509.NameAttribute(x509.oid.NameOID.SERIAL_NUMBER, serial_number)]
+    )
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_valid_after - datetime.timedelta(days=365))
+        .not_valid_after(not_valid_after)
+        .sign(key, hashes.SHA256())
+    )
+    pem = cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+    # Proxies forward the certificate on a single line
+    return pem.replace("\n", "")
+
+
+def _valid_certificate(serial_number: str = OIN) -> str:
+    return _certificate(
+        serial_number,
+        datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1),
+    )
+
+
+def _request(cert: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(b"x-forwarded-tls-client-cert", cert.encode("ascii"))],
+        }
+    )
+
+
+def _lookups(result: str) -> float:
+    return CACHE_REQUESTS.value(cache="mtls_certificates", result=result)
+
+
+def test_parsed_certificate_is_cached() -> None:
+    service = MtlsService(None, _FakeOrgService())  # type: ignore[arg-type]
+    cert = _valid_certificate()
+
+    first = service.get_client_certificate(_request(cert))
+    second = service.get_client_certificate(_request(cert))
+
+    assert second is first
+    assert first.oin == Oin(OIN)
+    assert first.public_key_pem.startswith("-----BEGIN PUBLIC KEY-----")
+    assert service.get_mtls_pub_key(_request(cert)) == first.public_key_pem
+    assert _lookups("miss") == 1
+    assert _lookups("hit") == 2
+
+
+def test_expired_certificate_is_not_cached() -> None:
+    service = MtlsService(None, _FakeOrgService())  # type: ignore[arg-type]
+    cert = _certificate(
+        OIN, datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
+    )
+
+    service.get_client_certificate(_request(cert))
+    service.get_client_certificate(_request(cert))
+
+    assert _lookups("miss") == 2
+    assert _lookups("hit") == 0
+
+
+def test_cache_is_bounded() -> None:
+    service = MtlsService(None, _FakeOrgService(), cache_size=2)  # type: ignore[arg-type]
+    certs = [_valid_certificate() for _ in range(3)]
+
+    for cert in certs:
+        service.get_client_certificate(_request(cert))
+    # The least recently used certificate was dropped
+    service.get_client_certificate(_request(certs[0]))
+
+    assert _lookups("miss") == 4
+
+
+def test_org_is_looked_up_by_cached_oin() -> None:
+    org_service = _FakeOrgService()
+    service = MtlsService(None, org_service)  # type: ignore[arg-type]
+    cert = _valid_certificate()
+
+    service.get_org_from_request(_request(cert))
+    service.get_org_from_request(_request(cert))
+
+    assert org_service.lookups == [Oin(OIN), Oin(OIN)]
+
+
+def test_invalid_oin_is_rejected_from_cache() -> None:
+    service = MtlsService(None, _FakeOrgService())  # type: ignore[arg-type]
+    cert = _valid_certificate("not-an-oin")
+
+    for _ in range(2):
+        with pytest.raises(InvalidOinCertificate):
+            service.get_org_from_request(_request(cert))
+    assert _lookups("hit") == 1
+
+
+def test_unparsable_certificate_is_rejected() -> None:
+    service = MtlsService(None, _FakeOrgService())  # type: ignore[arg-type]
+
+    with pytest.raises(InvalidOinCertificate):
+        service.get_oin_cert(_request("-----BEGIN CERTIFICATE-----AAAA"))
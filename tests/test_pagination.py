@@ -0,0 +1,44 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+from app.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    stream_json_array,
+)
+
+
+def test_cursor_round_trip() -> None:
+    key_id = uuid.uuid4()
+    cursor = encode_cursor(3, key_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [3, str(key_id)]
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", "", "%%%"])
+def test_invalid_cursor_raises(cursor: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_stream_json_array_joins_the_pages() -> None:
+    now = datetime.now(timezone.utc)
+    pages: list[list[dict[str, Any]]] = [
+        [{"version": 1, "from_dt": now}, {"version": 2}],
+        [],
+        [{"version": 3}],
+    ]
+
+    chunks = list(stream_json_array(pages))
+
+    assert len(chunks) == 4
+    body = json.loads(b"".join(chunks))
+    assert [entry["version"] for entry in body] == [1, 2, 3]
+    assert body[0]["from_dt"] == now.isoformat()
+    assert json.loads(b"".join(stream_json_array([[]]))) == []
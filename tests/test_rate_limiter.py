@@ -0,0 +1,214 @@
+import socketserver
+import threading
+import time
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import container
+from app.auth import get_auth_ctx
+from app.config import ConfigRateLimit
+from app.metrics import REGISTRY
+from app.models.auth.context import AuthContext, AuthenticationClaims
+from app.models.oin import Oin
+from app.models.requests import BlindRequest
+from app.rate_limit import oprf_rate_limit
+from app.services.rate_limiter import (
+    RATE_LIMIT_BACKEND_ERRORS,
+    RATE_LIMITED,
+    MemoryTokenBuckets,
+    RateLimit,
+    RateLimiter,
+    RespTokenBuckets,
+)
+
+CLIENT = "00000099000000001000"
+OTHER_CLIENT = "00000099000000002000"
+TARGET = "00000099000000003000"
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Serves the commands RespTokenBuckets sends, like a Redis server would."""
+
+    def handle(self) -> None:
+        server: Any = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            server.commands.append(args[0])
+            if args[0] == "EVAL":
+                _, _, _, key, interval, burst = args
+                wait = server.buckets.take(
+                    key, RateLimit(1 / float(interval), int(burst))
+                )
+                self._bulk(repr(wait) if wait > 0 else "0")
+            elif args[0] in ("AUTH", "SELECT"):
+                self.wfile.write(b"+OK\r\n")
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+    def _read_command(self) -> list[str] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def _bulk(self, value: str) -> None:
+        data = value.encode()
+        self.wfile.write(b"$%d\r\n%s\r\n" % (len(data), data))
+
+
+@pytest.fixture
+def resp_server() -> Generator[Any, None, None]:
+    server: Any = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.buckets = MemoryTokenBuckets()
+    server.commands = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_memory_buckets_allow_burst_then_limit() -> None:
+    buckets = MemoryTokenBuckets()
+    limit = RateLimit(rate=10, burst=3)
+
+    assert [buckets.take("a", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = buckets.take("a", limit)
+    assert 0 < wait <= 0.1
+    # Other buckets are independent
+    assert buckets.take("b", limit) == 0.0
+
+    time.sleep(wait)
+    assert buckets.take("a", limit) == 0.0
+
+
+def test_memory_buckets_prune_full_buckets() -> None:
+    buckets = MemoryTokenBuckets(max_buckets=2)
+    limit = RateLimit(rate=1000, burst=1)
+
+    buckets.take("a", limit)
+    buckets.take("b", limit)
+    time.sleep(0.01)
+    buckets.take("c", limit)
+
+    assert len(buckets) == 1
+
+
+def test_limiter_uses_overrides_per_client() -> None:
+    limiter = RateLimiter(
+        ConfigRateLimit.model_validate(
+            {"rate": 1, "burst": 1, "overrides": f"{OTHER_CLIENT}=100/5"}
+        )
+    )
+
+    assert limiter.check(CLIENT, TARGET) == 0
+    assert limiter.check(CLIENT, TARGET) > 0
+    assert [limiter.check(OTHER_CLIENT, TARGET) for _ in range(5)] == [0.0] * 5
+    assert RATE_LIMITED.value() == 1
+
+
+def test_overrides_are_validated() -> None:
+    with pytest.raises(ValueError):
+        ConfigRateLimit.model_validate({"overrides": f"{CLIENT}=10"})
+
+
+def test_disabled_limiter_allows_everything() -> None:
+    limiter = RateLimiter(ConfigRateLimit(enabled=False, rate=1, burst=1))
+
+    assert [limiter.check(CLIENT, TARGET) for _ in range(5)] == [0.0] * 5
+
+
+def test_resp_backend_shares_buckets(resp_server: Any) -> None:
+    host, port = resp_server.server_address
+    config = ConfigRateLimit(rate=1, burst=2, backend_url=f"redis://{host}:{port}/1")
+    # Two workers
+    first = RateLimiter(config)
+    second = RateLimiter(config)
+
+    assert first.check(CLIENT, TARGET) == 0
+    assert second.check(CLIENT, TARGET) == 0
+    assert first.check(CLIENT, TARGET) > 0
+    assert resp_server.commands[:2] == ["SELECT", "EVAL"]
+
+
+def test_falls_back_to_memory_when_backend_is_down() -> None:
+    backend = RespTokenBuckets("redis://127.0.0.1:1", 0.1, "prs:")
+    limiter = RateLimiter(ConfigRateLimit(rate=1, burst=1), backend=backend)
+
+    assert limiter.check(CLIENT, TARGET) == 0
+    assert limiter.check(CLIENT, TARGET) > 0
+    assert RATE_LIMIT_BACKEND_ERRORS.value() == 1
+
+
+class _DownBackend:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        self.calls += 1
+        raise ConnectionRefusedError("connection refused")
+
+
+def test_backend_is_not_called_within_the_retry_interval() -> None:
+    backend = _DownBackend()
+    limiter = RateLimiter(
+        ConfigRateLimit(rate=100, burst=100, backend_retry_interval=0.1),
+        backend=backend,
+    )
+
+    for _ in range(10):
+        assert limiter.check(CLIENT, TARGET) == 0
+    assert backend.calls == 1
+
+    time.sleep(0.1)
+    assert limiter.check(CLIENT, TARGET) == 0
+    assert backend.calls == 2
+
+
+def test_dependency_rejects_with_429() -> None:
+    app = FastAPI()
+
+    @app.post("/oprf/eval", dependencies=[Depends(oprf_rate_limit)])
+    def post_eval(req: BlindRequest) -> dict[str, str]:
+        return {"scope": req.recipientScope}
+
+    limiter = RateLimiter(ConfigRateLimit(rate=0.5, burst=1))
+    app.dependency_overrides[container.get_rate_limiter] = lambda: limiter
+    app.dependency_overrides[get_auth_ctx] = lambda: AuthContext(
+        claims=AuthenticationClaims(
+            organization_id=Oin(CLIENT),
+            client_organization_id=Oin(CLIENT),
+            client_common_name="client",
+        ),
+        audience="aud",
+    )
+    client = TestClient(app)
+    body = {
+        "encryptedPersonalId": "AAAA",
+        "recipientOrganization": f"oin:{TARGET}",
+        "recipientScope": "nvi",
+    }
+
+    assert client.post("/oprf/eval", json=body).status_code == 200
+    response = client.post("/oprf/eval", json=body)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
@@ -1,12 +1,13 @@
 import io
 import json
 import logging
-from typing import Any, Iterator
+from typing import Any, Callable, Iterator, List
 
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.testclient import TestClient
 
+from app import deadline, timing
 from app.logging.context import (
     CLIENT_TRACE_ID_HEADER,
     CORRELATION_ID_HEADER,
@@ -17,16 +18,25 @@ from app.logging.context import (
     endpoint_var,
     method_var,
 )
-from app.logging.events import SYS_APP_STARTED, log_event
+from app.logging.events import (
+    ACCESS_REQUEST,
+    SYS_APP_STARTED,
+    SYS_MISSING_CORRELATION_ID,
+    log_event,
+)
 from app.logging.filters import AppFilter, LoggingStreams
 from app.logging.formatter import JsonFormatter
-from app.logging.middleware import RequestContextMiddleware
+from app.logging.middleware import SERVER_TIMING_HEADER, RequestContextMiddleware
+from app.models.auth.context import AuthContext, AuthenticationClaims
+from app.models.oin import Oin
 
 CORRELATION_ID = "some-generated-id"
+TRUSTED_OIN = "00000099000000001000"
 
+RecordLogs = Callable[[str], List[logging.LogRecord]]
 
-@pytest.fixture
-def middleware_client() -> Iterator[TestClient]:
+
+def _app(**middleware_options: Any) -> FastAPI:
     app = FastAPI()
 
     @app.get("/echo")
@@ -36,14 +46,53 @@ def middleware_client() -> Iterator[TestClient]:
             "endpoint": endpoint_var.get(),
             "method": method_var.get(),
             "outgoing": correlation_headers(),
+            "deadline_remaining": deadline.remaining(),
         }
 
-    app.add_middleware(RequestContextMiddleware)
+    @app.get("/timed")
+    def timed() -> None:
+        timing.record(timing.DB, 0.003)
+        timing.record(timing.DB, 0.002)
+        timing.record(timing.HSM, 0.010)
+
+    @app.get("/authenticated/timed")
+    def authenticated_timed(request: Request) -> None:
+        # As get_auth_ctx does once it validated the authorization headers
+        request.state.auth = AuthContext(
+            claims=AuthenticationClaims(
+                organization_id=Oin(request.headers["x-gf-sub"]),
+                client_organization_id=Oin(request.headers["x-gf-act-sub"]),
+                client_common_name="client",
+            ),
+            audience="prs",
+        )
+        timed()
+
+    @app.get("/fail")
+    def fail() -> None:
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestContextMiddleware, **middleware_options)
+    return app
 
-    with TestClient(app) as test_client:
+
+@pytest.fixture
+def middleware_client() -> Iterator[TestClient]:
+    with TestClient(_app()) as test_client:
         yield test_client
 
 
+@pytest.fixture
+def access_records(record_logs: RecordLogs) -> Iterator[List[logging.LogRecord]]:
+    access_logger = logging.getLogger("app.access")
+    level = access_logger.level
+    access_logger.setLevel(logging.INFO)
+    try:
+        yield record_logs("app.access")
+    finally:
+        access_logger.setLevel(level)
+
+
 def test_inbound_correlation_id_reaches_the_endpoint(
     middleware_client: TestClient,
 ) -> None:
@@ -185,7 +234,7 @@ def test_correlation_id_reaches_the_formatted_log_record() -> None:
 
 
 def test_correlation_id_survives_per_stream_field_routing() -> None:
-    # correlation_id is in _ALWAYS_KEEP_FIELDS, so stream routing must not drop it.
+    # correlation_id is in ALWAYS_KEEP_FIELDS, so stream routing must not drop it.
     buf = io.StringIO()
     handler = logging.StreamHandler(buf)
     handler.addFilter(AppFilter())
@@ -205,3 +254,100 @@ def test_correlation_id_survives_per_stream_field_routing() -> None:
 
     message = json.loads(buf.getvalue().splitlines()[0])["message"]
     assert message["correlation_id"] == CORRELATION_ID
+
+
+def test_access_request_is_logged_with_status_and_duration(
+    middleware_client: TestClient, access_records: List[logging.LogRecord]
+) -> None:
+    middleware_client.get("/echo", headers={CORRELATION_ID_HEADER: CORRELATION_ID})
+
+    [record] = access_records
+    assert record.event_id == ACCESS_REQUEST.event_id  # type: ignore[attr-defined]
+    assert record.status_code == 200  # type: ignore[attr-defined]
+    assert isinstance(record.duration_ms, int)  # type: ignore[attr-defined]
+
+
+def test_access_request_is_logged_when_the_endpoint_raises(
+    access_records: List[logging.LogRecord],
+) -> None:
+    with TestClient(_app(), raise_server_exceptions=False) as client:
+        assert client.get("/fail").status_code == 500
+
+    [record] = access_records
+    assert record.status_code is None  # type: ignore[attr-defined]
+
+
+def test_missing_correlation_id_is_reported_when_expected(
+    record_logs: RecordLogs,
+) -> None:
+    records = record_logs("app.logging.middleware")
+
+    with TestClient(_app(correlation_id_expected=True)) as client:
+        client.get("/echo", headers={CORRELATION_ID_HEADER: CORRELATION_ID})
+        assert records == []
+
+        client.get("/echo")
+
+    [record] = records
+    assert record.event_id == SYS_MISSING_CORRELATION_ID.event_id  # type: ignore[attr-defined]
+    assert record.endpoint == "/echo"  # type: ignore[attr-defined]
+    assert record.method == "GET"  # type: ignore[attr-defined]
+
+
+def test_request_deadline_is_bound_for_the_request() -> None:
+    with TestClient(_app(request_deadline=5.0)) as client:
+        remaining = client.get("/echo").json()["deadline_remaining"]
+
+    assert 0 < remaining <= 5.0
+
+
+def test_no_deadline_is_bound_by_default(middleware_client: TestClient) -> None:
+    assert middleware_client.get("/echo").json()["deadline_remaining"] is None
+
+
+def test_phase_timings_are_logged_on_access_request(
+    middleware_client: TestClient, access_records: List[logging.LogRecord]
+) -> None:
+    middleware_client.get("/timed")
+
+    [record] = access_records
+    assert record.db_ms == 5.0  # type: ignore[attr-defined]
+    assert record.hsm_ms == 10.0  # type: ignore[attr-defined]
+    assert not hasattr(record, "jwe_ms")
+
+
+def _auth_headers(oin: str) -> dict[str, str]:
+    return {"x-gf-sub": oin, "x-gf-act-sub": oin}
+
+
+def test_server_timing_header_is_sent_to_trusted_clients() -> None:
+    with TestClient(_app(server_timing_oins=[TRUSTED_OIN])) as client:
+        response = client.get(
+            "/authenticated/timed", headers=_auth_headers(TRUSTED_OIN)
+        )
+
+    entries = response.headers[SERVER_TIMING_HEADER].split(", ")
+    assert entries[:2] == ["db;dur=5.0", "hsm;dur=10.0"]
+    assert entries[2].startswith("total;dur=")
+
+
+def test_server_timing_header_is_not_sent_to_other_clients() -> None:
+    with TestClient(_app(server_timing_oins=[TRUSTED_OIN])) as client:
+        other = client.get(
+            "/authenticated/timed", headers=_auth_headers("00000099000000002000")
+        )
+        # The client OIN header alone is not trusted
+        unauthenticated = client.get("/timed", headers=_auth_headers(TRUSTED_OIN))
+        anonymous = client.get("/timed")
+
+    assert SERVER_TIMING_HEADER not in other.headers
+    assert SERVER_TIMING_HEADER not in unauthenticated.headers
+    assert SERVER_TIMING_HEADER not in anonymous.headers
+
+
+def test_server_timing_header_is_off_by_default(middleware_client: TestClient) -> None:
+    response = middleware_client.get(
+        "/authenticated/timed", headers=_auth_headers(TRUSTED_OIN)
+    )
+
+    assert SERVER_TIMING_HEADER not in response.headers
@@ -5,6 +5,7 @@ from app.models.oin import Oin, RecipientOrganizationOin
 from app.models.requests import (
     BlindRequest,
     ExchangeRequest,
+    HsmKeyRotationRequest,
     HsmKeyVersionRequest,
     HsmKeyVersionUpdateRequest,
     RegisterRequest,
@@ -261,3 +262,44 @@ def test_hsm_key_version_update_request_accepts_timezone_aware_dates() -> None:
     assert request.until_dt is not None
     assert request.until_dt.tzinfo is not None
     assert request.until_dt.utcoffset() == timedelta(hours=5, minutes=30)
+
+
+def test_hsm_key_rotation_request_requires_organizations_or_all() -> None:
+    for kwargs in (
+        {},
+        {"organizations": ["00000099000000001000"], "all_organizations": True},
+    ):
+        try:
+            HsmKeyRotationRequest.model_validate(kwargs)
+            assert False, "Expected ValidationError without exactly one selection"
+        except ValidationError as e:
+            assert "all_organizations" in str(e)
+
+    request = HsmKeyRotationRequest.model_validate(
+        {"organizations": ["00000099000000001000"]}
+    )
+    assert request.organizations == [Oin("00000099000000001000")]
+    assert HsmKeyRotationRequest(all_organizations=True).organizations is None
+
+
+def test_hsm_key_rotation_request_previous_until_dt_must_not_be_before_from_dt() -> (
+    None
+):
+    from_dt = datetime.now(timezone.utc) + timedelta(days=1)
+
+    try:
+        HsmKeyRotationRequest(
+            all_organizations=True,
+            from_dt=from_dt,
+            previous_until_dt=from_dt - timedelta(hours=1),
+        )
+        assert False, "Expected ValidationError when previous_until_dt is early"
+    except ValidationError as e:
+        assert "previous_until_dt" in str(e)
+
+    request = HsmKeyRotationRequest(
+        all_organizations=True,
+        from_dt=from_dt,
+        previous_until_dt=from_dt + timedelta(days=7),
+    )
+    assert request.previous_until_dt == from_dt + timedelta(days=7)
@@ -28,10 +28,8 @@ def generate_keys(
     max_usage_level: str,
     pub_key: str,
 ) -> None:
-    entries = key_resolver.get_by_org(org_id)
-    if entries is not None:
-        for entry in entries:
-            key_resolver.delete(entry.id, org_id)
+    for entry in key_resolver.get_page_by_org(org_id).items:
+        key_resolver.delete(uuid.UUID(entry["id"]), org_id)
     key_resolver.create(
         org_id,
         scope,
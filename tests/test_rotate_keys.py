@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock, patch
+
+from app import rotate_keys
+from app.models.oin import Oin
+from app.services.hsm_key_rotation_service import HsmKeyRotationResult
+from app.services.oprf.evaluators import HsmKeyLabel
+
+TEST_OIN = Oin("00000099000000001000")
+
+
+def test_main_rotates_the_given_organizations() -> None:
+    service = MagicMock()
+    service.rotate.return_value = HsmKeyRotationResult([], 0, 0, [])
+
+    with patch(
+        "app.rotate_keys.container.get_hsm_key_rotation_service", return_value=service
+    ):
+        assert rotate_keys.main(["--oin", TEST_OIN.value, "--provision"]) == 0
+
+    args, kwargs = service.rotate.call_args
+    assert args == ([TEST_OIN],)
+    assert kwargs["provision"] is True
+
+
+def test_main_returns_one_when_keys_fail_to_provision() -> None:
+    service = MagicMock()
+    service.rotate.return_value = HsmKeyRotationResult(
+        [], 0, 0, [HsmKeyLabel(TEST_OIN, 2)]
+    )
+
+    with patch(
+        "app.rotate_keys.container.get_hsm_key_rotation_service", return_value=service
+    ):
+        assert rotate_keys.main(["--all", "--provision"]) == 1
+
+    assert service.rotate.call_args.args == (None,)
@@ -0,0 +1,186 @@
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from app.config import SpoolOverflow
+from app.logging.spool import SPOOL_DROPPED, SpoolHandler, SyslogTarget
+from app.metrics import REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+class _Collector(logging.Handler):
+    """Stands in for the syslog collector; fails while down, waits while held."""
+
+    def __init__(self, down: bool = False) -> None:
+        super().__init__()
+        self.down = down
+        self.hold = threading.Event()
+        self.hold.set()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.hold.wait()
+        if self.down:
+            raise ConnectionError("collector down")
+        self.records.append(record)
+
+    @property
+    def messages(self) -> List[str]:
+        return [r.getMessage() for r in self.records]
+
+
+def _spool(path: Path, collector: _Collector, **kwargs: Any) -> SpoolHandler:
+    return SpoolHandler(str(path), target=collector, fsync_interval=0.01, **kwargs)
+
+
+def _record(msg: str, level: int = logging.WARNING) -> logging.LogRecord:
+    return logging.makeLogRecord({"msg": msg, "levelno": level})
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_records_are_shipped_in_the_background(tmp_path: Path) -> None:
+    collector = _Collector()
+    handler = _spool(tmp_path, collector)
+
+    handler.handle(_record("first", logging.ERROR))
+    handler.handle(_record("second"))
+    _wait_for(lambda: len(collector.records) == 2)
+    handler.close()
+
+    assert collector.messages == ["first", "second"]
+    assert [r.levelno for r in collector.records] == [logging.ERROR, logging.WARNING]
+
+
+def test_shipping_resumes_from_the_checkpoint(tmp_path: Path) -> None:
+    handler = _spool(tmp_path, _Collector(down=True))
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+    handler.close()
+
+    collector = _Collector()
+    handler = _spool(tmp_path, collector)
+    _wait_for(lambda: len(collector.records) == 2)
+    handler.close()
+
+    collector = _Collector()
+    handler = _spool(tmp_path, collector)
+    handler.handle(_record("third"))
+    _wait_for(lambda: len(collector.records) == 1)
+    handler.close()
+
+    # Shipped records are not sent again, and shipped segments are removed
+    assert collector.messages == ["third"]
+    assert len(list(tmp_path.glob("worker-0/*.spool"))) == 1
+
+
+def test_segments_rotate(tmp_path: Path) -> None:
+    collector = _Collector()
+    handler = _spool(tmp_path, collector, segment_bytes=10)
+
+    for i in range(5):
+        handler.handle(_record(f"record {i}"))
+    _wait_for(lambda: len(collector.records) == 5)
+    handler.close()
+
+    assert collector.messages == [f"record {i}" for i in range(5)]
+
+
+def test_torn_record_is_skipped(tmp_path: Path) -> None:
+    (tmp_path / "worker-0").mkdir()
+    (tmp_path / "worker-0" / "siem-000000000000.spool").write_bytes(
+        b"30\tcomplete\n30\ttor"
+    )
+    collector = _Collector()
+    handler = _spool(tmp_path, collector)
+
+    handler.handle(_record("after restart"))
+    _wait_for(lambda: len(collector.records) == 2)
+    handler.close()
+
+    assert collector.messages == ["complete", "after restart"]
+
+
+def test_full_spool_drops_records(tmp_path: Path) -> None:
+    collector = _Collector(down=True)
+    handler = _spool(tmp_path, collector, max_bytes=12, overflow=SpoolOverflow.drop)
+
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+    handler.close()
+
+    assert SPOOL_DROPPED.value() == 1
+
+
+def test_full_spool_blocks_until_shipped(tmp_path: Path) -> None:
+    collector = _Collector()
+    collector.hold.clear()
+    handler = _spool(tmp_path, collector, max_bytes=12, block_timeout=5)
+
+    handler.handle(_record("first"))
+    # The collector is slow, the second record waits for the first to be shipped
+    threading.Timer(0.05, collector.hold.set).start()
+    handler.handle(_record("second"))
+    _wait_for(lambda: len(collector.records) == 2)
+    handler.close()
+
+    assert collector.messages == ["first", "second"]
+    assert SPOOL_DROPPED.value() == 0
+
+
+def test_processes_sharing_the_directory_spool_separately(tmp_path: Path) -> None:
+    first_collector, second_collector = _Collector(), _Collector()
+    first = _spool(tmp_path, first_collector)
+    second = _spool(tmp_path, second_collector)
+    assert first.directory != second.directory
+
+    for i in range(10):
+        first.handle(_record(f"first {i}"))
+        second.handle(_record(f"second {i}"))
+    _wait_for(lambda: len(first_collector.records) == 10)
+    _wait_for(lambda: len(second_collector.records) == 10)
+    first.close()
+    second.close()
+
+    assert first_collector.messages == [f"first {i}" for i in range(10)]
+    assert second_collector.messages == [f"second {i}" for i in range(10)]
+
+    # A restarted process takes the first free slot again
+    handler = _spool(tmp_path, _Collector())
+    assert handler.directory == tmp_path / "worker-0"
+    handler.close()
+
+
+def test_syslog_target_sends_datagrams_and_raises_send_errors() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as collector:
+        collector.bind(("127.0.0.1", 0))
+        collector.settimeout(5)
+        target = SyslogTarget(collector.getsockname())
+        record = logging.makeLogRecord({"msg": "audit event", "levelno": 20})
+        record.levelname = "INFO"
+        try:
+            target.handle(record)
+            assert collector.recv(1024) == b"<14>audit event\x00"
+
+            target.socket.close()  # type: ignore[attr-defined]
+            with pytest.raises(OSError):
+                target.handle(record)
+        finally:
+            target.close()
@@ -12,8 +12,9 @@ from jwcrypto import jwk
 from sqlalchemy.exc import DatabaseError, OperationalError
 
 from app import container
-from app.config import ConfigOprf, get_config
+from app.config import ConfigOprf
 from app.db.db import Database
+from app.db.session import DbSession
 from app.models.oin import Oin, RecipientOrganizationOin
 from app.models.requests import BlindRequest
 from app.rid import RidUsage
@@ -118,19 +119,13 @@ def test_db_retry_emits_connection_events(
     record_logs: RecordLogs, database: Database
 ) -> None:
     records = record_logs("app.db.session")
-    config = get_config()
-    original_backoff = config.database.retry_backoff
-    config.database.retry_backoff = [0.0]
 
     def failing_operation() -> None:
         raise OperationalError("stmt", {}, Exception("connection lost"))
 
-    try:
-        with database.get_db_session() as session:
-            with pytest.raises(DatabaseError):
-                session._retry(failing_operation)
-    finally:
-        config.database.retry_backoff = original_backoff
+    with DbSession(database.engine, retry_backoff=[0.0]) as session:
+        with pytest.raises(DatabaseError):
+            session._retry(failing_operation)
 
     events = _events(records, "270403")
     assert len(events) == 2
@@ -175,7 +170,7 @@ def test_hsm_unreachable_emits_sys_event(
 
     with (
         patch(
-            "app.services.oprf.evaluators.requests.post",
+            "app.services.oprf.evaluators.requests.Session.post",
             side_effect=requests.exceptions.ConnectionError("connection refused"),
         ),
         pytest.raises(OprfEvaluationError) as exc,
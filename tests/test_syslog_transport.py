@@ -0,0 +1,279 @@
+import contextlib
+import datetime
+import logging
+import socket
+import ssl
+import threading
+import time
+from collections.abc import Callable, Generator, Sequence
+from pathlib import Path
+from typing import List
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from app.logging.transport import SYSLOG_RECORDS_DROPPED, StreamSyslogHandler
+from app.metrics import REGISTRY
+
+
+class _Listener:
+    """Fake syslog collector that decodes octet-counted frames."""
+
+    def __init__(self, port: int = 0, ssl_context: ssl.SSLContext | None = None):
+        self.ssl_context = ssl_context
+        self.server = socket.create_server(("127.0.0.1", port))
+        self.port = self.server.getsockname()[1]
+        self.data = b""
+        self.reads = 0
+        self.connections: List[socket.socket] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn: socket.socket) -> None:
+        if self.ssl_context is not None:
+            conn = self.ssl_context.wrap_socket(conn, server_side=True)
+        with conn:
+            while chunk := conn.recv(65536):
+                with self._lock:
+                    self.data += chunk
+                    self.reads += 1
+
+    def frames(self) -> List[str]:
+        frames = []
+        with self._lock:
+            data = self.data
+        while data:
+            length, _, rest = data.partition(b" ")
+            frames.append(rest[: int(length)].decode("utf-8"))
+            data = rest[int(length) :]
+        return frames
+
+    def drop(self) -> None:
+        for conn in self.connections:
+            with contextlib.suppress(OSError):
+                conn.shutdown(socket.SHUT_RDWR)
+
+    def close(self) -> None:
+        self.drop()
+        self.server.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics() -> Generator[None, None, None]:
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+@pytest.fixture
+def listener() -> Generator[_Listener, None, None]:
+    listener = _Listener()
+    yield listener
+    listener.close()
+
+
+def _record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.makeLogRecord(
+        {"msg": msg, "levelno": level, "levelname": logging.getLevelName(level)}
+    )
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_records_are_framed_with_octet_counting(listener: _Listener) -> None:
+    handler = StreamSyslogHandler(("127.0.0.1", listener.port), flush_interval=0.01)
+
+    handler.handle(_record("first", logging.ERROR))
+    handler.handle(_record("multi\nline ünicode"))
+    _wait_for(lambda: len(listener.frames()) == 2)
+    handler.close()
+
+    # LOG_USER (1) * 8 + err (3) and info (6)
+    assert listener.frames() == ["<11>first", "<14>multi\nline ünicode"]
+
+
+def test_records_are_batched_until_the_flush_interval(listener: _Listener) -> None:
+    handler = StreamSyslogHandler(("127.0.0.1", listener.port), flush_interval=0.2)
+
+    for i in range(10):
+        handler.handle(_record(f"record {i}"))
+    time.sleep(0.05)
+    assert listener.frames() == []
+
+    _wait_for(lambda: len(listener.frames()) == 10)
+    handler.close()
+
+    assert listener.reads == 1
+    assert len(listener.connections) == 1
+
+
+def test_full_batch_is_written_before_the_flush_interval(listener: _Listener) -> None:
+    handler = StreamSyslogHandler(
+        ("127.0.0.1", listener.port), flush_interval=60, batch_bytes=30
+    )
+
+    handler.handle(_record("first record"))
+    handler.handle(_record("second record"))
+    _wait_for(lambda: len(listener.frames()) == 2)
+    handler.close()
+
+
+def test_reconnects_when_the_collector_drops_the_connection(
+    listener: _Listener,
+) -> None:
+    handler = StreamSyslogHandler(("127.0.0.1", listener.port), flush_interval=0.01)
+    handler.handle(_record("before"))
+    _wait_for(lambda: len(listener.frames()) == 1)
+
+    listener.drop()
+    handler.handle(_record("after"))
+    _wait_for(lambda: len(listener.frames()) == 2)
+    handler.close()
+
+    assert listener.frames() == ["<14>before", "<14>after"]
+    assert len(listener.connections) == 2
+
+
+def test_records_wait_for_the_collector() -> None:
+    # Nothing listens on this port yet
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+    handler = StreamSyslogHandler(("127.0.0.1", port), flush_interval=0.01)
+    handler.handle(_record("early"))
+    time.sleep(0.05)
+
+    listener = _Listener(port)
+    _wait_for(lambda: len(listener.frames()) == 1)
+    handler.close()
+    listener.close()
+
+    assert listener.frames() == ["<14>early"]
+    assert SYSLOG_RECORDS_DROPPED.value() == 0
+
+
+def test_full_buffer_drops_records() -> None:
+    # Nothing listens on this port
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+    handler = StreamSyslogHandler(("127.0.0.1", port), flush_interval=60, buffer_size=2)
+
+    for i in range(3):
+        handler.handle(_record(f"record {i}"))
+    assert SYSLOG_RECORDS_DROPPED.value() == 1
+
+    with pytest.raises(OSError):
+        handler.flush()
+    handler.close()
+
+
+def test_reconnects_with_backoff_while_the_collector_is_down() -> None:
+    # Nothing listens on this port
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+    handler = StreamSyslogHandler(
+        ("127.0.0.1", port), flush_interval=0.01, batch_bytes=100
+    )
+    connects = 0
+    connect = handler._connect
+
+    def counting_connect() -> socket.socket:
+        nonlocal connects
+        connects += 1
+        return connect()
+
+    handler._connect = counting_connect  # type: ignore[method-assign]
+    # Far more than one batch stays buffered
+    for i in range(100):
+        handler.handle(_record(f"record {i}"))
+    time.sleep(1)
+    handler.close()
+
+    # 0.1 + 0.2 + 0.5 s of backoff after the first attempts
+    assert 2 <= connects <= 5
+
+
+def test_writes_are_limited_to_batch_bytes(listener: _Listener) -> None:
+    handler = StreamSyslogHandler(
+        ("127.0.0.1", listener.port), flush_interval=60, background=False
+    )
+    handler.batch_bytes = 50
+    sent: List[int] = []
+    send = handler._send
+
+    def recording_send(frames: Sequence[bytes]) -> None:
+        sent.append(sum(len(frame) for frame in frames))
+        send(frames)
+
+    handler._send = recording_send  # type: ignore[method-assign]
+    for i in range(10):
+        handler.handle(_record(f"record {i}"))
+    handler.flush()
+    _wait_for(lambda: len(listener.frames()) == 10)
+    handler.close()
+
+    assert len(sent) > 1
+    assert all(size <= 50 for size in sent)
+
+
+def _tls_files(tmp_path: Path) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.oid.NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_file = tmp_path / "collector.crt"
+    key_file = tmp_path / "collector.key"
+    cert_file.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_file.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(cert_file), str(key_file)
+
+
+def test_tls_transport(tmp_path: Path) -> None:
+    cert_file, key_file = _tls_files(tmp_path)
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert_file, key_file)
+    listener = _Listener(ssl_context=server_context)
+
+    handler = StreamSyslogHandler(
+        ("localhost", listener.port), tls=True, ca_file=cert_file, flush_interval=0.01
+    )
+    handler.handle(_record("over tls", logging.WARNING))
+    _wait_for(lambda: len(listener.frames()) == 1)
+    handler.close()
+    listener.close()
+
+    assert listener.frames() == ["<12>over tls"]
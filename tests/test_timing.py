@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app import timing
+from app.config import ConfigOprf
+from app.metrics import REGISTRY
+from app.models.oin import Oin
+from app.services.oprf.evaluators import (
+    HSM_REQUEST_DURATION,
+    HsmKeyLabel,
+    HsmOprfEvaluator,
+)
+
+
+def test_phase_outside_a_request_records_nothing() -> None:
+    with timing.phase(timing.DB):
+        pass
+    timing.record(timing.HSM, 1.0)
+
+    assert timing.timings_var.get() is None
+
+
+def test_phases_accumulate_per_request() -> None:
+    with timing.bind_timings() as timings:
+        with timing.phase(timing.CRYPTO):
+            time.sleep(0.001)
+        timing.record(timing.CRYPTO, 0.5)
+
+    assert timings.totals()[timing.CRYPTO] > 0.5
+    assert timing.timings_var.get() is None
+
+
+def test_phases_from_worker_threads_are_combined() -> None:
+    with timing.bind_timings() as timings:
+
+        def work() -> None:
+            for _ in range(1000):
+                timings.add(timing.DB, 0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert round(timings.totals()[timing.DB], 6) == 4.0
+
+
+def test_server_timing_and_log_fields() -> None:
+    timings = timing.RequestTimings()
+    timings.add(timing.DB, 0.0031)
+    timings.add(timing.JWE, 0.0004)
+
+    assert timings.server_timing() == "db;dur=3.1, jwe;dur=0.4"
+    assert timings.server_timing(0.01) == "db;dur=3.1, jwe;dur=0.4, total;dur=10.0"
+    assert timings.log_fields() == {"db_ms": 3.1, "jwe_ms": 0.4}
+
+
+def test_malformed_hsm_response_is_timed_as_an_error(mocker: MockerFixture) -> None:
+    REGISTRY.clear()
+    post = mocker.patch("app.services.oprf.evaluators.requests.Session.post")
+    post.return_value.json.side_effect = ValueError("not JSON")
+    evaluator = HsmOprfEvaluator(
+        ConfigOprf(hsm_url="https://hsm", hsm_module="mod", hsm_slot="slot"),
+        mocker.Mock(),
+        mocker.Mock(),
+    )
+
+    with timing.bind_timings() as timings, pytest.raises(ValueError):
+        evaluator._generate_key(HsmKeyLabel(Oin("00000099000000001000"), 1))
+
+    assert timing.HSM in timings.totals()
+    assert HSM_REQUEST_DURATION.snapshot(operation="generate", outcome="ok")[1] == 0
+    assert HSM_REQUEST_DURATION.snapshot(operation="generate", outcome="error")[1] == 1
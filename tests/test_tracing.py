@@ -0,0 +1,111 @@
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from sqlalchemy import create_engine, literal, select
+
+from app import tracing
+from app.config import ConfigOprf, ConfigTracing
+from app.db.session import DbSession
+from app.models.oin import Oin
+from app.services.oprf.evaluators import HsmKeyLabel, HsmOprfEvaluator
+from app.services.oprf.jwe_token import BlindJwe
+from app.services.rid_service import RidService
+
+in_memory = pytest.importorskip(
+    "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+)
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+@pytest.fixture
+def spans() -> Generator[Any, None, None]:
+    exporter = in_memory.InMemorySpanExporter()
+    tracing.setup_tracing(ConfigTracing(enabled=True), exporter=exporter)
+    yield exporter
+    tracing.shutdown_tracing()
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    rid_service = RidService(b"k" * 32, b"RID:v1")
+
+    @app.get("/rid/{rid}")
+    def rid(rid: str) -> dict[str, str]:
+        return {"rid": rid_service.decrypt_rid(rid_service.encrypt_rid(rid))}
+
+    app.add_middleware(tracing.TracingMiddleware)
+    return app
+
+
+def test_spans_are_noop_when_disabled() -> None:
+    headers: dict[str, str] = {}
+
+    with tracing.span("anything"):
+        tracing.inject_headers(headers)
+
+    assert not tracing.enabled()
+    assert headers == {}
+
+
+def test_request_span_is_named_after_the_route(spans: Any) -> None:
+    with TestClient(_app()) as client:
+        response = client.get("/rid/abc", headers={"traceparent": TRACEPARENT})
+    assert response.json() == {"rid": "abc"}
+
+    by_name = {span.name: span for span in spans.get_finished_spans()}
+    assert set(by_name) == {
+        "GET /rid/{rid}",
+        "crypto.encrypt_rid",
+        "crypto.decrypt_rid",
+    }
+    server = by_name["GET /rid/{rid}"]
+    assert server.attributes["http.route"] == "/rid/{rid}"
+    assert server.attributes["http.response.status_code"] == 200
+    # The trace of the caller is continued
+    assert format(server.context.trace_id, "032x") == TRACEPARENT.split("-")[1]
+    for name in ("crypto.encrypt_rid", "crypto.decrypt_rid"):
+        assert by_name[name].parent.span_id == server.context.span_id
+
+
+def test_database_calls_are_traced(spans: Any) -> None:
+    with DbSession(create_engine("sqlite://")) as session:
+        session.execute(select(literal(1)))
+        session.commit()
+
+    names = [span.name for span in spans.get_finished_spans()]
+    assert names == ["db.execute", "db.commit"]
+
+
+def test_jwe_build_is_traced(spans: Any) -> None:
+    from jwcrypto import jwk
+
+    key = jwk.JWK.generate(kty="RSA", size=2048)
+    BlindJwe.build("aud", "scope", "subject", key, None)
+
+    assert [span.name for span in spans.get_finished_spans()] == ["jwe.build"]
+
+
+def test_trace_context_is_propagated_to_the_hsm(
+    spans: Any, mocker: MockerFixture
+) -> None:
+    post = mocker.patch("app.services.oprf.evaluators.requests.Session.post")
+    post.return_value.json.return_value = {"result": "ok"}
+    evaluator = HsmOprfEvaluator(
+        ConfigOprf(hsm_url="https://hsm", hsm_module="mod", hsm_slot="slot"),
+        mocker.Mock(),
+        mocker.Mock(),
+    )
+
+    evaluator._generate_key(HsmKeyLabel(Oin("00000099000000001000"), 1))
+
+    [span] = spans.get_finished_spans()
+    assert span.name == "hsm.generate"
+    headers = post.call_args.kwargs["headers"]
+    trace_id, span_id = headers["traceparent"].split("-")[1:3]
+    assert trace_id == format(span.context.trace_id, "032x")
+    assert span_id == format(span.context.span_id, "016x")
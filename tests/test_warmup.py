@@ -0,0 +1,83 @@
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import inject
+import pytest
+
+from app.application import get_uvicorn_params
+from app.config import ConfigOprf, get_config
+from app.db.db import Database
+from app.services.key_resolver import KeyResolver
+from app.services.oprf.evaluators import HsmOprfEvaluator
+from app.services.oprf.oprf_service import OprfService
+from app.warmup import WARMUP_DURATION, warm_up
+
+
+@pytest.fixture
+def dependencies() -> Generator[dict[type, MagicMock], None, None]:
+    mocks: dict[type, MagicMock] = {
+        Database: MagicMock(spec=Database),
+        OprfService: MagicMock(spec=OprfService),
+        KeyResolver: MagicMock(spec=KeyResolver),
+    }
+
+    def config(binder: inject.Binder) -> None:
+        for cls, mock in mocks.items():
+            binder.bind(cls, mock)
+
+    inject.configure(config, clear=True)
+    yield mocks
+    inject.clear()
+
+
+def test_warm_up_runs_every_step(dependencies: dict[type, MagicMock]) -> None:
+    assert warm_up() >= 0
+
+    for mock in dependencies.values():
+        mock.warm_up.assert_called_once_with()
+    for step in ("database", "hsm", "keys"):
+        assert WARMUP_DURATION.value(step=step) >= 0
+
+
+def test_database_failure_does_not_stop_the_warm_up(
+    dependencies: dict[type, MagicMock],
+) -> None:
+    dependencies[Database].warm_up.side_effect = RuntimeError("database is down")
+
+    warm_up()
+
+    dependencies[OprfService].warm_up.assert_called_once_with()
+    # The keys are read from the database, so they are skipped
+    dependencies[KeyResolver].warm_up.assert_not_called()
+
+
+def test_hsm_warm_up_opens_a_session_connection() -> None:
+    evaluator = HsmOprfEvaluator(
+        ConfigOprf(hsm_url="https://hsm.local"), MagicMock(), MagicMock()
+    )
+
+    with patch("app.services.oprf.evaluators.requests.Session.post") as post:
+        evaluator.warm_up()
+        evaluator.warm_up()
+
+    assert post.call_count == 2
+    assert post.call_args.args[0] == "https://hsm.local/hsm/softhsm/SoftHSMLabel"
+    assert post.call_args.kwargs["json"] == {
+        "label": "warmup",
+        "objtype": "SECRET_KEY",
+    }
+
+
+def test_multiple_workers_disable_reload() -> None:
+    config = get_config()
+    uvicorn_config = config.uvicorn
+    try:
+        config.uvicorn = uvicorn_config.model_copy(
+            update={"reload": True, "workers": 4}
+        )
+        params = get_uvicorn_params()
+    finally:
+        config.uvicorn = uvicorn_config
+
+    assert params["workers"] == 4
+    assert params["reload"] is False